@@ -0,0 +1,162 @@
+"""
+Contention test: scan replay and a sync loop hitting the same mealtracker.db.
+
+For each journal mode (WAL, and SQLite's default DELETE for comparison) a
+copy of a generated terminal database is scanned through mealtracker() in
+one process while another runs sync_meals_orders() back to back. Reported:
+scan latency percentiles, the slowest insert (time spent waiting on the write
+lock), scans slower than STALL_MS, and "database is locked" failures on
+either side.
+
+Without --pg-dsn the sync runs in dry-run mode, which does the same SQLite
+reads and synced-flag updates without sending anything.
+
+    python contention_check.py --data bench_data --scans 1000
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "local_sqlite"))
+
+from run_benchmarks import percentile  # noqa: E402
+
+STALL_MS = 100
+
+
+def scan_worker(db_path, pins, interval, results):
+    from rich.console import Console
+    import metrics
+    from mealtracker_local import mealtracker
+
+    latencies = []
+
+    def timed_pins():
+        for pin in pins:
+            start = time.perf_counter()
+            yield pin
+            latencies.append(time.perf_counter() - start)
+            time.sleep(interval)
+
+    out = io.StringIO()
+    # Each yield resumes after the previous PIN was handled, so the gap is that scan's latency
+    mealtracker(db_file=db_path, clear_fn=None, pins=timed_pins(), console=Console(file=out, width=100))
+    insert = metrics.snapshot()["timers"].get("scan.insert", {})
+    results.put(("scan", {
+        "latencies": latencies,
+        "insert_max": insert.get("max"),
+        "insert_p99": insert.get("p99"),
+        "lock_errors": out.getvalue().count("locked"),
+    }))
+
+
+def sync_worker(work_dir, dry_run, stop, results):
+    from sync_meals_orders import sync_meals_orders
+
+    os.chdir(work_dir)
+    runs, lock_errors = [], 0
+    while not stop.is_set():
+        out = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            sync_meals_orders(dry_run=dry_run, archive=False)
+        runs.append(time.perf_counter() - start)
+        lock_errors += out.getvalue().count("locked")
+    results.put(("sync", {"runs": runs, "lock_errors": lock_errors}))
+
+
+def run_mode(mode, terminal_db, pins, interval, dry_run):
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = Path(work_dir) / "mealtracker.db"
+        shutil.copyfile(terminal_db, db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(f"PRAGMA journal_mode = {mode}")
+
+        # Children read these at import time
+        os.environ["MEALTRACKER_JOURNAL_MODE"] = mode
+        os.environ["MEALTRACKER_METRICS"] = str(Path(work_dir) / "metrics.json")
+
+        results, stop = ctx.Queue(), ctx.Event()
+        sync = ctx.Process(target=sync_worker, args=(work_dir, dry_run, stop, results))
+        scan = ctx.Process(target=scan_worker, args=(str(db_path), pins, interval, results))
+        sync.start()
+        scan.start()
+
+        collected = {}
+        kind, payload = results.get()
+        collected[kind] = payload
+        stop.set()
+        kind, payload = results.get()
+        collected[kind] = payload
+        scan.join()
+        sync.join()
+
+    scans, syncs = collected["scan"], collected["sync"]
+    latencies = scans["latencies"]
+    return {
+        "scans": len(latencies),
+        "scan_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(max(latencies) * 1000, 3),
+        },
+        "insert_wait_ms": {
+            "p99": round((scans["insert_p99"] or 0) * 1000, 3),
+            "max": round((scans["insert_max"] or 0) * 1000, 3),
+        },
+        "scan_stalls_over_100ms": sum(1 for lat in latencies if lat * 1000 > STALL_MS),
+        "scan_lock_errors": scans["lock_errors"],
+        "sync_runs": len(syncs["runs"]),
+        "sync_run_ms_median": round(percentile(syncs["runs"], 50) * 1000, 3) if syncs["runs"] else None,
+        "sync_lock_errors": syncs["lock_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan replay vs. sync loop on one terminal database.")
+    parser.add_argument("--data", default="bench_data", help="Directory made by generate_district_data.py")
+    parser.add_argument("--scans", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=0.005, help="Seconds between scans")
+    parser.add_argument("--modes", nargs="+", default=["WAL", "DELETE"])
+    parser.add_argument("--pg-dsn", help="Sync to this PostgreSQL database instead of a dry run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    data_dir = Path(args.data).resolve()
+    manifest = json.loads((data_dir / "manifest.json").read_text())
+    terminal_db = data_dir / manifest["terminals"][0]["db"]
+
+    if args.pg_dsn:
+        from psycopg2.extensions import parse_dsn
+        params = parse_dsn(args.pg_dsn)
+        for key in ("host", "port", "dbname", "user", "password"):
+            if key in params:
+                os.environ[f"PG_{key.upper()}"] = params[key]
+
+    with sqlite3.connect(terminal_db) as conn:
+        roster = [row[0] for row in conn.execute("SELECT perm_id FROM students")]
+    rng = random.Random(args.seed)
+    pins = [str(rng.choice(roster)) for _ in range(args.scans)] + ["q"]
+
+    report = {}
+    for mode in args.modes:
+        print(f"⏱  {mode} ...")
+        report[mode] = run_mode(mode.upper(), terminal_db, pins, args.interval, dry_run=not args.pg_dsn)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Synthetic district generator for MealTracker.
+
+Builds a realistic dataset for N schools x service days x breakfast/lunch:
+student rosters, Free/Reduced eligibility histories, orders and salad_bar rows.
+Each terminal gets its own `mealtracker.db` under
+<out>/<school>_t<n>/ (so the terminal scripts can be run from that folder),
+Synergy-style roster CSVs go to <out>/synergy/, and the whole district can
+optionally be loaded into a local PostgreSQL database. Paths in
+<out>/manifest.json are relative to <out>.
+
+    python generate_district_data.py --schools 4 --roster 450 --out bench_data
+    python generate_district_data.py --pg-dsn "dbname=mealtracker_bench user=postgres"
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+FIRST_NAMES = [
+    "Ava", "Liam", "Mia", "Noah", "Emma", "Elijah", "Sofia", "Mateo", "Isabella", "Lucas",
+    "Camila", "Levi", "Harper", "Ezra", "Luna", "Asher", "Aria", "Leo", "Ellie", "Jack",
+    "Nova", "Kai", "Zoe", "Owen", "Maya", "Julian", "Layla", "Diego", "Chloe", "Ethan",
+]
+LAST_NAMES = [
+    "Garcia", "Smith", "Johnson", "Lopez", "Martinez", "Brown", "Davis", "Hernandez", "Wilson",
+    "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+    "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker", "Young",
+    "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green",
+]
+PRODUCE_ITEMS = [
+    "Apples", "Bananas", "Oranges", "Pears", "Grapes", "Strawberries", "Cantaloupe", "Honeydew",
+    "Watermelon", "Pineapple", "Kiwi", "Baby Carrots", "Celery Sticks", "Cucumbers",
+    "Cherry Tomatoes", "Broccoli", "Cauliflower", "Snap Peas", "Jicama", "Romaine",
+    "Spinach", "Bell Peppers", "Corn", "Black Beans", "Garbanzo Beans",
+]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    perm_id INTEGER PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT,
+    staff TEXT,
+    school TEXT
+);
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    perm_id INTEGER,
+    meals_date TEXT,
+    meal_type TEXT,
+    synced INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_date TEXT,
+    lunch_order INTEGER,
+    breakfast_order INTEGER,
+    school_id INTEGER,
+    synced INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS salad_bar (
+    salad_bar_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    itemid INTEGER,
+    serve_date TEXT,
+    time_rcvd TEXT,
+    temp_rcvd REAL,
+    units_received REAL,
+    culled REAL,
+    ending_inv REAL,
+    leftovers REAL,
+    current_inv REAL,
+    units_used REAL,
+    portions_prepared REAL,
+    total_served REAL,
+    time_served TEXT,
+    temp_served REAL,
+    synced INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ErrorLogs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    perm_id INTEGER,
+    log_date TEXT,
+    log_time TEXT,
+    meal_type TEXT,
+    error_message TEXT
+);
+CREATE TABLE IF NOT EXISTS sorted_items (
+    itemid INTEGER PRIMARY KEY,
+    itemname TEXT
+);
+CREATE TABLE IF NOT EXISTS eligibility (
+    perm_id INTEGER,
+    frm_code TEXT,
+    start_date TEXT,
+    end_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_eligibility_perm_id ON eligibility (perm_id);
+"""
+
+PG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    perm_id INTEGER PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT,
+    staff TEXT,
+    school TEXT
+);
+CREATE TABLE IF NOT EXISTS eligibility (
+    perm_id INTEGER,
+    frm_code TEXT,
+    start_date DATE,
+    end_date DATE
+);
+CREATE TABLE IF NOT EXISTS meals (
+    id SERIAL PRIMARY KEY,
+    perm_id INTEGER,
+    meals_date DATE,
+    meal_type TEXT,
+    synced INTEGER
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id SERIAL PRIMARY KEY,
+    order_date DATE,
+    lunch_order INTEGER,
+    breakfast_order INTEGER,
+    synced INTEGER
+);
+CREATE TABLE IF NOT EXISTS salad_bar (
+    salad_bar_id SERIAL PRIMARY KEY,
+    itemid INTEGER,
+    serve_date DATE,
+    time_rcvd TIME,
+    temp_rcvd REAL,
+    units_received REAL,
+    culled REAL,
+    ending_inv REAL,
+    leftovers REAL,
+    current_inv REAL,
+    units_used REAL,
+    portions_prepared REAL,
+    total_served REAL,
+    time_served TIME,
+    temp_served REAL,
+    synced INTEGER
+);
+CREATE TABLE IF NOT EXISTS lunch_totals (
+    meals_date DATE PRIMARY KEY,
+    total_1s INTEGER,
+    total_2s INTEGER,
+    total_3s INTEGER,
+    total_served INTEGER
+);
+CREATE TABLE IF NOT EXISTS breakfast_totals (
+    meals_date DATE PRIMARY KEY,
+    total_1s INTEGER,
+    total_2s INTEGER,
+    total_3s INTEGER,
+    total_served INTEGER
+);
+"""
+
+
+def service_days(start: date, count: int) -> list:
+    """Return `count` weekdays starting at `start`."""
+    days = []
+    current = start
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def make_school(rng, school_index, roster_size, used_ids):
+    """Build one school's roster with homerooms of ~22 students."""
+    school = f"School{school_index + 1:02d}"
+    homerooms = [
+        (rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES))
+        for _ in range(max(1, roster_size // 22))
+    ]
+    students = []
+    while len(students) < roster_size:
+        perm_id = rng.randint(1_000_000, 9_999_999)
+        if perm_id in used_ids:
+            continue
+        used_ids.add(perm_id)
+        staff_last, staff_first = rng.choice(homerooms)
+        students.append({
+            "perm_id": perm_id,
+            "first_name": rng.choice(FIRST_NAMES),
+            "middle_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "staff": staff_last,
+            "staff_first": staff_first,
+            "school": school,
+            # Per-student propensity keeps participation realistic rather than uniform
+            "breakfast_p": rng.betavariate(2, 3),
+            "lunch_p": rng.betavariate(6, 2),
+        })
+    return school, students
+
+
+def make_eligibility(rng, students, days):
+    """
+    Free/Reduced benefit periods. Some students carry a prior-year period into
+    the fall and re-apply, which produces overlapping or adjacent periods.
+    """
+    rows = []
+    year_start, year_end = days[0], days[-1]
+    for student in students:
+        roll = rng.random()
+        if roll < 0.45:
+            code = "Free"
+        elif roll < 0.55:
+            code = "Reduced"
+        else:
+            continue
+
+        if rng.random() < 0.3:
+            carry_end = year_start + timedelta(days=rng.randint(20, 45))
+            rows.append((student["perm_id"], code, year_start - timedelta(days=300), carry_end))
+            new_start = carry_end + timedelta(days=rng.choice([-10, 0, 1, 15]))
+            rows.append((student["perm_id"], code, new_start, year_end + timedelta(days=60)))
+        else:
+            start = year_start + timedelta(days=rng.choice([0, 0, 0, 30, 90]))
+            rows.append((student["perm_id"], code, start, year_end + timedelta(days=60)))
+    return rows
+
+
+def make_meals(rng, students, days, terminals, duplicate_rate):
+    """Yield (terminal_index, perm_id, meals_date, meal_type) for every serve."""
+    for day in days:
+        for student in students:
+            for meal_type, p_key in (("Breakfast", "breakfast_p"), ("Lunch", "lunch_p")):
+                if rng.random() >= student[p_key]:
+                    continue
+                terminal = rng.randrange(terminals)
+                yield terminal, student["perm_id"], day, meal_type
+                # A student occasionally goes through both lines
+                if terminals > 1 and rng.random() < duplicate_rate:
+                    yield (terminal + 1) % terminals, student["perm_id"], day, meal_type
+
+
+def make_salad_bar(rng, days, item_ids):
+    rows = []
+    for day in days:
+        for itemid in item_ids:
+            received = float(rng.randint(0, 12))
+            culled = float(rng.randint(0, 1)) if received else 0.0
+            leftovers = float(rng.randint(0, 3))
+            ending = float(rng.randint(0, 4))
+            used = max(received - culled - ending, 0.0)
+            portions = used * 16
+            rows.append((
+                itemid, day.isoformat(), f"{rng.randint(6, 9):02d}:{rng.choice(['00', '15', '30', '45'])}",
+                round(rng.gauss(38, 2.5), 1), received, culled, ending, leftovers,
+                received, used, portions, max(portions - leftovers * 16, 0.0),
+                "11:30", round(rng.gauss(39, 2.5), 1),
+            ))
+    return rows
+
+
+def write_synergy_csv(path: Path, students):
+    """Write a roster in the Synergy export layout clean_student_download expects."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Perm ID", "Ed-Fi ID", "SSID", "Student Name", "Last Name", "Staff Name"])
+        for s in students:
+            writer.writerow([
+                s["perm_id"], f"EF{s['perm_id']}", f"SS{s['perm_id']}",
+                f"{s['last_name']}, {s['first_name']} {s['middle_name']}",
+                s["last_name"], f"{s['staff']}, {s['staff_first']}",
+            ])
+
+
+def build_terminal_db(db_path: Path, students, meals, orders, salad_bar, item_ids, unsynced_from, eligibility=()):
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db_path.unlink(missing_ok=True)
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(SQLITE_SCHEMA)
+        conn.executemany(
+            "INSERT INTO students (perm_id, first_name, last_name, staff, school) VALUES (?, ?, ?, ?, ?)",
+            [(s["perm_id"], s["first_name"], s["last_name"], s["staff"].lower(), s["school"]) for s in students],
+        )
+        conn.executemany(
+            "INSERT INTO meals (perm_id, meals_date, meal_type, synced) VALUES (?, ?, ?, ?)",
+            [(p, d.isoformat(), m, int(d < unsynced_from)) for p, d, m in meals],
+        )
+        conn.executemany(
+            "INSERT INTO orders (order_date, lunch_order, breakfast_order, school_id, synced) VALUES (?, ?, ?, ?, ?)",
+            [(d.isoformat(), lunch, breakfast, school_id, int(d < unsynced_from)) for d, lunch, breakfast, school_id in orders],
+        )
+        conn.executemany(
+            """
+            INSERT INTO salad_bar (
+                itemid, serve_date, time_rcvd, temp_rcvd, units_received, culled, ending_inv, leftovers,
+                current_inv, units_used, portions_prepared, total_served, time_served, temp_served, synced
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [row + (int(row[1] < unsynced_from.isoformat()),) for row in salad_bar],
+        )
+        conn.executemany(
+            "INSERT INTO sorted_items (itemid, itemname) VALUES (?, ?)",
+            list(zip(item_ids, PRODUCE_ITEMS)),
+        )
+        # The snapshot sync_students_from_postgres keeps on each terminal
+        conn.executemany(
+            "INSERT INTO eligibility (perm_id, frm_code, start_date, end_date) VALUES (?, ?, ?, ?)",
+            [(p, code, start.isoformat(), end.isoformat()) for p, code, start, end in eligibility],
+        )
+        conn.commit()
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """Stream rows into PostgreSQL with COPY."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer
+    )
+
+
+def load_postgres(dsn, all_students, eligibility, all_meals, all_orders, salad_bar_rows):
+    """Replace the district tables in PostgreSQL with the generated dataset."""
+    import psycopg2
+
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(PG_SCHEMA)
+            cur.execute(
+                "TRUNCATE students, eligibility, meals, orders, salad_bar, lunch_totals, breakfast_totals"
+            )
+            _copy_rows(cur, "students", ["perm_id", "first_name", "last_name", "staff", "school"],
+                       ((s["perm_id"], s["first_name"], s["last_name"], s["staff"].lower(), s["school"]) for s in all_students))
+            _copy_rows(cur, "eligibility", ["perm_id", "frm_code", "start_date", "end_date"], eligibility)
+            _copy_rows(cur, "meals", ["perm_id", "meals_date", "meal_type", "synced"],
+                       ((p, d, m, 1) for _, p, d, m in all_meals))
+            _copy_rows(cur, "orders", ["order_date", "lunch_order", "breakfast_order", "synced"],
+                       ((d, lunch, breakfast, 1) for d, lunch, breakfast, _ in all_orders))
+            _copy_rows(cur, "salad_bar", [
+                "itemid", "serve_date", "time_rcvd", "temp_rcvd", "units_received", "culled", "ending_inv",
+                "leftovers", "current_inv", "units_used", "portions_prepared", "total_served", "time_served",
+                "temp_served", "synced",
+            ], (row + (1,) for row in salad_bar_rows))
+            cur.execute("ANALYZE")
+        conn.commit()
+
+
+def generate(out_dir, schools=2, terminals_per_school=2, roster=400, days=180, start=None,
+             seed=1, duplicate_rate=0.005, unsynced_days=5, pg_dsn=None) -> dict:
+    """Generate the district and return a manifest describing what was written."""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    (out_dir / "synergy").mkdir(parents=True, exist_ok=True)
+    start = start or date(date.today().year - 1, 8, 18)
+    days_list = service_days(start, days)
+    unsynced_from = days_list[max(0, len(days_list) - unsynced_days)] if unsynced_days else days_list[-1] + timedelta(days=1)
+    item_ids = list(range(101, 101 + len(PRODUCE_ITEMS)))
+
+    used_ids = set()
+    manifest = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "schools": schools, "terminals_per_school": terminals_per_school, "roster": roster,
+            "days": days, "start": start.isoformat(), "seed": seed,
+            "duplicate_rate": duplicate_rate, "unsynced_days": unsynced_days,
+        },
+        "first_day": days_list[0].isoformat(),
+        "last_day": days_list[-1].isoformat(),
+        "schools": {},
+        "terminals": [],
+        "synergy_csvs": [],
+        "eligibility_csv": str(Path("synergy") / "eligibility.csv"),
+    }
+    all_students, all_eligibility, all_meals, all_orders, all_salad_bar = [], [], [], [], []
+
+    for school_index in range(schools):
+        school, students = make_school(rng, school_index, roster, used_ids)
+        eligibility = make_eligibility(rng, students, days_list)
+        meals = list(make_meals(rng, students, days_list, terminals_per_school, duplicate_rate))
+        salad_bar = make_salad_bar(rng, days_list, item_ids)
+
+        served = {}
+        for _, _, day, meal_type in meals:
+            served[(day, meal_type)] = served.get((day, meal_type), 0) + 1
+        orders = [
+            (day,
+             int(served.get((day, "Lunch"), 0) * rng.uniform(1.0, 1.15)),
+             int(served.get((day, "Breakfast"), 0) * rng.uniform(1.0, 1.2)),
+             school_index + 1)
+            for day in days_list
+        ]
+
+        csv_path = out_dir / "synergy" / f"{school}_students.csv"
+        write_synergy_csv(csv_path, students)
+        manifest["synergy_csvs"].append(str(csv_path.relative_to(out_dir)))
+
+        for terminal in range(terminals_per_school):
+            db_path = out_dir / f"{school}_t{terminal + 1}" / "mealtracker.db"
+            terminal_meals = [(p, d, m) for t, p, d, m in meals if t == terminal]
+            # Orders and produce are entered on the first terminal of each school
+            build_terminal_db(
+                db_path, students, terminal_meals,
+                orders if terminal == 0 else [], salad_bar if terminal == 0 else [],
+                item_ids, unsynced_from, eligibility,
+            )
+            manifest["terminals"].append({"school": school, "terminal": terminal + 1, "db": str(db_path.relative_to(out_dir)),
+                                          "meals": len(terminal_meals)})
+
+        manifest["schools"][school] = {"students": len(students), "meals": len(meals),
+                                       "eligibility_rows": len(eligibility)}
+        all_students += students
+        all_eligibility += eligibility
+        all_meals += meals
+        all_orders += orders
+        all_salad_bar += salad_bar
+
+    with open(out_dir / manifest["eligibility_csv"], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Perm ID", "FRM Code", "Start Date", "End Date"])
+        writer.writerows(all_eligibility)
+
+    if pg_dsn:
+        load_postgres(pg_dsn, all_students, all_eligibility, all_meals, all_orders, all_salad_bar)
+        manifest["postgres"] = pg_dsn
+
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MealTracker district.")
+    parser.add_argument("--out", default="bench_data", help="Output folder")
+    parser.add_argument("--schools", type=int, default=2)
+    parser.add_argument("--terminals-per-school", type=int, default=2)
+    parser.add_argument("--roster", type=int, default=400, help="Students per school")
+    parser.add_argument("--days", type=int, default=180, help="Service days")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(), default=None,
+                        help="First service day (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--duplicate-rate", type=float, default=0.005,
+                        help="Chance a serve is also scanned on the school's other terminal")
+    parser.add_argument("--unsynced-days", type=int, default=5,
+                        help="Trailing days left with synced = 0 on the terminals")
+    parser.add_argument("--pg-dsn", default=None, help="Also load into this PostgreSQL database")
+    args = parser.parse_args()
+
+    manifest = generate(
+        args.out, schools=args.schools, terminals_per_school=args.terminals_per_school,
+        roster=args.roster, days=args.days, start=args.start, seed=args.seed,
+        duplicate_rate=args.duplicate_rate, unsynced_days=args.unsynced_days, pg_dsn=args.pg_dsn,
+    )
+    for school, stats in manifest["schools"].items():
+        print(f"{school}: {stats['students']} students, {stats['meals']} meals, "
+              f"{stats['eligibility_rows']} eligibility rows")
+    print(f"Manifest written to {Path(args.out) / 'manifest.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Throughput of the central ingest service with several terminals at once.
+
+Starts postgres_admin/ingest_service.py on localhost, then has --terminals
+processes each send --batches gzip batches of --batch-rows meals rows, the
+same wire format ingest_client.py uses. A share of batches is sent twice to
+exercise (terminal, seq) deduplication. Reports rows/sec, batch latency and
+checks that PostgreSQL ended up with exactly one copy of every row.
+
+Rows are written with meals_date BENCH_DATE and removed afterwards.
+
+    python ingest_benchmark.py --pg-dsn "dbname=mealtracker_bench" --terminals 4
+"""
+import argparse
+import gzip
+import json
+import multiprocessing as mp
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "local_sqlite"))
+
+from ingest_client import post_batch  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+BENCH_DATE = "2000-01-03"
+TERMINAL_PREFIX = "bench-ingest-"
+
+
+def terminal_worker(url, terminal, batches, batch_rows, duplicate_rate, seed, results):
+    rng = random.Random(seed)
+    latencies, duplicates = [], 0
+    for seq in range(1, batches + 1):
+        batch = {
+            "terminal": terminal, "seq": seq, "table": "meals",
+            "columns": ["perm_id", "meals_date", "meal_type", "synced"],
+            "rows": [[rng.randint(1_000_000, 9_999_999), BENCH_DATE, rng.choice(("Breakfast", "Lunch")), 0]
+                     for _ in range(batch_rows)],
+        }
+        payload = gzip.compress(json.dumps(batch, separators=(",", ":")).encode())
+        sends = 2 if rng.random() < duplicate_rate else 1
+        for _ in range(sends):
+            start = time.perf_counter()
+            reply = post_batch(url, payload)
+            latencies.append(time.perf_counter() - start)
+            duplicates += reply["status"] == "duplicate"
+    results.put({"latencies": latencies, "duplicates": duplicates})
+
+
+def count_bench_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM meals WHERE meals_date = %s", (BENCH_DATE,))
+        return cur.fetchone()[0]
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM meals WHERE meals_date = %s", (BENCH_DATE,))
+        cur.execute("DELETE FROM ingest_batches WHERE terminal LIKE %s", (TERMINAL_PREFIX + "%",))
+    conn.commit()
+
+
+def wait_for_service(url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest service with simulated terminals.")
+    parser.add_argument("--pg-dsn", required=True)
+    parser.add_argument("--terminals", type=int, default=4)
+    parser.add_argument("--batches", type=int, default=25, help="Batches per terminal")
+    parser.add_argument("--batch-rows", type=int, default=2000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    import psycopg2
+    url = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        service = subprocess.Popen(
+            [sys.executable, str(ROOT / "postgres_admin" / "ingest_service.py"),
+             "--host", "127.0.0.1", "--port", str(args.port), "--dsn", args.pg_dsn],
+            cwd=work_dir, stdout=subprocess.DEVNULL,
+        )
+        conn = psycopg2.connect(args.pg_dsn)
+        try:
+            if not wait_for_service(url):
+                sys.exit("❌ Ingest service did not start")
+            cleanup(conn)
+
+            results = mp.Queue()
+            workers = [
+                mp.Process(target=terminal_worker, args=(
+                    url, f"{TERMINAL_PREFIX}{i}", args.batches, args.batch_rows, args.duplicate_rate, i, results))
+                for i in range(1, args.terminals + 1)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            outcomes = [results.get() for _ in workers]
+            elapsed = time.perf_counter() - start
+            for worker in workers:
+                worker.join()
+
+            expected = args.terminals * args.batches * args.batch_rows
+            stored = count_bench_rows(conn)
+            latencies = [lat for o in outcomes for lat in o["latencies"]]
+            report = {
+                "terminals": args.terminals,
+                "batches_per_terminal": args.batches,
+                "batch_rows": args.batch_rows,
+                "requests": len(latencies),
+                "duplicates_acknowledged": sum(o["duplicates"] for o in outcomes),
+                "rows_expected": expected,
+                "rows_stored": stored,
+                "exactly_once": stored == expected,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(expected / elapsed, 1),
+                "batch_ms": {
+                    "p50": round(percentile(latencies, 50) * 1000, 2),
+                    "p95": round(percentile(latencies, 95) * 1000, 2),
+                    "max": round(max(latencies) * 1000, 2),
+                },
+            }
+            print(json.dumps(report, indent=2))
+        finally:
+            cleanup(conn)
+            conn.close()
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+fetch_meal_data before and after partitioning meals (postgres_admin/meals_partitions.py).
+
+Builds a multi-year synthetic district in a scratch schema, times the
+monthly report query against the plain meals table, converts it with
+meals_partitions.migrate() and times the same query again. The month's
+meals range scan is also timed on its own, since that is the part of
+fetch_meal_data partitioning changes (the per-meal eligibility lookup is
+the same either way).
+
+The scratch schema (partition_bench) is dropped afterwards unless --keep is given.
+
+    python partition_benchmark.py --pg-dsn "dbname=mealtracker_bench" --years 4 --roster 2000
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "postgres_admin"))
+
+from generate_district_data import PG_SCHEMA  # noqa: E402
+
+SCHEMA = "partition_bench"
+
+# Weekday service outside July; about 70% take lunch and 35% breakfast.
+# Inserted in date order, as syncs deliver them.
+LOAD_SQL = """
+INSERT INTO students (perm_id, first_name, last_name, staff, school)
+SELECT g, 'First' || g, 'Last' || g, 'staff' || (g % 90), 'School0' || (g % 4 + 1)
+FROM generate_series(1, :roster) g;
+
+INSERT INTO eligibility (perm_id, frm_code, start_date, end_date)
+SELECT s, CASE WHEN random() < 0.8 THEN 'Free' ELSE 'Reduced' END,
+       make_date(y, 7, 1), make_date(y + 1, 6, 30)
+FROM generate_series(1, :roster) s, generate_series(:first_year, :last_year) y
+WHERE random() < 0.55;
+
+-- As clean_eligibility_download leaves it
+CREATE INDEX eligibility_perm_id_start_idx ON eligibility (perm_id, start_date);
+
+INSERT INTO meals (perm_id, meals_date, meal_type, synced)
+SELECT perm_id, meals_date, meal_type, 1
+FROM (
+    -- random() in the select list keeps it per row; as a WHERE qual it would be pushed down to VALUES
+    SELECT s AS perm_id, d::date AS meals_date, m.meal_type, m.rate, random() AS roll
+    FROM generate_series(CAST(:start AS date), CAST(:end AS date), interval '1 day') d
+    CROSS JOIN (VALUES ('Lunch', 0.70), ('Breakfast', 0.35)) m(meal_type, rate)
+    CROSS JOIN generate_series(1, :roster) s
+    WHERE extract(isodow FROM d) < 6 AND extract(month FROM d) <> 7
+) candidates
+WHERE roll < rate
+ORDER BY meals_date;
+"""
+
+
+def time_fetch(fetch_meal_data, engine, start, end, repeats):
+    runs, rows = [], 0
+    for _ in range(repeats):
+        began = time.perf_counter()
+        rows = len(fetch_meal_data(engine, start, end))
+        runs.append(time.perf_counter() - began)
+    return {"rows": rows, "median_ms": round(statistics.median(runs) * 1000, 1),
+            "min_ms": round(min(runs) * 1000, 1)}
+
+
+def time_scan(engine, start, end, repeats):
+    from sqlalchemy import text
+
+    runs = []
+    with engine.connect() as conn:
+        for _ in range(repeats):
+            began = time.perf_counter()
+            conn.execute(text("SELECT COUNT(*) FROM meals WHERE meals_date BETWEEN :start AND :end"),
+                         {"start": start, "end": end}).scalar()
+            runs.append(time.perf_counter() - began)
+    return {"median_ms": round(statistics.median(runs) * 1000, 2), "min_ms": round(min(runs) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time fetch_meal_data on plain vs partitioned meals.")
+    parser.add_argument("--pg-dsn", required=True)
+    parser.add_argument("--years", type=int, default=4, help="School years of history")
+    parser.add_argument("--roster", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the partition_bench schema afterwards")
+    args = parser.parse_args()
+
+    from psycopg2.extensions import parse_dsn
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import URL
+
+    from generate_reports import fetch_meal_data
+    from meals_partitions import list_partitions, migrate
+
+    params = parse_dsn(args.pg_dsn)
+    engine = create_engine(
+        URL.create("postgresql+psycopg2", username=params.get("user"), password=params.get("password"),
+                   host=params.get("host"), port=params.get("port"), database=params.get("dbname")),
+        connect_args={"options": f"-csearch_path={SCHEMA}"},
+    )
+
+    last_year = date.today().year - 1
+    first_year = last_year - args.years + 1
+    start, end = date(first_year, 8, 1), date(last_year + 1, 6, 30)
+    # A month near the end of the history, like the report being run now
+    month = (f"{last_year + 1}-03-01", f"{last_year + 1}-03-31")
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            conn.execute(text(PG_SCHEMA))
+            began = time.perf_counter()
+            for statement in LOAD_SQL.split(";\n"):
+                if statement.strip():
+                    conn.execute(text(statement), {"roster": args.roster, "first_year": first_year,
+                                                   "last_year": last_year, "start": start, "end": end})
+            load_seconds = time.perf_counter() - began
+            total_rows = conn.execute(text("SELECT COUNT(*) FROM meals")).scalar()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE"))
+
+        fetch_meal_data(engine, *month)  # warm the cache for both runs alike
+        before = time_fetch(fetch_meal_data, engine, *month, args.repeats)
+        before_scan = time_scan(engine, *month, args.repeats)
+
+        began = time.perf_counter()
+        result = migrate(engine)
+        migrate_seconds = time.perf_counter() - began
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE meals"))
+            partitions = len(list_partitions(conn))
+
+        fetch_meal_data(engine, *month)
+        after = time_fetch(fetch_meal_data, engine, *month, args.repeats)
+        after_scan = time_scan(engine, *month, args.repeats)
+
+        print(json.dumps({
+            "history": f"{start} .. {end}",
+            "roster": args.roster,
+            "meals_rows": total_rows,
+            "load_seconds": round(load_seconds, 1),
+            "report_month": f"{month[0]} .. {month[1]}",
+            "fetch_meal_data": {"plain": before, "partitioned": after},
+            "meals_range_scan": {"plain": before_scan, "partitioned": after_scan},
+            "partitions": partitions,
+            "migrate_seconds": round(migrate_seconds, 1),
+            "migrated_rows": result.get("rows"),
+            "speedup": {
+                "fetch_meal_data": round(before["median_ms"] / after["median_ms"], 2),
+                "meals_range_scan": round(before_scan["median_ms"] / after_scan["median_ms"], 2),
+            },
+            "same_rows": before["rows"] == after["rows"],
+        }, indent=2))
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
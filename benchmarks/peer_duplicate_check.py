@@ -0,0 +1,144 @@
+"""
+Two-terminal check for peer duplicate detection (local_sqlite/peer_sync.py).
+
+Runs terminal A in this process and terminal B in a child process, both on
+127.0.0.1, and measures:
+
+- detection latency: time from A recording a meal to B seeing it as served
+- local-only: A keeps recording while B is down, without blocking
+- catch-up: B restarted with no state recovers A's records via want/resend
+- conflicts: the same student served on both lines at once is flagged
+
+    python peer_duplicate_check.py --scans 200
+"""
+import argparse
+import json
+import multiprocessing as mp
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "local_sqlite"))
+
+from peer_sync import PeerSync  # noqa: E402
+
+A_ADDR = ("127.0.0.1", 50661)
+B_ADDR = ("127.0.0.1", 50662)
+TARGET_LATENCY = 1.0
+
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def terminal_b(commands, results):
+    """Child terminal: answers 'watch' requests with how long the record took to arrive."""
+    peer = PeerSync("B", B_ADDR, [A_ADDR], date.today())
+    peer.start()
+    results.put(("ready", None))
+    while True:
+        command, arg = commands.get()
+        if command == "watch":
+            perm_id, sent_at = arg
+            seen = wait_for(lambda: peer.served_by(perm_id, "Lunch") == "A", 5)
+            results.put(("seen", time.time() - sent_at if seen else None))
+        elif command == "count":
+            results.put(("count", sum(1 for owner in peer.served.values() if owner == "A")))
+        elif command == "record":
+            peer.record(arg, "Lunch")
+            results.put(("recorded", None))
+        elif command == "stop":
+            peer.stop()
+            return
+
+
+def start_b():
+    commands, results = mp.Queue(), mp.Queue()
+    process = mp.Process(target=terminal_b, args=(commands, results), daemon=True)
+    process.start()
+    assert results.get(timeout=10)[0] == "ready"
+    return process, commands, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cross-terminal duplicate detection on loopback.")
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--offline-scans", type=int, default=500)
+    args = parser.parse_args()
+
+    a = PeerSync("A", A_ADDR, [B_ADDR], date.today())
+    a.start()
+    process, commands, results = start_b()
+    report = {}
+
+    # Detection latency while both terminals are up
+    latencies = []
+    for perm_id in range(1, args.scans + 1):
+        commands.put(("watch", (perm_id, time.time())))
+        a.record(perm_id, "Lunch")
+        latencies.append(results.get(timeout=10)[1])
+    seen = [lat for lat in latencies if lat is not None]
+    report["detection"] = {
+        "scans": args.scans,
+        "detected": len(seen),
+        "median_ms": round(statistics.median(seen) * 1000, 3) if seen else None,
+        "max_ms": round(max(seen) * 1000, 3) if seen else None,
+        "under_target": bool(seen) and len(seen) == args.scans and max(seen) < TARGET_LATENCY,
+    }
+
+    # Same student on both lines before either hears about it
+    commands.put(("record", 999999))
+    results.get(timeout=10)
+    a.record(999999, "Lunch")
+    wait_for(lambda: a.conflicts, 5)
+    report["simultaneous_duplicate_caught"] = any(c[0] == 999999 for c in a.pop_conflicts()) or a.served_by(999999, "Lunch") == "B"
+
+    # Peer down: A keeps working on its own
+    commands.put(("stop", None))
+    process.join(timeout=5)
+    start = time.perf_counter()
+    offline_ids = range(100001, 100001 + args.offline_scans)
+    for perm_id in offline_ids:
+        a.record(perm_id, "Lunch")
+    elapsed = time.perf_counter() - start
+    report["peer_down"] = {
+        "scans": args.offline_scans,
+        "per_scan_us": round(elapsed / args.offline_scans * 1e6, 2),
+    }
+
+    # Peer back with empty state: catch up from A's resend
+    expected = args.scans + 1 + args.offline_scans
+    start = time.perf_counter()
+    process, commands, results = start_b()
+
+    def caught_up():
+        commands.put(("count", None))
+        return results.get(timeout=10)[1] >= expected
+
+    recovered = wait_for(caught_up, 15)
+    report["catch_up"] = {
+        "expected_records": expected,
+        "recovered": recovered,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+    commands.put(("stop", None))
+    process.join(timeout=5)
+    a.stop()
+
+    print(json.dumps(report, indent=2))
+    ok = report["detection"]["under_target"] and report["simultaneous_duplicate_caught"] and recovered
+    print("✅ Peer duplicate check passed" if ok else "❌ Peer duplicate check failed")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""
+End-to-end performance benchmarks for MealTracker.
+
+Times the main stages against a dataset made by generate_district_data.py:
+
+- scan:                  replay of PIN scans through mealtracker()
+- eligibility_snapshot:  load time, memory and per-scan lookup cost of the
+                         in-memory Free/Reduced/Paid snapshot
+- sync_meals_orders:     terminal -> PostgreSQL sync of the unsynced backlog
+- archive_history:       moving old synced rows to the archive and compacting
+- sync_students:         sync_students_from_postgres into an empty roster
+- clean_student_download: Synergy CSV cleaning, then the roster import (all new, then a no-op re-import)
+- generate_reports.*:    each stage of the monthly report
+
+Stages that need PostgreSQL are skipped unless --pg-dsn is given. Results are
+written as JSON to bench_results/ so runs can be compared with --compare.
+
+    python run_benchmarks.py --data bench_data --pg-dsn "dbname=mealtracker_bench"
+    python run_benchmarks.py --compare bench_results/a.json bench_results/b.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "local_sqlite"))
+sys.path.insert(0, str(ROOT / "postgres_admin"))
+
+RESULTS_DIR = Path("bench_results")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_runs(runs, rows=None):
+    result = {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.mean(runs), 6),
+        "p95": round(percentile(runs, 95), 6),
+    }
+    if rows:
+        result["rows"] = rows
+        result["rows_per_sec"] = round(rows / result["median"], 1) if result["median"] else None
+    return result
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the status prints the scripts make so they don't skew timings."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def working_dir(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def time_stage(fn, repeat, setup=None, teardown=None):
+    """Run setup (untimed), fn (timed), teardown (untimed) `repeat` times."""
+    runs, value = [], None
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        with quiet():
+            value = fn(state)
+        runs.append(time.perf_counter() - start)
+        if teardown:
+            teardown(state)
+    return runs, value
+
+
+def bench_scan(terminal_db, work_dir, scans, repeat, seed):
+    """Replay scans through the real scan loop, timing each PIN."""
+    from rich.console import Console
+    from mealtracker_local import mealtracker
+
+    with sqlite3.connect(terminal_db) as conn:
+        roster = [row[0] for row in conn.execute("SELECT perm_id FROM students")]
+
+    rng = random.Random(seed)
+    pins = []
+    for _ in range(scans):
+        roll = rng.random()
+        if roll < 0.03:
+            pins.append(rng.randint(1, 999))  # unknown PIN
+        elif roll < 0.06 and pins:
+            pins.append(pins[-1])  # double scan
+        else:
+            pins.append(rng.choice(roster))
+
+    latencies = []
+
+    def timed_pins():
+        last = None
+        for pin in pins:
+            now = time.perf_counter()
+            if last is not None:
+                latencies.append(now - last)
+            last = now
+            yield pin
+        latencies.append(time.perf_counter() - last)
+
+    def setup():
+        db_copy = Path(work_dir) / "scan.db"
+        shutil.copyfile(terminal_db, db_copy)
+        return db_copy
+
+    def run(db_copy):
+        mealtracker(db_file=str(db_copy), clear_fn=None, pins=timed_pins(),
+                    console=Console(file=io.StringIO(), width=100))
+
+    runs, _ = time_stage(run, repeat, setup=setup)
+    result = summarize_runs(runs, rows=scans)
+    result["scan_latency_ms"] = {
+        "p50": round(percentile(latencies, 50) * 1000, 3),
+        "p95": round(percentile(latencies, 95) * 1000, 3),
+        "p99": round(percentile(latencies, 99) * 1000, 3),
+        "max": round(max(latencies) * 1000, 3),
+    }
+    return result
+
+
+def bench_eligibility_snapshot(terminal_db, repeat, lookups=100_000):
+    """Startup cost, memory footprint and lookup cost of the scan-time eligibility snapshot."""
+    import tracemalloc
+    from eligibility_snapshot import load_eligibility_snapshot, meal_code
+
+    on_date = None
+    with sqlite3.connect(terminal_db) as conn:
+        roster = [row[0] for row in conn.execute("SELECT perm_id FROM students")]
+        on_date = conn.execute("SELECT MAX(meals_date) FROM meals").fetchone()[0]
+
+        runs, snapshot = time_stage(lambda _: load_eligibility_snapshot(conn, on_date), repeat)
+
+        tracemalloc.start()
+        load_eligibility_snapshot(conn, on_date)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    probe = (roster * (lookups // max(len(roster), 1) + 1))[:lookups]
+    start = time.perf_counter()
+    for perm_id in probe:
+        meal_code(snapshot, perm_id)
+    lookup_seconds = time.perf_counter() - start
+
+    result = summarize_runs(runs, rows=len(snapshot))
+    result["peak_memory_bytes"] = peak
+    result["lookup_ns"] = round(lookup_seconds / len(probe) * 1e9, 1)
+    return result
+
+
+def bench_roster_snapshot(terminal_db, work_dir, repeat, lookups=100_000):
+    """Open cost of the mapped roster snapshot, and its lookups against the per-PIN students query."""
+    from roster_snapshot import RosterSnapshot, snapshot_path, write_roster_snapshot
+
+    db_copy = Path(work_dir) / "roster.db"
+    shutil.copyfile(terminal_db, db_copy)
+    with sqlite3.connect(db_copy) as conn:
+        roster = [row[0] for row in conn.execute("SELECT perm_id FROM students")]
+        path = snapshot_path(db_copy)
+        write_roster_snapshot(conn, db_copy)
+
+        def run(_):
+            snapshot = RosterSnapshot(path)
+            snapshot.close()
+            return len(roster)
+
+        runs, _ = time_stage(run, repeat)
+        probe = (roster * (lookups // max(len(roster), 1) + 1))[:lookups]
+
+        start = time.perf_counter()
+        for perm_id in probe:
+            conn.execute("SELECT first_name, last_name, staff FROM students WHERE perm_id = ?", (perm_id,)).fetchone()
+        sqlite_seconds = time.perf_counter() - start
+
+    snapshot = RosterSnapshot(path)
+    start = time.perf_counter()
+    for perm_id in probe:
+        snapshot.lookup(perm_id)
+    lookup_seconds = time.perf_counter() - start
+    snapshot.close()
+
+    result = summarize_runs(runs, rows=len(roster))
+    result["file_bytes"] = path.stat().st_size
+    result["lookup_ns"] = round(lookup_seconds / len(probe) * 1e9, 1)
+    result["sqlite_lookup_ns"] = round(sqlite_seconds / len(probe) * 1e9, 1)
+    return result
+
+
+def bench_archive_history(terminal_db, work_dir, repeat, retention_days=14):
+    """Archive + incremental vacuum on a copy of the terminal database."""
+    from archive_history import archive_synced_history
+
+    def setup():
+        db_copy = Path(work_dir) / "archive.db"
+        shutil.copyfile(terminal_db, db_copy)
+        shutil.rmtree(Path(work_dir) / "archive", ignore_errors=True)
+        return db_copy
+
+    def run(db_copy):
+        return archive_synced_history(db_copy, retention_days=retention_days,
+                                      archive_dir=Path(work_dir) / "archive", today=today)
+
+    with sqlite3.connect(terminal_db) as conn:
+        today = datetime.strptime(conn.execute("SELECT MAX(meals_date) FROM meals").fetchone()[0], "%Y-%m-%d").date()
+    runs, moved = time_stage(run, repeat, setup=setup)
+    result = summarize_runs(runs, rows=sum(v for k, v in moved.items() if not k.startswith("_")))
+    result["bytes_before"] = moved["_bytes_before"]
+    result["bytes_after"] = moved["_bytes_after"]
+    return result
+
+
+def bench_sync_meals_orders(terminal_db, work_dir, pg_params, repeat):
+    import psycopg2
+    from sync_meals_orders import sync_meals_orders
+
+    sync_dir = Path(work_dir) / "sync"
+    sync_dir.mkdir(exist_ok=True)
+    env = {
+        "PG_HOST": pg_params.get("host", "localhost"),
+        "PG_PORT": str(pg_params.get("port", 5432)),
+        "PG_DBNAME": pg_params.get("dbname", ""),
+        "PG_USER": pg_params.get("user", ""),
+        "PG_PASSWORD": pg_params.get("password", ""),
+    }
+    os.environ.update(env)
+
+    with sqlite3.connect(terminal_db) as conn:
+        rows = sum(conn.execute(f"SELECT COUNT(*) FROM {t} WHERE synced = 0").fetchone()[0]
+                   for t in ("meals", "orders", "salad_bar"))
+
+    def setup():
+        shutil.copyfile(terminal_db, sync_dir / "mealtracker.db")
+        with psycopg2.connect(**pg_params) as conn, conn.cursor() as cur:
+            cur.execute("SELECT (SELECT COALESCE(MAX(id), 0) FROM meals), (SELECT COALESCE(MAX(id), 0) FROM orders),"
+                        " (SELECT COALESCE(MAX(salad_bar_id), 0) FROM salad_bar)")
+            return cur.fetchone()
+
+    def teardown(high_water):
+        # Remove what this run pushed so every repeat syncs the same backlog
+        with psycopg2.connect(**pg_params) as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM meals WHERE id > %s", (high_water[0],))
+            cur.execute("DELETE FROM orders WHERE id > %s", (high_water[1],))
+            cur.execute("DELETE FROM salad_bar WHERE salad_bar_id > %s", (high_water[2],))
+
+    def run(_):
+        with working_dir(sync_dir):
+            sync_meals_orders(dry_run=False, archive=False)
+
+    runs, _ = time_stage(run, repeat, setup=setup, teardown=teardown)
+    return summarize_runs(runs, rows=rows)
+
+
+def bench_sync_students(terminal_db, work_dir, pg_params, repeat):
+    import sync_students_from_postgres as module
+
+    db_copy = Path(work_dir) / "students_sync.db"
+    module.pg_db_params = pg_params
+    module.sqlite_db_path = str(db_copy)
+    module.clear_screen = lambda: None
+
+    def setup():
+        shutil.copyfile(terminal_db, db_copy)
+        with sqlite3.connect(db_copy) as conn:
+            conn.execute("DELETE FROM students")
+
+    def run(_):
+        module.sync_students_from_postgres()
+
+    runs, _ = time_stage(run, repeat, setup=setup)
+    with sqlite3.connect(db_copy) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    return summarize_runs(runs, rows=rows)
+
+
+def bench_clean_student_download(csv_paths, pg_params, repeat):
+    import pandas as pd
+    import clean_student_download as module
+
+    def clean(_):
+        results = module.ingest_files([(path, "") for path in csv_paths])
+        return pd.concat([r["cleaned"] for r in results], ignore_index=True)
+
+    runs, combined = time_stage(clean, repeat)
+    results = {"clean": summarize_runs(runs, rows=len(combined))}
+    if not pg_params:
+        return results
+
+    import psycopg2
+    module.DB_CONFIG = {**pg_params, "database": pg_params.get("dbname")}
+    module.DB_CONFIG.pop("dbname", None)
+    perm_ids = [int(p) for p in combined["perm_id"]]
+
+    def setup():
+        # Clear the rows first so every repeat imports the whole roster as new
+        with psycopg2.connect(**pg_params) as conn, conn.cursor() as cur:
+            cur.execute("SELECT perm_id, school FROM students WHERE perm_id = ANY(%s)", (perm_ids,))
+            saved = cur.fetchall()
+            cur.execute("DELETE FROM students WHERE perm_id = ANY(%s)", (perm_ids,))
+        return saved
+
+    def teardown(saved):
+        with psycopg2.connect(**pg_params) as conn, conn.cursor() as cur:
+            cur.executemany("UPDATE students SET school = %s WHERE perm_id = %s",
+                            [(school, perm_id) for perm_id, school in saved])
+
+    runs, _ = time_stage(lambda _: module.import_roster_to_postgres(combined), repeat, setup=setup, teardown=teardown)
+    results["insert"] = summarize_runs(runs, rows=len(combined))
+
+    # Re-importing an unchanged roster is the common case and should be a no-op diff
+    runs, _ = time_stage(lambda _: module.import_roster_to_postgres(combined), repeat)
+    results["reimport"] = summarize_runs(runs, rows=len(combined))
+    return results
+
+
+def bench_generate_reports(work_dir, pg_params, start_date, end_date, repeat):
+    import generate_reports as module
+
+    module.DB_CONFIG = {
+        "dbname": pg_params.get("dbname"),
+        "user": pg_params.get("user", ""),
+        "password": pg_params.get("password", ""),
+        "host": pg_params.get("host", "localhost"),
+        "port": str(pg_params.get("port", 5432)),
+    }
+    engine = module.get_engine()
+    report_dir = Path(work_dir) / "reports"
+    report_dir.mkdir(exist_ok=True)
+
+    timings = {name: [] for name in (
+        "fetch_meal_data", "export_meal_sheets", "generate_summary_tables",
+        "summarize_meals", "write_summary_workbook",
+    )}
+    rows = 0
+    for _ in range(repeat):
+        with working_dir(report_dir), quiet():
+            start = time.perf_counter()
+            df = module.fetch_meal_data(engine, start_date, end_date)
+            timings["fetch_meal_data"].append(time.perf_counter() - start)
+            rows = len(df)
+
+            start = time.perf_counter()
+            module.export_meal_sheets(df, engine, "bench", start_date)
+            timings["export_meal_sheets"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            df_orders, df_totals = module.generate_summary_tables(engine, start_date, end_date)
+            timings["generate_summary_tables"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            lunch_df = module.summarize_meals(df_orders, df_totals, "lunch")
+            breakfast_df = module.summarize_meals(df_orders, df_totals, "breakfast")
+            timings["summarize_meals"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            module.write_summary_workbook(lunch_df, breakfast_df, filename="bench_summary.xlsx")
+            timings["write_summary_workbook"].append(time.perf_counter() - start)
+
+    engine.dispose()
+    return {name: summarize_runs(runs, rows=rows) for name, runs in timings.items()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(data_dir, pg_dsn=None, repeat=3, scans=2000, seed=7, report_start=None, report_end=None):
+    data_dir = Path(data_dir).resolve()
+    manifest = json.loads((data_dir / "manifest.json").read_text())
+    terminal_db = data_dir / manifest["terminals"][0]["db"]
+    csv_paths = [str(data_dir / p) for p in manifest["synergy_csvs"]]
+
+    pg_params = None
+    if pg_dsn:
+        from psycopg2.extensions import parse_dsn
+        pg_params = parse_dsn(pg_dsn)
+
+    if report_start is None:
+        report_start = manifest["first_day"]
+    if report_end is None:
+        report_end = (datetime.strptime(report_start, "%Y-%m-%d") + timedelta(days=30)).strftime("%Y-%m-%d")
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dataset": manifest["params"],
+        "repeat": repeat,
+        "stages": {},
+        "skipped": [],
+    }
+    stages = results["stages"]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print("⏱  scan ...")
+        stages["scan"] = bench_scan(terminal_db, work_dir, scans, repeat, seed)
+        stages["eligibility_snapshot"] = bench_eligibility_snapshot(terminal_db, repeat)
+        stages["roster_snapshot"] = bench_roster_snapshot(terminal_db, work_dir, repeat)
+        stages["archive_history"] = bench_archive_history(terminal_db, work_dir, repeat)
+
+        clean_results = bench_clean_student_download(csv_paths, pg_params, repeat)
+        stages["clean_student_download.clean"] = clean_results["clean"]
+
+        if pg_params:
+            print("⏱  sync_meals_orders ...")
+            stages["sync_meals_orders"] = bench_sync_meals_orders(terminal_db, work_dir, pg_params, repeat)
+            print("⏱  sync_students_from_postgres ...")
+            stages["sync_students_from_postgres"] = bench_sync_students(terminal_db, work_dir, pg_params, repeat)
+            print("⏱  generate_reports ...")
+            for name, stats in bench_generate_reports(work_dir, pg_params, report_start, report_end, repeat).items():
+                stages[f"generate_reports.{name}"] = stats
+            stages["clean_student_download.insert"] = clean_results["insert"]
+            stages["clean_student_download.reimport"] = clean_results["reimport"]
+        else:
+            results["skipped"] += ["sync_meals_orders", "sync_students_from_postgres",
+                                   "generate_reports", "clean_student_download.insert"]
+
+    return results
+
+
+def write_results(results, out_dir=RESULTS_DIR) -> Path:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+
+def compare(baseline_path, candidate_path):
+    """Print the median of every stage in both runs and the speedup."""
+    baseline = json.loads(Path(baseline_path).read_text())["stages"]
+    candidate = json.loads(Path(candidate_path).read_text())["stages"]
+    print(f"{'stage':45} {'baseline s':>12} {'candidate s':>12} {'speedup':>9}")
+    for stage in sorted(set(baseline) | set(candidate)):
+        before = baseline.get(stage, {}).get("median")
+        after = candidate.get(stage, {}).get("median")
+        speedup = f"{before / after:8.2f}x" if before and after else "        -"
+        print(f"{stage:45} {before if before is not None else '-':>12} "
+              f"{after if after is not None else '-':>12} {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MealTracker pipeline.")
+    parser.add_argument("--data", default="bench_data", help="Folder written by generate_district_data.py")
+    parser.add_argument("--pg-dsn", default=None, help="PostgreSQL loaded by generate_district_data.py")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scans", type=int, default=2000, help="PINs to replay through the scan loop")
+    parser.add_argument("--report-start", default=None, help="Report range start (default: first service day)")
+    parser.add_argument("--report-end", default=None, help="Report range end (default: start + 30 days)")
+    parser.add_argument("--out", default=str(RESULTS_DIR))
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_all(args.data, pg_dsn=args.pg_dsn, repeat=args.repeat, scans=args.scans,
+                      report_start=args.report_start, report_end=args.report_end)
+    path = write_results(results, args.out)
+
+    for stage, stats in results["stages"].items():
+        print(f"{stage:45} median {stats['median']:.4f}s")
+    if results["skipped"]:
+        print(f"Skipped (no --pg-dsn): {', '.join(results['skipped'])}")
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Move synced history out of mealtracker.db so the scan and sync queries only
+work over recent rows.
+
+Rows that are confirmed synced (meals, salad_bar, and ErrorLogs up to the
+last id summarised centrally) and older than RETENTION_DAYS are copied into a per-school-year archive
+database under archive/ (e.g. archive/mealtracker_2024-25.db) and deleted
+from the terminal database, which is then shrunk with incremental vacuum
+and re-analyzed. Unsynced rows are never touched.
+
+The default window keeps a full month on the terminal so offline_reports.py
+can still build the current month from the terminal files.
+"""
+import os
+import re
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from error_log_sync import SYNC_DDL
+from metrics import count, timer
+from utils import connect_db
+
+console = Console()
+
+sqlite_db_path = "mealtracker.db"
+ARCHIVE_DIR = Path("archive")
+RETENTION_DAYS = 45
+
+# table -> (date column, condition for rows confirmed synced)
+ARCHIVE_TABLES = {
+    "meals": ("meals_date", "synced = 1"),
+    "salad_bar": ("serve_date", "synced = 1"),
+    "ErrorLogs": ("log_date", "id <= (SELECT COALESCE(MAX(high_id), 0) FROM error_log_sync)"),
+}
+
+
+def school_year(day: str) -> str:
+    """'2025-03-14' or '2025-03' -> '2024-25' (school years start in July)."""
+    year, month = int(day[:4]), int(day[5:7])
+    start = year if month >= 7 else year - 1
+    return f"{start}-{str(start + 1)[-2:]}"
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info("{table}")')]
+
+
+def _ensure_archive_table(conn, table):
+    """Create the archive copy of `table` with the same DDL, adding any columns added since."""
+    ddl = conn.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE", (table,)
+    ).fetchone()[0]
+    ddl = re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?("?\w+"?|\[\w+\])',
+                 f'CREATE TABLE IF NOT EXISTS archive."{table}"', ddl, count=1, flags=re.IGNORECASE)
+    conn.execute(ddl)
+    archived = set(_columns(conn, "archive", table))
+    for column in _columns(conn, "main", table):
+        if column not in archived:
+            conn.execute(f'ALTER TABLE archive."{table}" ADD COLUMN "{column}"')
+
+
+def _table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE", (table,)
+    ).fetchone() is not None
+
+
+def compact(conn):
+    """Return freed pages to the filesystem and refresh the planner's statistics."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # One-time switch to incremental mode; needs a full VACUUM to take effect
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    # A bare execute() only steps the pragma once, which frees a single page
+    conn.executescript("PRAGMA incremental_vacuum;")
+    conn.execute("ANALYZE")
+
+
+def archive_synced_history(db_path=None, retention_days=RETENTION_DAYS, archive_dir=ARCHIVE_DIR, today=None):
+    """Archive old synced rows, then compact. Returns {table: rows archived}."""
+    db_path = db_path or sqlite_db_path
+    cutoff = ((today or date.today()) - timedelta(days=retention_days)).isoformat()
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    size_before = os.path.getsize(db_path)
+    moved = {}
+
+    with timer("archive.run"):
+        conn = connect_db(db_path, isolation_level=None)
+        try:
+            conn.execute(SYNC_DDL)
+            for table, (date_column, synced) in ARCHIVE_TABLES.items():
+                if not _table_exists(conn, table):
+                    continue
+                where = f"{date_column} < ? AND {synced}"
+                years = {school_year(d) for (d,) in conn.execute(
+                    f'SELECT DISTINCT substr({date_column}, 1, 7) FROM "{table}" WHERE {where}', (cutoff,)
+                ) if d}
+                moved[table] = 0
+                columns = ", ".join(f'"{c}"' for c in _columns(conn, "main", table))
+
+                for year in sorted(years):
+                    start, end = f"{year[:4]}-07-01", f"{int(year[:4]) + 1}-07-01"
+                    conn.execute("ATTACH DATABASE ? AS archive", (str(archive_dir / f"mealtracker_{year}.db"),))
+                    try:
+                        conn.execute("BEGIN IMMEDIATE")
+                        _ensure_archive_table(conn, table)
+                        params = (cutoff, start, end)
+                        year_where = f"{where} AND {date_column} >= ? AND {date_column} < ?"
+                        inserted = conn.execute(f'INSERT OR IGNORE INTO archive."{table}" ({columns}) '
+                                                f'SELECT {columns} FROM main."{table}" WHERE {year_where}',
+                                                params).rowcount
+                        deleted = conn.execute(f'DELETE FROM main."{table}" WHERE {year_where}', params).rowcount
+                        if inserted != deleted:
+                            # Ids already in this year's archive (a terminal database rebuilt mid-year starts
+                            # its ids over); deleting now would lose the rows that didn't land
+                            raise sqlite3.IntegrityError(
+                                f"{deleted - inserted} {table} rows for {year} clash with ids already in "
+                                f"{archive_dir / f'mealtracker_{year}.db'}; nothing archived for {year}")
+                        conn.execute("COMMIT")
+                        moved[table] += deleted
+                    except sqlite3.Error:
+                        conn.execute("ROLLBACK")
+                        raise
+                    finally:
+                        conn.execute("DETACH DATABASE archive")
+                count(f"archive.{table}.rows", moved[table])
+
+            with timer("archive.compact"):
+                compact(conn)
+        finally:
+            conn.close()
+
+    moved["_bytes_before"] = size_before
+    moved["_bytes_after"] = os.path.getsize(db_path)
+    return moved
+
+
+def display_archive_summary(result, retention_days=RETENTION_DAYS):
+    table = Table(title=f"🗄️ Archived history older than {retention_days} days", header_style="bold magenta")
+    table.add_column("Table", style="cyan")
+    table.add_column("Rows archived", justify="right")
+    for name, rows in result.items():
+        if not name.startswith("_"):
+            table.add_row(name, str(rows))
+    console.print(table)
+    console.print(f"[green]✅ mealtracker.db: {result['_bytes_before'] / 1e6:.1f} MB → "
+                  f"{result['_bytes_after'] / 1e6:.1f} MB[/green]")
+
+
+def archive_history(retention_days=RETENTION_DAYS):
+    """Menu entry point."""
+    try:
+        result = archive_synced_history(retention_days=retention_days)
+    except (sqlite3.Error, OSError) as e:
+        # Each school year is moved in its own transaction, so a failure leaves no half-moved rows
+        console.print(f"[red]❌ Archiving failed: {e}[/red]")
+        return
+    display_archive_summary(result, retention_days)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive synced history out of mealtracker.db.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Keep this many days on the terminal")
+    args = parser.parse_args()
+    archive_history(args.days)
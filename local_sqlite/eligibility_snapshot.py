@@ -0,0 +1,32 @@
+import sqlite3
+
+# Same codes generate_reports uses for the state report
+CODE_LABELS = {"1": "Free", "2": "Reduced", "3": "Paid"}
+CODE_STYLES = {"1": "bold green", "2": "bold yellow", "3": "bold cyan"}
+PAID = "3"
+
+
+def load_eligibility_snapshot(conn, on_date) -> dict:
+    """
+    Resolve the local eligibility table for one day.
+
+    Returns {perm_id: meals_code} for students with a Free or Reduced benefit
+    period covering `on_date`; everyone else is Paid. One query at startup
+    replaces a lookup per scan.
+    """
+    try:
+        rows = conn.execute("""
+            SELECT perm_id, MIN(CASE frm_code WHEN 'Free' THEN '1' WHEN 'Reduced' THEN '2' END)
+            FROM eligibility
+            WHERE (start_date IS NULL OR start_date <= ?)
+              AND (end_date IS NULL OR end_date >= ?)
+            GROUP BY perm_id
+        """, (str(on_date), str(on_date))).fetchall()
+    except sqlite3.OperationalError:
+        # Terminal hasn't pulled eligibility yet
+        return {}
+    return {perm_id: code for perm_id, code in rows if code}
+
+
+def meal_code(snapshot: dict, perm_id) -> str:
+    return snapshot.get(perm_id, PAID)
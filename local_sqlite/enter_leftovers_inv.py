@@ -1,27 +1,22 @@
-import sqlite3
-import pandas as pd
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
 from rich.prompt import Prompt
 from rich.prompt import FloatPrompt, Confirm
-from pathlib import Path
-from utils import upsert_salad_bar
+from entry_archive import append_entries
+from item_catalog import load_catalog
+from utils import connect_db, upsert_salad_bar
 
 DB_FILE = "mealtracker.db"
-EXPORT_FOLDER = "exports"
 console = Console()
 
 def clear_screen():
     import os
     os.system("cls" if os.name == "nt" else "clear")
 
-def get_items():
-    with sqlite3.connect(DB_FILE) as conn:
-        return pd.read_sql_query("SELECT itemid, itemname FROM sorted_items", conn)
-
 def enter_leftovers_and_ending_inv():
-    df_sorted = get_items()
+    catalog = load_catalog(DB_FILE)
+    items = catalog.active()
     clear_screen()
 
     serve_date = Prompt.ask("\U0001F4C5 Enter serve date", default=datetime.now().strftime('%Y-%m-%d'))
@@ -37,17 +32,26 @@ def enter_leftovers_and_ending_inv():
     records = []
     clear_screen()
 
-    console.print("\n\u27A1\uFE0F Enter leftovers and ending inventory for each item (type [bold]'q'[/bold] to quit early):\n", style="bold green")
+    console.print("\n\u27A1\uFE0F Enter leftovers and ending inventory for each item (type [bold]'/name'[/bold] or [bold]'/id'[/bold] to jump to an item, [bold]'q'[/bold] to quit early):\n", style="bold green")
 
-    for _, row in df_sorted.iterrows():
-        itemid = row["itemid"]
-        itemname = row["itemname"]
+    position = 0
+    while position < len(items):
+        itemid, itemname = items[position].itemid, items[position].itemname
+        position += 1
         console.print(f"\n[item]{itemname}[/item]")
 
         leftovers_input = Prompt.ask("  \U0001F37D Leftovers (or 'q' to quit)", default="", show_default=False)
         if leftovers_input.lower() == 'q':
             console.print("\n\U0001F44B Quit requested. Exiting item entry...", style="bold yellow")
             break
+        if leftovers_input.startswith("/"):
+            target = catalog.position(leftovers_input[1:], items)
+            if target is None:
+                console.print(f"\u26A0\uFE0F No item matches '{leftovers_input[1:]}'.", style="bold red")
+                position -= 1
+            else:
+                position = target
+            continue
 
         ending_input = Prompt.ask("  \U0001F4E6 Ending Inventory (or 'q' to quit)", default="", show_default=False)
         if ending_input.lower() == 'q':
@@ -74,6 +78,8 @@ def enter_leftovers_and_ending_inv():
                 continue
 
         if "leftovers" in record or "ending_inv" in record:
+            # Jumping back to an item replaces what was entered for it earlier
+            records = [rec for rec in records if rec["itemid"] != itemid]
             records.append(record)
 
 
@@ -96,18 +102,12 @@ def enter_leftovers_and_ending_inv():
     console.print("\n\U0001F4CB Preview of Data:\n")
     console.print(table)
 
-    # \U0001F4BE Export to Excel
-    df_export = pd.DataFrame.from_records(records)
-    df_export["serve_date"] = serve_date
-    df_export["time_served"] = time_served
-
-    Path(EXPORT_FOLDER).mkdir(exist_ok=True)
-    filename = f"{EXPORT_FOLDER}/leftovers_endinginv_{serve_date.replace('-', '')}.xlsx"
-    df_export.to_excel(filename, index=False)
-    console.print(f"\n\U0001F9FE Data exported to [bold]{filename}[/bold]")
+    # \U0001F4BE Keep a copy of this session in the entry archive (render to Excel with entry_archive.py)
+    filename = append_entries("leftovers_ending_inv", records, serve_date, time_served=time_served)
+    console.print(f"\n\U0001F9FE Data archived to [bold]{filename}[/bold]")
 
     # \u2705 Confirm before DB insert
-    with sqlite3.connect(DB_FILE) as conn:
+    with connect_db(DB_FILE) as conn:
         for rec in records:
             update_fields = {"time_served": time_served}
             if "leftovers" in rec:
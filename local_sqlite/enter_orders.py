@@ -4,10 +4,19 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.table import Table
 from datetime import datetime
-import sqlite3
+import os
 import time
 
+from dotenv import load_dotenv
+
+from order_forecast import suggested_orders
+from utils import connect_db
+
+load_dotenv()
+
 DB_FILE = "mealtracker.db"
+# Suggestions are cached per school by the student sync
+terminal_school = os.getenv("TERMINAL_SCHOOL") or None
 console = Console()
 
 def enter_orders():
@@ -19,11 +28,20 @@ def enter_orders():
         order_date = Prompt.ask("[cyan]Enter order date (YYYY-MM-DD)[/cyan]", default=datetime.now().strftime("%Y-%m-%d"))
         school_id = int(Prompt.ask("[cyan]Enter school ID[/cyan]", default="1"))
 
-        lunch_input = Prompt.ask("[green]Lunch order (press Enter to skip)[/green]", default="")
-        lunch_order = int(lunch_input) if lunch_input.strip().isdigit() else None
+        with connect_db(DB_FILE) as conn:
+            suggested = suggested_orders(conn, order_date, terminal_school)
+        if suggested:
+            console.print("[dim]Suggested from recent weeks' meals served; press Enter to accept, '-' to skip.[/dim]")
+
+        def ask_order(label, meal_type):
+            if meal_type in suggested:
+                answer = Prompt.ask(f"{label} order", default=str(suggested[meal_type]))
+            else:
+                answer = Prompt.ask(f"{label} order (press Enter to skip)", default="")
+            return int(answer) if answer.strip().isdigit() else None
 
-        breakfast_input = Prompt.ask("[blue]Breakfast order (press Enter to skip)[/blue]", default="")
-        breakfast_order = int(breakfast_input) if breakfast_input.strip().isdigit() else None
+        lunch_order = ask_order("[green]Lunch[/green]", "Lunch")
+        breakfast_order = ask_order("[blue]Breakfast[/blue]", "Breakfast")
 
         if lunch_order is None and breakfast_order is None:
             console.print("[yellow]⚠️ No data entered. Aborting.[/yellow]")
@@ -48,7 +66,7 @@ def enter_orders():
             console.print("[yellow]❌ Operation cancelled.[/yellow]")
             return
 
-        with sqlite3.connect(DB_FILE) as conn:
+        with connect_db(DB_FILE) as conn:
             cursor = conn.cursor()
             # Check for existing record
             cursor.execute("""
@@ -72,7 +90,8 @@ def enter_orders():
                 console.print(f"[green]✅ Order added for {order_date} (School ID: {school_id})[/green]")
 
             conn.commit()
-            time.sleep(1.5)
+        # Pause only after the connection is closed so sync and scans aren't kept waiting
+        time.sleep(1.5)
 
     except Exception as e:
         console.print(f"[bold red]❌ Error: {e}[/bold red]")
@@ -1,5 +1,3 @@
-import sqlite3
-import pandas as pd
 from datetime import datetime
 from rich.console import Console
 from rich.prompt import Prompt, Confirm
@@ -7,23 +5,21 @@ from rich.panel import Panel
 from rich.table import Table
 import os
 
+from entry_archive import append_entries
+from item_catalog import load_catalog
+from utils import connect_db
+
 # Constants
 DB_FILE = "mealtracker.db"
-EXPORT_FOLDER = "exports"
-os.makedirs(EXPORT_FOLDER, exist_ok=True)
 
 console = Console()
 
 def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
-def get_items():
-    """Fetch items from sorted_items table."""
-    with sqlite3.connect(DB_FILE) as conn:
-        return pd.read_sql_query("SELECT itemid, itemname FROM sorted_items", conn)
-
 def enter_units_rcvd_data():
-    df_sorted = get_items()
+    catalog = load_catalog(DB_FILE)
+    items = catalog.active()
     serve_date = datetime.now().strftime('%Y-%m-%d')
     clear_screen()
 
@@ -34,17 +30,26 @@ def enter_units_rcvd_data():
     ))
 
     records = []
-    console.print("\n[bold blue]➡️ Enter data for each item[/bold blue] (Enter for 0, or 'q' to quit):\n")
+    console.print("\n[bold blue]➡️ Enter data for each item[/bold blue] (Enter for 0, '/name' or '/id' to jump to an item, or 'q' to quit):\n")
 
-    for _, row in df_sorted.iterrows():
-        itemid = row['itemid']
-        itemname = row['itemname']
+    position = 0
+    while position < len(items):
+        itemid, itemname = items[position].itemid, items[position].itemname
+        position += 1
         console.rule(f"[bold yellow]{itemname}[/bold yellow]")
 
         units_received = Prompt.ask("  Units Received", default="0")
         if units_received.lower() == 'q':
             console.print("  ↪️ [italic]Quitting item entry early...[/italic]")
             break
+        if units_received.startswith("/"):
+            target = catalog.position(units_received[1:], items)
+            if target is None:
+                console.print(f"  [red]⚠️ No item matches '{units_received[1:]}'.[/red]")
+                position -= 1
+            else:
+                position = target
+            continue
         try:
             units_received = float(units_received)
         except ValueError:
@@ -64,6 +69,8 @@ def enter_units_rcvd_data():
                 console.print("  [red]⚠️ Invalid input. Skipping item.[/red]")
                 continue
 
+        # Jumping back to an item replaces what was entered for it earlier
+        records = [rec for rec in records if rec['itemid'] != itemid]
         records.append({
             'itemid': itemid,
             'itemname': itemname,
@@ -121,21 +128,16 @@ def enter_units_rcvd_data():
             except (ValueError, IndexError):
                 console.print("[red]❌ Invalid index. Try again.[/red]")
 
-    # Export to Excel
-    df_export = pd.DataFrame.from_records(records)
-    df_export["serve_date"] = serve_date
-    df_export["time_rcvd"] = time_rcvd
-    filename_base = f"{EXPORT_FOLDER}/saladbar_rcvd_{serve_date.replace('-', '')}"
-    export_path = f"{filename_base}.xlsx"
-    df_export.to_excel(export_path, index=False)
-    console.print(f"\n📁 [bold]Data exported to:[/bold] [green]{export_path}[/green]")
+    # Keep a copy of this session in the entry archive (render to Excel with entry_archive.py)
+    export_path = append_entries("units_received", records, serve_date, time_rcvd=time_rcvd)
+    console.print(f"\n📁 [bold]Data archived to:[/bold] [green]{export_path}[/green]")
 
     if not Confirm.ask("💾 Save to database now?", default=True):
         console.print("[yellow]⚠️ Data was not saved to database.[/yellow]")
         return
 
     # Insert or update database records
-    with sqlite3.connect(DB_FILE) as conn:
+    with connect_db(DB_FILE) as conn:
         for rec in records:
             cursor = conn.execute(
                 "SELECT 1 FROM salad_bar WHERE itemid = ? AND serve_date = ?",
@@ -0,0 +1,144 @@
+"""
+Append-only Parquet archive for the salad bar entry screens.
+
+Every save from enter_units_rcvd / enter_leftovers_inv appends one small
+zstd-compressed Parquet file under
+
+    exports/archive/kind=<kind>/month=<YYYY-MM>/<session>.parquet
+
+Nothing is overwritten, so a second entry on the same day sits next to the
+first (each row carries its session and entry time). Audits read the whole
+archive, or just the months they need, in one pyarrow dataset scan, and the
+county's Excel copy is rendered on demand:
+
+    python entry_archive.py render --start 2025-03-01 --end 2025-03-31
+    python entry_archive.py render --start 2025-03-01 --end 2025-03-31 --kind units_received --latest
+"""
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+ARCHIVE_DIR = Path("exports") / "archive"
+KINDS = ("units_received", "leftovers_ending_inv")
+COMPRESSION = "zstd"
+
+# One schema for both kinds (unused columns are null) so a single scan reads every file
+ENTRY_COLUMNS = {
+    "itemid": "int64", "itemname": "string",
+    "units_received": "float64", "temp_rcvd": "float64", "time_rcvd": "string",
+    "leftovers": "float64", "ending_inv": "float64", "time_served": "string",
+    "serve_date": "string", "session": "string", "entered_at": "string",
+}
+
+
+def entry_schema():
+    import pyarrow as pa
+
+    return pa.schema([(name, pa.type_for_alias(kind)) for name, kind in ENTRY_COLUMNS.items()])
+
+
+def append_entries(kind, records, serve_date, archive_dir=ARCHIVE_DIR, **fields):
+    """
+    Append one session's records. `fields` (e.g. time_rcvd) are stored on every
+    row; keys outside ENTRY_COLUMNS are dropped. Returns the file written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if kind not in KINDS:
+        raise ValueError(f"unknown entry kind {kind!r}")
+    entered_at = datetime.now()
+    session = entered_at.strftime("%Y%m%dT%H%M%S%f")
+    rows = [{**rec, **fields, "serve_date": serve_date, "session": session,
+             "entered_at": entered_at.isoformat(timespec="seconds")} for rec in records]
+
+    partition = Path(archive_dir) / f"kind={kind}" / f"month={serve_date[:7]}"
+    partition.mkdir(parents=True, exist_ok=True)
+    path = partition / f"{session}.parquet"
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(pa.Table.from_pylist(rows, schema=entry_schema()), tmp, compression=COMPRESSION)
+    # Readers only pick up *.parquet, so a half-written file is never seen
+    tmp.replace(path)
+    return path
+
+
+def read_entries(start=None, end=None, kind=None, latest=False, archive_dir=ARCHIVE_DIR):
+    """
+    Scan the archive into a DataFrame, pruning to the months between start and
+    end. With latest=True only the last entry per kind, item and serve date is kept.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    archive_dir = Path(archive_dir)
+    if not any(archive_dir.glob("kind=*/month=*/*.parquet")):
+        return pd.DataFrame()
+
+    partitions = pa.schema([("kind", pa.string()), ("month", pa.string())])
+    dataset = ds.dataset(archive_dir, format="parquet", exclude_invalid_files=True,
+                         schema=pa.unify_schemas([entry_schema(), partitions]),
+                         partitioning=ds.partitioning(partitions, flavor="hive"))
+    condition = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if kind:
+        condition = both(condition, ds.field("kind") == kind)
+    if start:
+        condition = both(condition, (ds.field("month") >= start[:7]) & (ds.field("serve_date") >= start))
+    if end:
+        condition = both(condition, (ds.field("month") <= end[:7]) & (ds.field("serve_date") <= end))
+
+    table = dataset.to_table(filter=condition)
+    if table.num_rows == 0:
+        return pd.DataFrame()
+    table = table.sort_by([("kind", "ascending"), ("serve_date", "ascending"), ("session", "ascending")])
+    df = table.to_pandas()
+    if latest:
+        df = df.drop_duplicates(["kind", "serve_date", "itemid"], keep="last")
+    return df.reset_index(drop=True)
+
+
+def render_excel(start, end, kind=None, latest=False, out_dir=Path("exports"), archive_dir=ARCHIVE_DIR):
+    """Write the entries for a date range to one workbook, one sheet per kind. Returns the path or None."""
+    import pandas as pd
+
+    df = read_entries(start, end, kind=kind, latest=latest, archive_dir=archive_dir)
+    if df.empty:
+        return None
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"salad_bar_entries_{start}_{end}{'_' + kind if kind else ''}.xlsx"
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for sheet_kind, group in df.groupby("kind", observed=True):
+            group.dropna(axis="columns", how="all").drop(columns=["kind", "month"]).to_excel(
+                writer, sheet_name=str(sheet_kind)[:31], index=False
+            )
+    return path
+
+
+def main():
+    from rich.console import Console
+
+    console = Console()
+    parser = argparse.ArgumentParser(description="Salad bar entry archive tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    render = sub.add_parser("render", help="Render a date range to Excel")
+    render.add_argument("--start", required=True, help="YYYY-MM-DD")
+    render.add_argument("--end", required=True, help="YYYY-MM-DD")
+    render.add_argument("--kind", choices=KINDS)
+    render.add_argument("--latest", action="store_true", help="Only the last entry per item and day")
+    args = parser.parse_args()
+
+    path = render_excel(args.start, args.end, kind=args.kind, latest=args.latest)
+    if path:
+        console.print(f"📁 [bold]Entries exported to:[/bold] [green]{path}[/green]")
+    else:
+        console.print("[yellow]⚠️ No entries archived in that range[/yellow]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compact ErrorLogs sync.
+
+ErrorLogs rows aren't sent one by one. Each sync sends one row per
+terminal, log date, meal and error message, with the number of errors and
+the distinct PINs involved, for every date that got new errors since the
+last sync. Dates are always re-aggregated in full, so the central upsert
+(keyed on terminal, date, meal and error) replaces whatever an earlier sync
+sent for the same day. postgres_admin/error_log_report.py reads the result.
+
+ErrorLogs has no synced flag; the highest id already sent is kept in the
+local `error_log_sync` table, and archive_history.py only archives ErrorLogs
+up to it. SUMMARY_DDL creates the central table; both the direct sync and
+the ingest service run it before writing, so neither depends on the report
+having been run first.
+"""
+
+SUMMARY_TABLE = "error_log_summary"
+SUMMARY_KEY = ["terminal", "log_date", "meal_type", "error_type"]
+SUMMARY_COLUMNS = SUMMARY_KEY + ["error_count", "distinct_pins", "pins", "first_time", "last_time"]
+
+SUMMARY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+    terminal TEXT NOT NULL,
+    log_date DATE NOT NULL,
+    meal_type TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    error_count INTEGER NOT NULL,
+    distinct_pins INTEGER NOT NULL,
+    pins BIGINT[] NOT NULL,
+    first_time TEXT,
+    last_time TEXT,
+    synced_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY ({', '.join(SUMMARY_KEY)})
+);
+CREATE INDEX IF NOT EXISTS {SUMMARY_TABLE}_date_idx ON {SUMMARY_TABLE} (log_date);
+"""
+
+SYNC_DDL = """
+CREATE TABLE IF NOT EXISTS error_log_sync (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    high_id INTEGER NOT NULL
+)
+"""
+
+# pins goes over as a PostgreSQL array literal ('{123,456}') so it survives both the
+# direct insert and the ingest service's CSV COPY
+SUMMARY_QUERY = """
+SELECT ? AS terminal, log_date, COALESCE(meal_type, ''), COALESCE(error_message, ''),
+       COUNT(*), COUNT(DISTINCT perm_id),
+       '{' || COALESCE(GROUP_CONCAT(DISTINCT perm_id), '') || '}',
+       MIN(log_time), MAX(log_time)
+FROM ErrorLogs
+WHERE log_date IN (SELECT DISTINCT log_date FROM ErrorLogs WHERE id > ?)
+GROUP BY log_date, COALESCE(meal_type, ''), COALESCE(error_message, '')
+ORDER BY log_date
+"""
+
+UPSERT_SQL = f"""
+INSERT INTO {SUMMARY_TABLE} ({', '.join(SUMMARY_COLUMNS)}) VALUES %s
+ON CONFLICT ({', '.join(SUMMARY_KEY)}) DO UPDATE SET
+    {', '.join(f'{c} = EXCLUDED.{c}' for c in SUMMARY_COLUMNS if c not in SUMMARY_KEY)},
+    synced_at = now()
+"""
+
+
+def synced_error_log_id(conn) -> int:
+    conn.execute(SYNC_DDL)
+    row = conn.execute("SELECT high_id FROM error_log_sync WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def mark_error_logs_synced(conn, high_id):
+    """Record that ErrorLogs up to high_id are summarised centrally. The caller commits."""
+    conn.execute(SYNC_DDL)
+    conn.execute("""
+        INSERT INTO error_log_sync (id, high_id) VALUES (1, ?)
+        ON CONFLICT (id) DO UPDATE SET high_id = MAX(high_id, excluded.high_id)
+    """, (high_id,))
+
+
+def summarize_error_logs(conn, terminal_id, after_id=None):
+    """
+    Summary rows (in SUMMARY_COLUMNS order) for every date with ErrorLogs
+    newer than after_id (default: the last synced id), and the highest
+    ErrorLogs id they cover. Returns ([], None) when nothing is new.
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ErrorLogs' COLLATE NOCASE").fetchone():
+        # No scan has logged an error on this terminal yet
+        return [], None
+    if after_id is None:
+        after_id = synced_error_log_id(conn)
+    high_id = conn.execute("SELECT MAX(id) FROM ErrorLogs WHERE id > ?", (after_id,)).fetchone()[0]
+    if high_id is None:
+        return [], None
+    rows = conn.execute(SUMMARY_QUERY, (terminal_id, after_id)).fetchall()
+    return [list(row) for row in rows], high_id
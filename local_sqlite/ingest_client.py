@@ -0,0 +1,284 @@
+"""
+Client side of the central ingest service (postgres_admin/ingest_service.py).
+
+Unsynced rows are packed into batches of up to BATCH_ROWS rows per table,
+numbered with a per-terminal sequence, tagged with a random id this database
+picks once (so a rebuilt terminal starting its sequence over is not taken for
+a resend) and saved to the local `ingest_outbox` table before they are sent.
+New ErrorLogs go the same way as one batch of per-day summary rows (see
+error_log_sync.py), which the service upserts. A batch is only marked synced
+(and its rows flagged synced = 1) once the service acknowledges it, so a lost
+response or a service restart just means the same batch is resent and
+recognised as a duplicate.
+
+A batch the service refuses outright (malformed, too large, or rows the
+database won't accept) would fail the same way on every resend, so it is
+marked rejected with the service's reason and skipped; its rows stay
+unsynced on the terminal and the batches after it still go out. Once the
+cause is fixed (on the terminal or centrally), `python ingest_client.py
+--requeue` rebuilds rejected batches from the rows as they are now and the
+next sync sends them again. Connection
+errors and other refusals (5xx, a wrong token or URL) stop the send, and
+everything unacked is retried next sync.
+
+Enabled in sync_meals_orders by setting INGEST_URL (and INGEST_TOKEN if the
+service requires one) in .env.
+"""
+import gzip
+import json
+import urllib.error
+import urllib.request
+import uuid
+
+from error_log_sync import (SUMMARY_COLUMNS, SUMMARY_TABLE, mark_error_logs_synced, summarize_error_logs,
+                            synced_error_log_id)
+from metrics import count, timer
+from utils import connect_db
+
+BATCH_ROWS = 5000
+REQUEST_TIMEOUT = 30
+
+OUTBOX_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    high_rowid INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    payload BLOB,
+    acked INTEGER NOT NULL DEFAULT 0,
+    rejected TEXT
+)
+"""
+
+# Statuses that mean this batch itself is bad; anything else is retried
+REJECT_STATUSES = (400, 413, 422)
+
+
+IDENTITY_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_identity (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    database_id TEXT NOT NULL
+)
+"""
+
+
+def database_id(conn) -> str:
+    """Random id of this mealtracker.db, created on first use."""
+    conn.execute(IDENTITY_DDL)
+    conn.execute("INSERT OR IGNORE INTO ingest_identity (id, database_id) VALUES (1, ?)", (uuid.uuid4().hex,))
+    conn.commit()
+    return conn.execute("SELECT database_id FROM ingest_identity WHERE id = 1").fetchone()[0]
+
+
+class IngestError(Exception):
+    pass
+
+
+class BatchRejected(IngestError):
+    pass
+
+
+def _clean(value):
+    # Same normalisation the direct sync applies before inserting
+    return None if value in ("", "NaN") else value
+
+
+def _encode(batch) -> bytes:
+    return gzip.compress(json.dumps(batch, separators=(",", ":")).encode())
+
+
+def _low_rowid(conn, table, seq) -> int:
+    """Where the range of outbox batch `seq` starts: just after the previous batch of the same table."""
+    return conn.execute(
+        "SELECT COALESCE(MAX(high_rowid), 0) FROM ingest_outbox WHERE table_name = ? AND seq < ?", (table, seq)
+    ).fetchone()[0]
+
+
+def build_batches(conn, terminal_id, tables_to_transfer, batch_rows=BATCH_ROWS):
+    """
+    Move unsynced rows into new outbox batches. Rows already in an unacked
+    batch are skipped, so building twice never double-sends.
+    """
+    source = database_id(conn)
+    for table, exclude in tables_to_transfer.items():
+        columns = [c[1] for c in conn.execute(f"PRAGMA table_info({table})") if c[1] not in exclude]
+        start = conn.execute(
+            "SELECT COALESCE(MAX(high_rowid), 0) FROM ingest_outbox WHERE table_name = ?", (table,)
+        ).fetchone()[0]
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {', '.join(columns)} FROM {table} "
+                f"WHERE synced = 0 AND rowid > ? ORDER BY rowid LIMIT ?", (start, batch_rows)
+            ).fetchall()
+            if not rows:
+                break
+            start = rows[-1][0]
+            cursor = conn.execute(
+                "INSERT INTO ingest_outbox (table_name, high_rowid, row_count) VALUES (?, ?, ?)",
+                (table, start, len(rows)),
+            )
+            batch = {
+                "terminal": terminal_id, "database": source, "seq": cursor.lastrowid, "table": table,
+                "columns": columns,
+                "rows": [[_clean(v) for v in row[1:]] for row in rows],
+            }
+            conn.execute("UPDATE ingest_outbox SET payload = ? WHERE seq = ?", (_encode(batch), cursor.lastrowid))
+            conn.commit()
+
+
+def build_error_summary_batch(conn, terminal_id):
+    """Queue one summary batch for the days with ErrorLogs not yet summarised (or already queued)."""
+    start = conn.execute(
+        "SELECT COALESCE(MAX(high_rowid), 0) FROM ingest_outbox WHERE table_name = ?", (SUMMARY_TABLE,)
+    ).fetchone()[0]
+    rows, high_id = summarize_error_logs(conn, terminal_id, after_id=max(start, synced_error_log_id(conn)))
+    if not rows:
+        return
+    cursor = conn.execute(
+        "INSERT INTO ingest_outbox (table_name, high_rowid, row_count) VALUES (?, ?, ?)",
+        (SUMMARY_TABLE, high_id, len(rows)),
+    )
+    batch = {"terminal": terminal_id, "database": database_id(conn), "seq": cursor.lastrowid, "table": SUMMARY_TABLE,
+             "columns": SUMMARY_COLUMNS, "rows": rows}
+    conn.execute("UPDATE ingest_outbox SET payload = ? WHERE seq = ?", (_encode(batch), cursor.lastrowid))
+    conn.commit()
+
+
+def post_batch(url, payload, token=None):
+    request = urllib.request.Request(
+        url.rstrip("/") + "/batches", data=payload, method="POST",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip",
+                 **({"X-Ingest-Token": token} if token else {})},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode(errors="replace")
+        if e.code in REJECT_STATUSES:
+            raise BatchRejected(f"HTTP {e.code}: {detail}") from e
+        raise IngestError(f"HTTP {e.code}: {detail}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise IngestError(f"service unreachable: {e}") from e
+
+
+def ensure_outbox(conn):
+    conn.execute(OUTBOX_DDL)
+    # Outboxes created before batches could be rejected
+    if "rejected" not in {c[1] for c in conn.execute("PRAGMA table_info(ingest_outbox)")}:
+        conn.execute("ALTER TABLE ingest_outbox ADD COLUMN rejected TEXT")
+        conn.commit()
+
+
+def rejected_batches(conn) -> list:
+    """(seq, table, row count, reason) of every batch the service has rejected."""
+    return conn.execute(
+        "SELECT seq, table_name, row_count, rejected FROM ingest_outbox WHERE rejected IS NOT NULL ORDER BY seq"
+    ).fetchall()
+
+
+def requeue_rejected(conn, seqs=None) -> dict:
+    """
+    Rebuild rejected batches (all, or those in `seqs`) from the rows now in
+    their range, so the next sync sends them again under the same seq. A
+    batch with nothing unsynced left in its range is dropped.
+    Returns {seq: rows requeued}, 0 for dropped batches.
+    """
+    requeued = {}
+    rejected = conn.execute(
+        "SELECT seq, table_name, high_rowid, payload FROM ingest_outbox WHERE rejected IS NOT NULL ORDER BY seq"
+    ).fetchall()
+    for seq, table, high_rowid, payload in rejected:
+        if seqs and seq not in seqs:
+            continue
+        # Keeps terminal, database, seq and the column list the batch was built with
+        batch = json.loads(gzip.decompress(payload))
+        low_rowid = _low_rowid(conn, table, seq)
+        if table == SUMMARY_TABLE:
+            # Days are re-aggregated in full, so this also picks up anything logged since
+            rows, high_id = summarize_error_logs(conn, batch["terminal"], after_id=low_rowid)
+            high_rowid = high_id or high_rowid
+        else:
+            rows = [[_clean(v) for v in row] for row in conn.execute(
+                f"SELECT {', '.join(batch['columns'])} FROM {table} "
+                f"WHERE synced = 0 AND rowid > ? AND rowid <= ? ORDER BY rowid", (low_rowid, high_rowid)
+            )]
+        if rows:
+            conn.execute(
+                "UPDATE ingest_outbox SET high_rowid = ?, row_count = ?, payload = ?, rejected = NULL WHERE seq = ?",
+                (high_rowid, len(rows), _encode({**batch, "rows": rows}), seq),
+            )
+        else:
+            conn.execute("DELETE FROM ingest_outbox WHERE seq = ?", (seq,))
+        conn.commit()
+        requeued[seq] = len(rows)
+    return requeued
+
+
+def send_outbox(conn, url, token=None):
+    """
+    Send every pending batch in order. Returns {table: rows acknowledged}.
+    Rejected batches are recorded and skipped; any other failure stops the send.
+    """
+    sent = {}
+    pending = conn.execute(
+        "SELECT seq, table_name, high_rowid, row_count, payload FROM ingest_outbox "
+        "WHERE acked = 0 AND rejected IS NULL ORDER BY seq"
+    ).fetchall()
+    for seq, table, high_rowid, row_count, payload in pending:
+        try:
+            with timer("sync.ingest.post"):
+                result = post_batch(url, payload, token)
+        except BatchRejected as e:
+            # Payload is kept for requeue_rejected, which needs its column list
+            conn.execute("UPDATE ingest_outbox SET rejected = ? WHERE seq = ?", (str(e), seq))
+            conn.commit()
+            count(f"sync.{table}.rejected_rows", row_count)
+            continue
+        if result.get("status") not in ("ok", "duplicate"):
+            raise IngestError(f"unexpected reply for batch {seq}: {result}")
+        if table == SUMMARY_TABLE:
+            mark_error_logs_synced(conn, high_rowid)
+        else:
+            # Only this batch's rows: an earlier batch may have been rejected and must stay unsynced
+            conn.execute(f"UPDATE {table} SET synced = 1 WHERE synced = 0 AND rowid > ? AND rowid <= ?",
+                         (_low_rowid(conn, table, seq), high_rowid))
+        conn.execute("UPDATE ingest_outbox SET acked = 1, payload = NULL WHERE seq = ?", (seq,))
+        conn.commit()
+        sent[table] = sent.get(table, 0) + row_count
+        count(f"sync.{table}.rows", row_count)
+    return sent
+
+
+def sync_via_ingest(db_path, url, terminal_id, tables_to_transfer, token=None):
+    """Build and send batches. Returns ({table: rows acknowledged}, rejected_batches())."""
+    conn = connect_db(db_path)
+    try:
+        ensure_outbox(conn)
+        with timer("sync.ingest.build"):
+            build_batches(conn, terminal_id, tables_to_transfer)
+            build_error_summary_batch(conn, terminal_id)
+        sent = send_outbox(conn, url, token)
+        return sent, rejected_batches(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils import DB_FILE
+
+    parser = argparse.ArgumentParser(description="List or requeue outbox batches the ingest service rejected.")
+    parser.add_argument("--requeue", nargs="*", type=int, metavar="SEQ",
+                        help="Rebuild these rejected batches (all of them if no SEQ is given)")
+    args = parser.parse_args()
+
+    with connect_db(DB_FILE) as conn:
+        ensure_outbox(conn)
+        if args.requeue is not None:
+            for seq, rows in requeue_rejected(conn, set(args.requeue)).items():
+                print(f"✅ Batch {seq}: {rows} rows requeued" if rows
+                      else f"🗑️ Batch {seq}: nothing unsynced left, dropped")
+        for seq, table, rows, reason in rejected_batches(conn):
+            print(f"❌ Batch {seq} ({rows} rows from {table}) rejected: {reason}")
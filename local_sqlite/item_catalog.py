@@ -0,0 +1,156 @@
+"""
+Item catalog shared by the salad bar entry screens.
+
+`sorted_items` is read once with plain sqlite3 into an ItemCatalog and
+reused until the database file changes, so the screens open without a
+query. Items come back in catalog order (sort_order, then table order);
+items switched off with `active = 0` are skipped by the screens but still
+resolvable by id for older records. Both columns are optional and are only
+added when an item is first hidden or moved:
+
+    python item_catalog.py list
+    python item_catalog.py hide 12
+    python item_catalog.py show 12
+    python item_catalog.py move 12 1
+"""
+import os
+from bisect import bisect_left
+from collections import namedtuple
+
+from utils import DB_FILE, connect_db
+
+Item = namedtuple("Item", ["itemid", "itemname", "sort_order", "active"])
+
+_cache = {}
+
+
+class ItemCatalog:
+    def __init__(self, items):
+        self.items = tuple(items)
+        self.by_id = {item.itemid: item for item in self.items}
+        # Lower-cased names sorted once, for prefix lookups by bisect
+        names = sorted((item.itemname.lower(), pos) for pos, item in enumerate(self.items))
+        self._names = [name for name, _ in names]
+        self._positions = [pos for _, pos in names]
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, itemid):
+        return self.by_id.get(itemid)
+
+    def active(self) -> list:
+        return [item for item in self.items if item.active]
+
+    def find(self, text) -> list:
+        """Items whose id equals `text` or whose name starts with it (any case), in catalog order."""
+        text = text.strip()
+        if text.isdigit() and int(text) in self.by_id:
+            return [self.by_id[int(text)]]
+        prefix = text.lower()
+        if not prefix:
+            return []
+        start = bisect_left(self._names, prefix)
+        end = start
+        while end < len(self._names) and self._names[end].startswith(prefix):
+            end += 1
+        return [self.items[pos] for pos in sorted(self._positions[start:end])]
+
+    def position(self, text, items) -> int:
+        """Index in `items` of the first item `text` matches, or None."""
+        matches = {item.itemid for item in self.find(text)}
+        return next((i for i, item in enumerate(items) if item.itemid in matches), None)
+
+
+def _stamp(db_file):
+    # With WAL, committed writes may only be in the -wal file until a checkpoint
+    stamp = []
+    for path in (db_file, f"{db_file}-wal"):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def load_catalog(db_file=DB_FILE) -> ItemCatalog:
+    """The catalog for `db_file`, reloaded only if the database changed since last time."""
+    stamp = _stamp(db_file)
+    cached = _cache.get(db_file)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with connect_db(db_file) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sorted_items)")}
+        sort_order = "sort_order" if "sort_order" in columns else "NULL"
+        active = "active" if "active" in columns else "1"
+        rows = conn.execute(f"""
+            SELECT itemid, itemname, {sort_order}, COALESCE({active}, 1)
+            FROM sorted_items
+            ORDER BY {sort_order} IS NULL, {sort_order}, rowid
+        """).fetchall()
+
+    catalog = ItemCatalog(Item(itemid, itemname or "", order, bool(flag)) for itemid, itemname, order, flag in rows)
+    _cache[db_file] = (_stamp(db_file), catalog)
+    return catalog
+
+
+def _ensure_columns(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(sorted_items)")}
+    if "sort_order" not in columns:
+        conn.execute("ALTER TABLE sorted_items ADD COLUMN sort_order INTEGER")
+    if "active" not in columns:
+        conn.execute("ALTER TABLE sorted_items ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+
+
+def set_active(itemid, active, db_file=DB_FILE):
+    with connect_db(db_file) as conn:
+        _ensure_columns(conn)
+        conn.execute("UPDATE sorted_items SET active = ? WHERE itemid = ?", (int(active), itemid))
+
+
+def move_item(itemid, position, db_file=DB_FILE):
+    """Put an item at 1-based `position` in catalog order, renumbering the rest."""
+    order = [item.itemid for item in load_catalog(db_file).items if item.itemid != itemid]
+    order.insert(max(position - 1, 0), itemid)
+    with connect_db(db_file) as conn:
+        _ensure_columns(conn)
+        conn.executemany("UPDATE sorted_items SET sort_order = ? WHERE itemid = ?",
+                         [(n, item) for n, item in enumerate(order, start=1)])
+
+
+def main():
+    import argparse
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Show or arrange the salad bar item catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    for name in ("hide", "show"):
+        sub.add_parser(name).add_argument("itemid", type=int)
+    move = sub.add_parser("move")
+    move.add_argument("itemid", type=int)
+    move.add_argument("position", type=int)
+    args = parser.parse_args()
+
+    if args.command == "hide":
+        set_active(args.itemid, False)
+    elif args.command == "show":
+        set_active(args.itemid, True)
+    elif args.command == "move":
+        move_item(args.itemid, args.position)
+
+    table = Table(title="🥕 Item Catalog", header_style="bold magenta")
+    table.add_column("#", justify="right")
+    table.add_column("Item ID", justify="right")
+    table.add_column("Name", style="cyan")
+    table.add_column("Active")
+    for n, item in enumerate(load_catalog().items, start=1):
+        table.add_row(str(n), str(item.itemid), item.itemname, "✅" if item.active else "—")
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,52 @@
-def mealtracker():
+def clear_screen():
     import os
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+
+def mealtracker(db_file="mealtracker.db", clear_fn=clear_screen, pins=None, console=None, peer=None):
+    """
+    Run the scan loop. PINs are read from the keyboard unless `pins` is given,
+    in which case they are taken from that iterable (used to replay scans).
+
+    With peer mode configured (see peer_sync.py) or a `peer` passed in,
+    duplicates are also checked against the school's other terminal.
+    """
     import shutil
     import sqlite3
+    from collections import Counter
     from datetime import datetime, date
     from rich.console import Console
     from rich.panel import Panel
-
-    console = Console()
-    DB_FILE = "mealtracker.db"
-    conn = sqlite3.connect(DB_FILE)
+    from eligibility_snapshot import CODE_LABELS, CODE_STYLES, load_eligibility_snapshot, meal_code
+    from peer_sync import PeerSync
+    from metrics import count, timer
+    from roster_snapshot import load_roster_snapshot
+    from utils import connect_db
+
+    console = console or Console()
+    conn = connect_db(db_file)
     cursor = conn.cursor()
     history = []
 
     current_date = date.today()
 
+    # Free/Reduced/Paid resolved once for today; scans only do a dict lookup
+    eligibility = load_eligibility_snapshot(conn, current_date)
+    # Mapped roster for name lookups; None (stale or missing) means every lookup goes to SQLite
+    roster = load_roster_snapshot(conn, db_file)
+    tally = {"Breakfast": Counter(), "Lunch": Counter()}
+    cursor.execute("SELECT meal_type, perm_id FROM Meals WHERE meals_date = ?;", (current_date,))
+    served_today = cursor.fetchall()
+    for meal_type, served_id in served_today:
+        tally.setdefault(meal_type, Counter())[meal_code(eligibility, served_id)] += 1
+
+    owns_peer = peer is None
+    if owns_peer:
+        peer = PeerSync.from_env(current_date, [(served_id, meal_type) for meal_type, served_id in served_today])
+
     def clear_screen():
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if clear_fn:
+            clear_fn()
 
     def get_current_meal():
         now = datetime.now().time()
@@ -35,12 +66,23 @@ def mealtracker():
         """, (current_date, meal))
         return {row[0] for row in cursor.fetchall()}
 
+    def find_student(perm_id):
+        student = roster.lookup(perm_id) if roster else None
+        if student is None:
+            # Not in the snapshot (or no snapshot): a student added since it was written is still found.
+            # A throwaway cursor resets its statement when dropped, so no read stays open while waiting for the next PIN
+            student = conn.execute(
+                "SELECT first_name, last_name, staff FROM students WHERE perm_id = ?", (perm_id,)
+            ).fetchone()
+        return student
+
     def check_perm_id(perm_id, meal):
-        cursor.execute("SELECT first_name, last_name, staff FROM students WHERE perm_id = ?", (perm_id,))
-        student = cursor.fetchone()
+        with timer("scan.lookup"):
+            student = find_student(perm_id)
         if student:
             return student
         else:
+            count("scan.not_found")
             console.print("[bold red]No matching student found.[/bold red]")
             log_error(perm_id, meal, "No Student Found")
             return False
@@ -50,11 +92,16 @@ def mealtracker():
             history_text = "\n".join(history[-5:])
             console.print(Panel(history_text, title="[bold yellow]Last 5 Entries[/bold yellow]", style="bold magenta"))
 
-    def center_and_display_name(perm_id):
+    def show_tally(meal):
+        counts = tally.get(meal, Counter())
+        parts = [f"[{CODE_STYLES[code]}]{label}: {counts[code]}[/{CODE_STYLES[code]}]"
+                 for code, label in CODE_LABELS.items()]
+        console.print(f"[bold]{meal} today[/bold]  " + "   ".join(parts) + f"   [bold]Total: {sum(counts.values())}[/bold]")
+
+    def center_and_display_name(perm_id, code=None, meal=None):
         columns, _ = shutil.get_terminal_size()
         clear_screen()
-        cursor.execute("SELECT first_name, last_name FROM students WHERE perm_id = ?", (perm_id,))
-        student = cursor.fetchone()
+        student = find_student(perm_id)
         if student:
             full_name = f"{student[0]} {student[1]}".center(columns)
             history.append(f"{student[0]} {student[1]}")
@@ -62,25 +109,50 @@ def mealtracker():
             full_name = f"Student {perm_id}".center(columns)
 
         console.print(Panel(full_name, style="bold green"))
+        if code:
+            console.print(Panel(CODE_LABELS[code].center(columns - 4), style=CODE_STYLES[code]))
+        if meal:
+            show_tally(meal)
         console.print("\n[bold cyan]Enter the next PIN code at the bottom:[/bold cyan]")
         show_history()
 
+    def report_peer_conflicts():
+        # Served on both lines within the same instant; flag it now rather than at month-end
+        for conflict_id, conflict_meal, other in peer.pop_conflicts():
+            console.print(f"[bold red]⚠️ PIN {conflict_id} was also served {conflict_meal} on terminal {other}![/bold red]")
+            log_error(conflict_id, conflict_meal, "Record Already Exists On Peer")
+
     def record_meal(perm_id):
         meal = get_current_meal()
-        cursor.execute("""
-            SELECT COUNT(*) FROM Meals WHERE perm_id = ? AND meals_date = ? AND meal_type = ?;
-        """, (perm_id, current_date, meal))
-        if cursor.fetchone()[0] > 0:
+        with timer("scan.duplicate_check"):
+            exists = conn.execute("""
+                SELECT COUNT(*) FROM Meals WHERE perm_id = ? AND meals_date = ? AND meal_type = ?;
+            """, (perm_id, current_date, meal)).fetchone()[0] > 0
+            other_terminal = peer.served_by(perm_id, meal) if peer and not exists else None
+        if exists:
+            count("scan.duplicate")
             console.print("[bold red]This meal record already exists![/bold red]")
             log_error(perm_id, meal, "Record Already Exists")
             return
+        if other_terminal:
+            count("scan.peer_duplicate")
+            console.print(f"[bold red]Already served {meal} on terminal {other_terminal}![/bold red]")
+            log_error(perm_id, meal, "Record Already Exists On Peer")
+            return
         try:
-            cursor.execute("""
-                INSERT INTO Meals (perm_id, meals_date, meal_type)
-                VALUES (?, ?, ?);
-            """, (perm_id, current_date, meal))
-            conn.commit()
-            center_and_display_name(perm_id)
+            with timer("scan.insert"):
+                cursor.execute("""
+                    INSERT INTO Meals (perm_id, meals_date, meal_type)
+                    VALUES (?, ?, ?);
+                """, (perm_id, current_date, meal))
+                conn.commit()
+            if peer:
+                peer.record(perm_id, meal)
+            code = meal_code(eligibility, perm_id)
+            tally.setdefault(meal, Counter())[code] += 1
+            count("scan.recorded")
+            with timer("scan.render"):
+                center_and_display_name(perm_id, code, meal)
         except sqlite3.Error as e:
             console.print(f"[bold red]Error recording meal: {e}[/bold red]")
             conn.rollback()
@@ -89,9 +161,17 @@ def mealtracker():
     clear_screen()
     console.print(f"\n[bold cyan]Here I am to Save the Day ...  Super MealTracker![/bold cyan]")
     console.print(f"[bold]The date is: {current_date.strftime('%m-%d')}[/bold]")
+    show_tally(get_current_meal())
+    if peer:
+        console.print(f"[bold]Peer mode:[/bold] {len(peer.peers)} peer(s), {peer.online_peers()} online")
+
+    pin_iter = iter(pins) if pins is not None else None
 
     while True:
-        perm_id = input("Enter PIN Code (or 'q' to quit): ").strip()
+        if pin_iter is None:
+            perm_id = input("Enter PIN Code (or 'q' to quit): ").strip()
+        else:
+            perm_id = str(next(pin_iter, "q")).strip()
         if perm_id.lower() == "q":
             console.print("[bold cyan]Exiting Meal Tracker. Goodbye![/bold cyan]")
             break
@@ -102,13 +182,21 @@ def mealtracker():
 
         perm_id = int(perm_id)
         meal = get_current_meal()
-        if check_perm_id(perm_id, meal):
-            record_meal(perm_id)
-
+        with timer("scan.total"):
+            if check_perm_id(perm_id, meal):
+                record_meal(perm_id)
+        if peer:
+            report_peer_conflicts()
+
+    if peer and owns_peer:
+        peer.stop()
+    if roster:
+        roster.close()
     cursor.close()
     conn.close()
 
 
 # Run the function
 if __name__ == "__main__":
-    mealtracker()
+    from metrics import profile
+    profile("mealtracker", mealtracker)
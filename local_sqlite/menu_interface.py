@@ -2,7 +2,7 @@
 import sys
 import os
 from rich.console import Console
-from rich.prompt import Prompt
+from rich.prompt import Confirm, Prompt
 from rich.panel import Panel
 
 from enter_leftovers_inv import enter_leftovers_and_ending_inv
@@ -11,7 +11,9 @@ from enter_units_rcvd import enter_units_rcvd_data
 from mealtracker_local import mealtracker
 from sync_meals_orders import sync_meals_orders
 from sync_students_from_postgres import sync_students_from_postgres
-from student_entry import add_students
+from student_entry import add_students, add_students_bulk
+from archive_history import archive_history
+from metrics import profile, show_metrics
 
 console = Console()
 
@@ -29,6 +31,8 @@ def show_menu():
 [5] 🔄 Add New Students to local SQLite db
 [6] 🔄 Sync Meals/Orders/Salad Bar to PostgreSQL
 [7] 👥 Update Students from PostgreSQL
+[8] 📈 View Metrics
+[9] 🗄️ Archive Synced History
 [q] ❌ Quit
 """, style="bold")
 
@@ -37,7 +41,7 @@ def main():
     while True:
         try:
             show_menu()
-            choice = Prompt.ask("Pick an option", choices=["1", "2", "3", "4", "5", "6", "7", "q"], default="q")
+            choice = Prompt.ask("Pick an option", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9", "q"], default="q")
             
             if choice == "1":
                 console.print("▶️ [yellow]Orders function not wired up yet[/yellow]")
@@ -49,16 +53,23 @@ def main():
                 enter_units_rcvd_data()
             elif choice == "4":
                 console.print("📊 [yellow]MealTracker function not wired up yet[/yellow]")
-                mealtracker()
+                profile("mealtracker", mealtracker)
             elif choice == "5":
                 console.print("📊 [yellow]add students to local SQLite db function not wired up yet[/yellow]")
-                add_students()
+                if Confirm.ask("Add several students at once (typed, pasted or from a CSV)?", default=False):
+                    add_students_bulk()
+                else:
+                    add_students()
             elif choice == "6":
                 console.print("📊 [yellow]sync meals/orders/sala_bar to postgres function not wired up yet[/yellow]")
-                sync_meals_orders(dry_run=False)
+                profile("sync_meals_orders", sync_meals_orders, dry_run=False)
             elif choice == "7":
                 console.print("📊 [yellow]update students function not wired up yet[/yellow]")
-                sync_students_from_postgres()
+                profile("sync_students_from_postgres", sync_students_from_postgres)
+            elif choice == "8":
+                show_metrics(console)
+            elif choice == "9":
+                archive_history()
             elif choice == "q":
                 console.print("\n👋 See you next meal!", style="bold green")
                 break
@@ -0,0 +1,197 @@
+"""
+Lightweight timers and counters for the terminal and admin scripts.
+
+    from metrics import timer, count
+
+    with timer("scan.lookup"):
+        ...
+    count("scan.not_found")
+
+Each timer keeps a cumulative latency histogram plus the most recent samples
+for rolling percentiles. Everything is written to metrics.json (and
+metrics.prom in Prometheus text format) at most every FLUSH_SECONDS and on
+exit, and reloaded on start so numbers accumulate across runs.
+
+Set MEALTRACKER_PROFILE to an entry point name (e.g. "mealtracker",
+"sync_meals_orders", or "all") to also run it under cProfile; profiles are
+saved to profiles/. When unset, profile() is a plain call.
+"""
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+METRICS_FILE = Path(os.getenv("MEALTRACKER_METRICS", "metrics.json"))
+PROFILE_DIR = Path("profiles")
+PROFILE_TARGETS = {t.strip() for t in os.getenv("MEALTRACKER_PROFILE", "").split(",") if t.strip()}
+
+FLUSH_SECONDS = 30
+RECENT_SAMPLES = 1000
+# Upper bounds in seconds; scans live in the first few, reports in the last
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+
+_timers = {}
+_counters = {}
+_last_flush = time.monotonic()
+
+
+def _new_timer():
+    return {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS) + 1),
+            "recent": deque(maxlen=RECENT_SAMPLES)}
+
+
+def _load():
+    try:
+        data = json.loads(METRICS_FILE.read_text())
+    except (OSError, ValueError):
+        return
+    for name, saved in data.get("timers", {}).items():
+        t = _new_timer()
+        t.update(count=saved["count"], sum=saved["sum"], max=saved["max"], buckets=saved["buckets"])
+        if len(t["buckets"]) != len(BUCKETS) + 1:
+            t["buckets"] = [0] * (len(BUCKETS) + 1)
+        t["recent"].extend(saved.get("recent", []))
+        _timers[name] = t
+    _counters.update(data.get("counters", {}))
+
+
+def observe(name, seconds):
+    t = _timers.get(name)
+    if t is None:
+        t = _timers[name] = _new_timer()
+    t["count"] += 1
+    t["sum"] += seconds
+    if seconds > t["max"]:
+        t["max"] = seconds
+    t["buckets"][bisect_left(BUCKETS, seconds)] += 1
+    t["recent"].append(seconds)
+    if time.monotonic() - _last_flush > FLUSH_SECONDS:
+        flush()
+
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def count(name, n=1):
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def snapshot() -> dict:
+    """Current timers and counters, with rolling p50/p95/p99 over the recent samples."""
+    timers = {}
+    for name, t in sorted(_timers.items()):
+        recent = list(t["recent"])
+        timers[name] = {
+            "count": t["count"], "sum": t["sum"], "max": t["max"], "buckets": list(t["buckets"]),
+            "p50": percentile(recent, 50), "p95": percentile(recent, 95), "p99": percentile(recent, 99),
+            "recent": recent,
+        }
+    return {"updated": datetime.now().isoformat(timespec="seconds"), "timers": timers,
+            "counters": dict(sorted(_counters.items()))}
+
+
+def to_prometheus(snap: dict) -> str:
+    lines = []
+    for name, t in snap["timers"].items():
+        metric = "mealtracker_" + name.replace(".", "_").replace("-", "_") + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ["+Inf"], t["buckets"]):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum {t['sum']:.6f}")
+        lines.append(f"{metric}_count {t['count']}")
+    for name, value in snap["counters"].items():
+        metric = "mealtracker_" + name.replace(".", "_").replace("-", "_") + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not _timers and not _counters:
+        return
+    snap = snapshot()
+    try:
+        tmp = METRICS_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snap))
+        os.replace(tmp, METRICS_FILE)
+        METRICS_FILE.with_suffix(".prom").write_text(to_prometheus(snap))
+    except OSError:
+        # Metrics must never get in the way of serving meals
+        pass
+
+
+def profile(entry_point, fn, *args, **kwargs):
+    """Call fn, under cProfile if MEALTRACKER_PROFILE names this entry point."""
+    if entry_point not in PROFILE_TARGETS and "all" not in PROFILE_TARGETS:
+        return fn(*args, **kwargs)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        PROFILE_DIR.mkdir(exist_ok=True)
+        path = PROFILE_DIR / f"{entry_point}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+        profiler.dump_stats(path)
+        print(f"Profile saved: {path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+
+def show_metrics(console=None):
+    """Print the recorded timers and counters as rich tables."""
+    from rich.console import Console
+    from rich.table import Table
+
+    console = console or Console()
+    snap = snapshot()
+    if not snap["timers"] and not snap["counters"]:
+        console.print("[yellow]⚠️ No metrics recorded yet[/yellow]")
+        return
+
+    def ms(value):
+        return "" if value is None else f"{value * 1000:.2f}"
+
+    table = Table(title="📈 Stage Timings (ms)", header_style="bold magenta")
+    table.add_column("Stage", style="cyan")
+    for label in ("Count", "p50", "p95", "p99", "Max", "Total s"):
+        table.add_column(label, justify="right")
+    for name, t in snap["timers"].items():
+        table.add_row(name, str(t["count"]), ms(t["p50"]), ms(t["p95"]), ms(t["p99"]), ms(t["max"]),
+                      f"{t['sum']:.2f}")
+    console.print(table)
+
+    if snap["counters"]:
+        counters = Table(title="🔢 Counters", header_style="bold magenta")
+        counters.add_column("Counter", style="cyan")
+        counters.add_column("Value", justify="right")
+        for name, value in snap["counters"].items():
+            counters.add_row(name, str(value))
+        console.print(counters)
+    console.print(f"[dim]Saved to {METRICS_FILE.resolve()}[/dim]")
+
+
+_load()
+atexit.register(flush)
@@ -0,0 +1,176 @@
+"""
+Suggested lunch and breakfast orders, forecast from served-meal history.
+
+sync_students_from_postgres pulls daily served counts per school and meal
+from the central database and runs `forecast_orders` over them in one
+pandas pass; the results are cached in the local `order_suggestions` table,
+so enter_orders only reads one row per meal for its defaults.
+
+For each school and meal the forecast for a day is
+
+    expected  = mean served on the same weekday over the last WEEKDAY_WEEKS weeks
+                x trend (last RECENT_DAYS service days vs. the last BASELINE_DAYS,
+                clipped to TREND_LIMITS)
+    suggested = expected + BUFFER_MISSES x typical miss, rounded up
+
+where the typical miss is the standard deviation of what the same rule would
+have missed by over the last BASELINE_DAYS service days. Days without any
+meals served (holidays, breaks) are not service days and are ignored.
+
+    python order_forecast.py        # show the cached suggestions
+"""
+import sqlite3
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from utils import DB_FILE, connect_db
+
+WEEKDAY_WEEKS = 4
+RECENT_DAYS = 5
+BASELINE_DAYS = 20
+TREND_LIMITS = (0.85, 1.15)
+BUFFER_MISSES = 0.5
+# Weekday observations needed before a day gets a suggestion
+MIN_WEEKDAY_DAYS = 2
+HORIZON_DAYS = 14
+HISTORY_DAYS = 120
+
+SERIES = ["school", "meal_type"]
+
+SUGGESTIONS_DDL = """
+CREATE TABLE IF NOT EXISTS order_suggestions (
+    school TEXT NOT NULL,
+    order_date TEXT NOT NULL,
+    meal_type TEXT NOT NULL,
+    suggested INTEGER NOT NULL,
+    expected REAL,
+    typical_miss REAL,
+    based_on INTEGER,
+    computed_at TEXT,
+    PRIMARY KEY (school, order_date, meal_type)
+)
+"""
+
+
+def _rolling(frame, keys, column, window, stat, min_periods=1) -> pd.Series:
+    # Grouped rolling window, realigned to frame's index
+    rolled = getattr(frame.groupby(keys, sort=False)[column].rolling(window, min_periods=min_periods), stat)()
+    return rolled.reset_index(level=list(range(len(keys))), drop=True)
+
+
+def forecast_orders(history: pd.DataFrame, start: date, horizon_days=HORIZON_DAYS) -> pd.DataFrame:
+    """
+    Suggestions for the weekdays from `start` through `horizon_days` days later.
+
+    `history` has one row per school, meals_date, meal_type with the number
+    served. Returns school, order_date, meal_type, suggested, expected,
+    typical_miss and based_on (same-weekday days behind the mean).
+    """
+    columns = ["school", "order_date", "meal_type", "suggested", "expected", "typical_miss", "based_on"]
+    if history.empty:
+        return pd.DataFrame(columns=columns)
+
+    h = history.assign(meals_date=pd.to_datetime(history["meals_date"]), served=history["served"].astype(float))
+    h = h.sort_values(SERIES + ["meals_date"], ignore_index=True)
+    h["weekday"] = h["meals_date"].dt.weekday
+
+    weekday = SERIES + ["weekday"]
+    h["weekday_mean"] = _rolling(h, weekday, "served", WEEKDAY_WEEKS, "mean")
+    h["weekday_days"] = h.groupby(weekday, sort=False).cumcount().add(1).clip(upper=WEEKDAY_WEEKS)
+
+    recent = _rolling(h, SERIES, "served", RECENT_DAYS, "mean")
+    baseline = _rolling(h, SERIES, "served", BASELINE_DAYS, "mean")
+    h["trend"] = (recent / baseline.replace(0, np.nan)).fillna(1.0).clip(*TREND_LIMITS)
+
+    # What the rule would have said the day before each service day, to size the buffer
+    prior_mean = h.groupby(weekday, sort=False)["weekday_mean"].shift(1)
+    prior_trend = h.groupby(SERIES, sort=False)["trend"].shift(1)
+    h["miss"] = h["served"] - prior_mean * prior_trend.fillna(1.0)
+    h["typical_miss"] = _rolling(h, SERIES, "miss", BASELINE_DAYS, "std", min_periods=2)
+
+    # Latest value of every rolling statistic: one row per series, one per series and weekday
+    series_now = h.groupby(SERIES, sort=False)[["trend", "typical_miss"]].last().reset_index()
+    weekday_now = h.groupby(weekday, sort=False)[["weekday_mean", "weekday_days"]].last().reset_index()
+    weekday_now = weekday_now[weekday_now["weekday_days"] >= MIN_WEEKDAY_DAYS]
+
+    days = pd.date_range(start, periods=horizon_days + 1, freq="D")
+    days = pd.DataFrame({"order_date": days[days.weekday < 5]})
+    days["weekday"] = days["order_date"].dt.weekday
+
+    out = weekday_now.merge(days, on="weekday").merge(series_now, on=SERIES)
+    out["expected"] = out["weekday_mean"] * out["trend"]
+    out["typical_miss"] = out["typical_miss"].fillna(0.0)
+    out["suggested"] = np.ceil(out["expected"] + BUFFER_MISSES * out["typical_miss"]).astype(int)
+    out["order_date"] = out["order_date"].dt.strftime("%Y-%m-%d")
+    out["based_on"] = out["weekday_days"].astype(int)
+    out[["expected", "typical_miss"]] = out[["expected", "typical_miss"]].round(1)
+    return out[columns].sort_values(["school", "order_date", "meal_type"], ignore_index=True)
+
+
+def write_order_suggestions(conn, suggestions: pd.DataFrame) -> int:
+    """Replace the cached suggestions with `suggestions`. Returns the number of rows written."""
+    computed_at = datetime.now().isoformat(timespec="seconds")
+    conn.execute(SUGGESTIONS_DDL)
+    conn.execute("DELETE FROM order_suggestions")
+    conn.executemany("""
+        INSERT INTO order_suggestions
+            (school, order_date, meal_type, suggested, expected, typical_miss, based_on, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(*row, computed_at) for row in suggestions[
+        ["school", "order_date", "meal_type", "suggested", "expected", "typical_miss", "based_on"]
+    ].itertuples(index=False, name=None)])
+    conn.commit()
+    return len(suggestions)
+
+
+def suggested_orders(conn, order_date, school=None) -> dict:
+    """
+    {meal_type: suggested} for one day. Without a school, suggestions are
+    only returned if the cache holds a single school.
+    """
+    try:
+        rows = conn.execute("""
+            SELECT school, meal_type, suggested FROM order_suggestions
+            WHERE order_date = ? AND (? IS NULL OR school = ?)
+        """, (str(order_date), school, school)).fetchall()
+    except sqlite3.OperationalError:
+        # Terminal hasn't cached any suggestions yet
+        return {}
+    if len({row[0] for row in rows}) > 1:
+        return {}
+    return {meal_type: suggested for _, meal_type, suggested in rows}
+
+
+def main():
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    with connect_db(DB_FILE) as conn:
+        try:
+            rows = conn.execute("""
+                SELECT school, order_date, meal_type, suggested, expected, typical_miss, based_on, computed_at
+                FROM order_suggestions
+                WHERE order_date >= ?
+                ORDER BY school, order_date, meal_type DESC
+            """, (date.today().isoformat(),)).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+    if not rows:
+        console.print("[yellow]⚠️ No order suggestions cached; run the student sync first[/yellow]")
+        return
+
+    table = Table(title=f"📈 Order suggestions (computed {rows[0][7]})", header_style="bold magenta")
+    for column in ("School", "Date", "Meal", "Suggested", "Expected", "± Typical miss", "Weeks"):
+        table.add_column(column, justify="right" if column not in ("School", "Meal") else "left")
+    for school, order_date, meal_type, suggested, expected, miss, based_on, _ in rows:
+        day = datetime.strptime(order_date, "%Y-%m-%d").strftime("%a %m-%d")
+        table.add_row(school or "-", day, meal_type, str(suggested), f"{expected:.1f}",
+                      f"{miss:.1f}", str(based_on))
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
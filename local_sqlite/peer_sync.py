@@ -0,0 +1,229 @@
+"""
+Cross-terminal duplicate detection for terminals at the same school.
+
+Each terminal announces every meal it records to its peers over UDP and keeps
+a merged served-set of (perm_id, meal) for today, so a student who goes
+through the other line is flagged at scan time instead of at month-end.
+
+Lost datagrams and restarts are repaired by a periodic "want" message that
+carries how many records we hold from each terminal; a terminal that sees a
+peer is behind resends its records for the day. When no peer answers the
+scan loop simply keeps working on its local Meals table.
+
+Configure in .env on each terminal:
+
+    TERMINAL_ID=wrs-1
+    PEER_LISTEN=0.0.0.0:50555
+    PEER_ADDRESSES=192.168.1.21:50555
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+SYNC_INTERVAL = 2.0
+PEER_TIMEOUT = 6.0
+RECORDS_PER_DATAGRAM = 200
+MAX_DATAGRAM = 65507
+
+
+def parse_address(value: str) -> tuple:
+    host, _, port = value.strip().rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+class PeerSync:
+    def __init__(self, terminal_id, listen, peers, on_date, own_records=()):
+        self.terminal_id = terminal_id
+        self.on_date = str(on_date)
+        self.peers = [parse_address(p) if isinstance(p, str) else p for p in peers]
+        self.peer_hosts = {socket.gethostbyname(host) for host, _ in self.peers}
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(parse_address(listen) if isinstance(listen, str) else listen)
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.settimeout(0.5)
+
+        self.lock = threading.Lock()
+        self.own = set()              # {(perm_id, meal)} recorded on this terminal today
+        self.served = {}              # (perm_id, meal) -> terminal_id that served it
+        self.received = {}            # terminal_id -> set of (perm_id, meal) it announced
+        self.counts = {}              # terminal_id -> records held from it
+        self.last_seen = {}           # terminal_id -> monotonic time of last message
+        self.conflicts = []           # (perm_id, meal, other terminal) served on both lines
+        self._stop = threading.Event()
+        self._threads = []
+
+        for perm_id, meal in own_records:
+            self._add_own(int(perm_id), meal)
+
+    @classmethod
+    def from_env(cls, on_date, own_records=()):
+        """
+        Build from TERMINAL_ID / PEER_LISTEN / PEER_ADDRESSES, or None if peer
+        mode is off or can't be set up (a peer name that doesn't resolve, a port
+        in use); the scan loop then runs on its local Meals table alone.
+        """
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        listen = os.getenv("PEER_LISTEN")
+        peers = [p for p in os.getenv("PEER_ADDRESSES", "").split(",") if p.strip()]
+        if not listen or not peers:
+            return None
+        terminal_id = os.getenv("TERMINAL_ID") or socket.gethostname()
+        try:
+            peer = cls(terminal_id, listen, peers, on_date, own_records)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Peer sync disabled, couldn't set up {listen} -> {', '.join(peers)}: {e}")
+            return None
+        peer.start()
+        return peer
+
+    # --- state -------------------------------------------------------------
+
+    def _add_own(self, perm_id, meal):
+        # A set, so a meal recorded twice (duplicate Meals rows) doesn't count twice against what peers hold
+        self.own.add((perm_id, meal))
+        self.served.setdefault((perm_id, meal), self.terminal_id)
+        self.counts[self.terminal_id] = len(self.own)
+
+    def _add_remote(self, terminal_id, records):
+        with self.lock:
+            received = self.received.setdefault(terminal_id, set())
+            for perm_id, meal in records:
+                key = (int(perm_id), meal)
+                if key in received:
+                    continue
+                received.add(key)
+                if self.served.setdefault(key, terminal_id) == self.terminal_id:
+                    # Both lines served this student before either heard about it
+                    self.conflicts.append((key[0], meal, terminal_id))
+            self.counts[terminal_id] = len(received)
+
+    def served_by(self, perm_id, meal):
+        """Terminal that already served this student this meal today, if it wasn't us."""
+        with self.lock:
+            owner = self.served.get((int(perm_id), meal))
+        return owner if owner and owner != self.terminal_id else None
+
+    def record(self, perm_id, meal):
+        """Note a meal recorded locally and announce it to the peers."""
+        with self.lock:
+            self._add_own(int(perm_id), meal)
+        self._send_all({"t": "served", "from": self.terminal_id, "date": self.on_date,
+                        "recs": [[int(perm_id), meal]]})
+
+    def pop_conflicts(self) -> list:
+        with self.lock:
+            conflicts, self.conflicts = self.conflicts, []
+        return conflicts
+
+    def online_peers(self) -> int:
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for tid, seen in self.last_seen.items() if now - seen < PEER_TIMEOUT)
+
+    # --- network -----------------------------------------------------------
+
+    def _send(self, message, address):
+        payload = json.dumps(message, separators=(",", ":")).encode()
+        if len(payload) > MAX_DATAGRAM:
+            return
+        try:
+            self.sock.sendto(payload, address)
+        except OSError:
+            # Peer down or network unreachable: stay local-only until it's back
+            pass
+
+    def _send_all(self, message):
+        for address in self.peers:
+            self._send(message, address)
+
+    def _send_own_records(self, address):
+        with self.lock:
+            records = list(self.own)
+        for i in range(0, len(records), RECORDS_PER_DATAGRAM):
+            self._send({"t": "served", "from": self.terminal_id, "date": self.on_date,
+                        "recs": records[i:i + RECORDS_PER_DATAGRAM]}, address)
+
+    def _want(self):
+        with self.lock:
+            have = dict(self.counts)
+        self._send_all({"t": "want", "from": self.terminal_id, "date": self.on_date, "have": have})
+
+    def _receive_loop(self):
+        while not self._stop.is_set():
+            try:
+                payload, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    break
+                continue
+
+            if address[0] not in self.peer_hosts:
+                continue
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                continue
+            sender = message.get("from")
+            if not sender or sender == self.terminal_id or message.get("date") != self.on_date:
+                continue
+
+            with self.lock:
+                self.last_seen[sender] = time.monotonic()
+
+            if message.get("t") == "served":
+                self._add_remote(sender, message.get("recs", []))
+            elif message.get("t") == "want":
+                with self.lock:
+                    behind = message.get("have", {}).get(self.terminal_id, 0) < len(self.own)
+                if behind:
+                    self._send_own_records(address)
+
+    def _sync_loop(self):
+        while not self._stop.wait(SYNC_INTERVAL):
+            self._want()
+
+    def start(self):
+        for target in (self._receive_loop, self._sync_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._want()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    # Stand-alone peer for checking the LAN link: prints what the other terminal serves
+    import argparse
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description="Run a listen-only MealTracker peer.")
+    parser.add_argument("--terminal", default=socket.gethostname())
+    parser.add_argument("--listen", required=True, help="host:port")
+    parser.add_argument("--peer", action="append", required=True, help="host:port (repeatable)")
+    args = parser.parse_args()
+
+    peer = PeerSync(args.terminal, args.listen, args.peer, date.today())
+    peer.start()
+    print(f"Listening on {args.listen} as {args.terminal}; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            print(f"peers online: {peer.online_peers()}  served records: {len(peer.served)}")
+    except KeyboardInterrupt:
+        peer.stop()
@@ -0,0 +1,146 @@
+"""
+Memory-mapped roster snapshot for the scan loop.
+
+`mealtracker.roster` (next to mealtracker.db) holds the students table in a
+compact binary form:
+
+    header   magic, format, student count, name bytes, roster version, CRC-32
+    ids      sorted perm_ids, int64 little-endian
+    offsets  count + 1 uint32 offsets into the name blob
+    names    "first\\x1flast\\x1fstaff" per student, UTF-8
+
+The scan loop maps the file read-only and finds students by binary search over
+the id array, so startup costs an mmap instead of a query and every terminal
+process shares the same pages.
+
+Triggers on `students` bump `roster_version` on any insert, update or delete.
+A snapshot whose version doesn't match, or that fails its checksum, is ignored,
+and the scan loop then looks students up in SQLite as before. The snapshot is
+rewritten by sync_students_from_postgres and after students are added on the
+terminal.
+"""
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_left
+from pathlib import Path
+
+MAGIC = b"MTRS"
+FORMAT_VERSION = 1
+# magic, format, reserved, count, name bytes, roster version, crc32, padding (keeps the id array 8-byte aligned)
+HEADER = struct.Struct("<4sHHIIQI4x")
+SEPARATOR = "\x1f"
+
+VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS roster_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO roster_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS students_roster_insert AFTER INSERT ON students
+BEGIN UPDATE roster_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS students_roster_update AFTER UPDATE ON students
+BEGIN UPDATE roster_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS students_roster_delete AFTER DELETE ON students
+BEGIN UPDATE roster_version SET version = version + 1 WHERE id = 1; END;
+"""
+
+
+def snapshot_path(db_file) -> Path:
+    return Path(db_file).with_suffix(".roster")
+
+
+def roster_version(conn):
+    """Current roster version, or None if the version triggers aren't installed yet."""
+    try:
+        row = conn.execute("SELECT version FROM roster_version WHERE id = 1").fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+def write_roster_snapshot(conn, db_file) -> int:
+    """Write the snapshot for the roster in `conn`. Returns the number of students written."""
+    conn.executescript(VERSION_DDL)
+    version = roster_version(conn)
+    rows = conn.execute("SELECT perm_id, first_name, last_name, staff FROM students ORDER BY perm_id").fetchall()
+
+    names, offsets, position = [], [0], 0
+    for _, *fields in rows:
+        encoded = SEPARATOR.join("" if f is None else str(f) for f in fields).encode()
+        names.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+
+    body = (struct.pack(f"<{len(rows)}q", *(row[0] for row in rows))
+            + struct.pack(f"<{len(offsets)}I", *offsets)
+            + b"".join(names))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(rows), position, version, zlib.crc32(body))
+
+    path = snapshot_path(db_file)
+    tmp = path.with_suffix(".roster.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header + body)
+        f.flush()
+        os.fsync(f.fileno())
+    # On Windows this fails while a running scan loop has the old file mapped; it stays stale
+    # (and is ignored) until the next write
+    tmp.replace(path)
+    return len(rows)
+
+
+class RosterSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, fmt, _, n, name_bytes, self.version, crc = HEADER.unpack_from(self._mm)
+            ids_end = HEADER.size + 8 * n
+            offsets_end = ids_end + 4 * (n + 1)
+            if magic != MAGIC or fmt != FORMAT_VERSION or len(self._mm) != offsets_end + name_bytes:
+                raise ValueError(f"{path} is not a roster snapshot")
+            # The with block releases the parent view even on error, so close() can always unmap
+            with memoryview(self._mm) as view:
+                if zlib.crc32(view[HEADER.size:]) != crc:
+                    raise ValueError(f"{path} failed its checksum")
+                # Zero-copy views straight onto the mapped pages
+                self._ids = view[HEADER.size:ids_end].cast("q")
+                self._offsets = view[ids_end:offsets_end].cast("I")
+                self._names = view[offsets_end:]
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup(self, perm_id):
+        """(first_name, last_name, staff) for perm_id, or None."""
+        i = bisect_left(self._ids, perm_id)
+        if i == len(self._ids) or self._ids[i] != perm_id:
+            return None
+        return tuple(bytes(self._names[self._offsets[i]:self._offsets[i + 1]]).decode().split(SEPARATOR))
+
+    def close(self):
+        for name in ("_ids", "_offsets", "_names"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        if not self._mm.closed:
+            self._mm.close()
+
+
+def load_roster_snapshot(conn, db_file):
+    """The mapped snapshot if it exists, is intact and matches the roster in `conn`; otherwise None."""
+    path = snapshot_path(db_file)
+    if not path.exists():
+        return None
+    try:
+        snapshot = RosterSnapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if snapshot.version != roster_version(conn):
+        snapshot.close()
+        return None
+    return snapshot
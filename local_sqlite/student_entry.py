@@ -1,3 +1,5 @@
+import csv
+import json
 import sqlite3
 import time
 from rich.console import Console
@@ -6,6 +8,9 @@ from rich.text import Text
 from rich.panel import Panel
 from rich.table import Table
 
+from roster_snapshot import write_roster_snapshot
+from utils import connect_db
+
 # Optional helper to clear screen
 def clear_screen():
     import os
@@ -16,10 +21,8 @@ console = Console()
 def add_students(db_file: str = "mealtracker.db", clear_fn=clear_screen):
     """Insert a new student into the students table."""
 
+    conn = cursor = None
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-
         if clear_fn:
             clear_fn()
 
@@ -51,12 +54,15 @@ def add_students(db_file: str = "mealtracker.db", clear_fn=clear_screen):
             console.print("[yellow]Operation cancelled.[/yellow]")
             return
 
-        # Insert into DB
+        # Connect only once the student is confirmed, so nothing is held open during the prompts
+        conn = connect_db(db_file)
+        cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO students (perm_id, first_name, last_name, staff)
             VALUES (?, ?, ?, ?);
         """, (perm_id, first_name, last_name, staff))
         conn.commit()
+        refresh_roster_snapshot(conn, db_file)
 
         success = Text(f"✅ Student {first_name} {last_name} added successfully!", style="bold green")
         console.print(success)
@@ -64,12 +70,186 @@ def add_students(db_file: str = "mealtracker.db", clear_fn=clear_screen):
 
     except sqlite3.Error as e:
         console.print(Text(f"❌ Error inserting student: {e}", style="bold red"))
-        conn.rollback()
+        if conn:
+            conn.rollback()
+
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def refresh_roster_snapshot(conn, db_file):
+    # Keeps the scan loop's mapped roster current; if it can't be written, scans fall back to SQLite
+    try:
+        write_roster_snapshot(conn, db_file)
+    except OSError as e:
+        console.print(f"[yellow]⚠️ Roster snapshot not updated: {e}[/yellow]")
+
+
+def _split_line(line: str) -> list:
+    # Rows pasted from a spreadsheet are tab-separated; typed ones use commas
+    if "\t" in line:
+        return [field.strip() for field in line.split("\t")]
+    return [field.strip() for field in next(csv.reader([line]), [])]
+
+
+def read_student_csv(path) -> list:
+    """Rows of a perm_id, first_name, last_name, staff CSV; a header row is skipped."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [[field.strip() for field in row] for row in csv.reader(f) if any(field.strip() for field in row)]
+    if rows and not rows[0][0].isdigit():
+        rows = rows[1:]
+    return rows
+
+
+def parse_student_rows(rows) -> tuple:
+    """
+    Validate raw rows of (perm_id, first name, last name, staff).
+
+    Returns (students, problems): students is {perm_id: (first_name, last_name, staff)}
+    in entry order (a repeated ID keeps its last row), problems is [(row number, row text, reason)].
+    """
+    students, problems = {}, []
+    for number, row in enumerate(rows, start=1):
+        text = ", ".join(row)
+        if len(row) != 4:
+            problems.append((number, text, "expected ID, first name, last name, staff"))
+            continue
+        perm_id, first_name, last_name, staff = row
+        if not perm_id.isdigit():
+            problems.append((number, text, "student ID must be numeric"))
+        elif not all([first_name, last_name, staff]):
+            problems.append((number, text, "all fields are required"))
+        else:
+            students.pop(int(perm_id), None)
+            students[int(perm_id)] = (first_name, last_name, staff.lower())
+    return students, problems
+
+
+def classify_students(conn, students: dict) -> dict:
+    """{perm_id: (status, current row)} with status new / update / unchanged, from one roster query."""
+    current = {
+        row[0]: tuple(row[1:]) for row in conn.execute("""
+            SELECT perm_id, first_name, last_name, staff FROM students
+            WHERE perm_id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(students)),))
+    }
+    result = {}
+    for perm_id, values in students.items():
+        if perm_id not in current:
+            result[perm_id] = ("new", None)
+        elif current[perm_id] != values:
+            result[perm_id] = ("update", current[perm_id])
+        else:
+            result[perm_id] = ("unchanged", current[perm_id])
+    return result
+
+
+def upsert_students(conn, students: dict):
+    """Insert or update every student in one transaction; school is left as synced."""
+    with conn:
+        conn.executemany("""
+            INSERT INTO students (perm_id, first_name, last_name, staff)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (perm_id) DO UPDATE SET
+                first_name = excluded.first_name,
+                last_name = excluded.last_name,
+                staff = excluded.staff
+        """, [(perm_id, *values) for perm_id, values in students.items()])
+
+
+def add_students_bulk(db_file: str = "mealtracker.db", clear_fn=clear_screen, csv_path=None):
+    """Add or correct many students at once, typed, pasted or read from a CSV."""
+    if clear_fn:
+        clear_fn()
+    console.print(Panel("Add Students in Bulk", title="Meal Tracker", style="bold cyan"))
+
+    if csv_path is None:
+        csv_path = Prompt.ask("[cyan]CSV file (blank to type or paste students)[/cyan]", default="",
+                              show_default=False).strip()
+    if csv_path:
+        try:
+            rows = read_student_csv(csv_path)
+        except OSError as e:
+            console.print(f"[bold red]❌ Can't read {csv_path}: {e}[/bold red]")
+            return
+    else:
+        console.print("One student per line: [bold]ID, first name, last name, staff[/bold] "
+                      "(tabs work too, so rows can be pasted from a spreadsheet). Blank line to finish.")
+        rows = []
+        while True:
+            line = input(f"{len(rows) + 1:>3}> ").strip()
+            if not line:
+                break
+            rows.append(_split_line(line))
+
+    students, problems = parse_student_rows(rows)
+    if problems:
+        table = Table(title="⚠️ Rows Skipped", header_style="bold red")
+        table.add_column("Row", justify="right")
+        table.add_column("Entered")
+        table.add_column("Problem", style="red")
+        for number, text, reason in problems:
+            table.add_row(str(number), text, reason)
+        console.print(table)
+    if not students:
+        console.print("[yellow]No students to add.[/yellow]")
+        return
+
+    conn = None
+    try:
+        conn = connect_db(db_file)
+        status = classify_students(conn, students)
+        counts = {kind: sum(1 for s, _ in status.values() if s == kind) for kind in ("new", "update", "unchanged")}
+
+        table = Table(title="Review Students", show_header=True, header_style="bold magenta")
+        table.add_column("Status")
+        table.add_column("Student ID", style="cyan")
+        table.add_column("First Name")
+        table.add_column("Last Name")
+        table.add_column("Staff")
+        table.add_column("Currently", style="dim")
+        styles = {"new": "green", "update": "yellow", "unchanged": "dim"}
+        for perm_id, (first_name, last_name, staff) in students.items():
+            kind, current = status[perm_id]
+            table.add_row(f"[{styles[kind]}]{kind}[/{styles[kind]}]", str(perm_id), first_name, last_name, staff,
+                          ", ".join(current) if kind == "update" else "")
+        console.print("\n")
+        console.print(table)
+        console.print(f"[green]{counts['new']} new[/green], [yellow]{counts['update']} to update[/yellow], "
+                      f"{counts['unchanged']} unchanged")
+
+        to_write = {pid: values for pid, values in students.items() if status[pid][0] != "unchanged"}
+        if not to_write:
+            console.print("[blue]ℹ️ Roster already up to date.[/blue]")
+            return
+        if not Confirm.ask(f"\n✅ Save these {len(to_write)} students?"):
+            console.print("[yellow]Operation cancelled.[/yellow]")
+            return
+
+        upsert_students(conn, to_write)
+        refresh_roster_snapshot(conn, db_file)
+        console.print(Text(f"✅ {counts['new']} students added, {counts['update']} updated.", style="bold green"))
+        time.sleep(1)
+
+    except sqlite3.Error as e:
+        console.print(Text(f"❌ Error saving students: {e}", style="bold red"))
 
     finally:
-        cursor.close()
-        conn.close()
+        if conn:
+            conn.close()
+
 
 # Run the function
 if __name__ == "__main__":
-    add_students()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add students to the local roster.")
+    parser.add_argument("--bulk", nargs="?", const="", default=None, metavar="CSV",
+                        help="Add many students, typed/pasted or from a CSV of perm_id, first_name, last_name, staff")
+    args = parser.parse_args()
+    if args.bulk is None:
+        add_students()
+    else:
+        add_students_bulk(csv_path=args.bulk or None)
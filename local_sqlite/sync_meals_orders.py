@@ -1,6 +1,11 @@
-def sync_meals_orders(dry_run=False):
-    """Sync unsynced meals, orders, and salad_bar data from SQLite to PostgreSQL."""
-    import sqlite3
+def sync_meals_orders(dry_run=False, archive=True):
+    """
+    Sync unsynced meals, orders, and salad_bar data from SQLite to PostgreSQL,
+    plus a per-day summary of ErrorLogs (error_log_sync.py). With INGEST_URL
+    set, rows go through the central ingest service instead of a direct
+    PostgreSQL connection (see ingest_client.py).
+    After a clean sync, old synced history is moved to the archive (archive_history.py).
+    """
     import psycopg2
     import pandas as pd
     from psycopg2.extras import execute_values
@@ -9,12 +14,19 @@ def sync_meals_orders(dry_run=False):
     from rich.panel import Panel
     from dotenv import load_dotenv
     import os
+    import socket
+    from metrics import count, timer
+    from archive_history import archive_synced_history, display_archive_summary
+    from utils import connect_db
+    from error_log_sync import SUMMARY_DDL, UPSERT_SQL, mark_error_logs_synced, summarize_error_logs
+    from ingest_client import IngestError, sync_via_ingest
 
     # Load .env from the current directory
     load_dotenv()
 
     console = Console()
     sqlite_db_path = 'mealtracker.db'
+    terminal_id = os.getenv("TERMINAL_ID") or socket.gethostname()
 
     # PostgreSQL connection details
     pg_db_params  = {
@@ -33,23 +45,31 @@ def sync_meals_orders(dry_run=False):
     }
 
     def fetch_unsynced_data(db_path, table, exclude_columns=None):
+        """
+        Read unsynced rows up to the current highest rowid. Scans that land while
+        the PostgreSQL insert runs get a higher rowid and wait for the next sync,
+        so they are never marked synced without having been sent.
+        """
         try:
-            with sqlite3.connect(db_path) as conn:
+            with connect_db(db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"PRAGMA table_info({table})")
                 columns = [col[1] for col in cursor.fetchall() if col[1] not in (exclude_columns or [])]
-                query = f"SELECT {', '.join(columns)} FROM {table} WHERE synced = 0"
-                df = pd.read_sql_query(query, conn)
+                high_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table} WHERE synced = 0").fetchone()[0]
+                if high_rowid is None:
+                    return pd.DataFrame(), None
+                query = f"SELECT {', '.join(columns)} FROM {table} WHERE synced = 0 AND rowid <= ?"
+                df = pd.read_sql_query(query, conn, params=(high_rowid,))
                 
                 # Clean NaNs and invalid time strings
                 df.replace({"": None, "NaN": None}, inplace=True)
                 if "time" in df.columns:
                     df["time"] = df["time"].apply(lambda x: x if x and str(x).strip() not in ("", "NaN") else None)
                 print(df)
-                return df
+                return df, high_rowid
         except Exception as e:
             console.print(f"[red]❌ Failed to fetch from {table}: {e}[/red]")
-            return pd.DataFrame()
+            return pd.DataFrame(), None
 
     def insert_postgresql_data(df, pg_params, table, conflict_column=None):
         if df.empty:
@@ -74,29 +94,100 @@ def sync_meals_orders(dry_run=False):
             console.print(f"[red]❌ PostgreSQL insert error for {table}: {e}[/red]")
             return False
 
-    def update_sqlite_synced_flag(db_path, table):
+    def update_sqlite_synced_flag(db_path, table, high_rowid):
         try:
-            with sqlite3.connect(db_path) as conn:
-                conn.execute(f"UPDATE {table} SET synced = 1 WHERE synced = 0")
+            with connect_db(db_path) as conn:
+                conn.execute(f"UPDATE {table} SET synced = 1 WHERE synced = 0 AND rowid <= ?", (high_rowid,))
                 conn.commit()
             console.print(f"[green]✅ Marked synced in {table}[/green]")
         except Exception as e:
             console.print(f"[red]❌ Failed to update synced flag in {table}: {e}[/red]")
 
+    def sync_error_logs():
+        """Upsert this terminal's ErrorLogs summary for every day with new errors."""
+        try:
+            with connect_db(sqlite_db_path) as conn:
+                rows, high_id = summarize_error_logs(conn, terminal_id)
+        except Exception as e:
+            console.print(f"[red]❌ Failed to summarise ErrorLogs: {e}[/red]")
+            return
+        if not rows:
+            console.print("[yellow]⚠️ No new error logs[/yellow]")
+            return
+        if dry_run:
+            console.print(f"[blue]💡 Dry run: Skipping {len(rows)} error log summary rows[/blue]")
+            return
+        try:
+            with psycopg2.connect(**pg_db_params) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(SUMMARY_DDL)
+                    execute_values(cursor, UPSERT_SQL, rows)
+                conn.commit()
+            with connect_db(sqlite_db_path) as conn:
+                mark_error_logs_synced(conn, high_id)
+                conn.commit()
+        except Exception as e:
+            # Not counted against the sync: the same days are summarised again next time
+            console.print(f"[yellow]⚠️ Error log summary not synced, will retry next sync: {e}[/yellow]")
+            return
+        count("sync.error_log_summary.rows", len(rows))
+        console.print(f"[green]✅ {sum(row[4] for row in rows)} errors synced as {len(rows)} summary rows[/green]")
+
     # Begin sync
     console.print(Panel("🔄 Syncing Meals, Orders & Salad Bar", style="bold magenta"))
 
-    for table, exclude in tables_to_transfer.items():
-        console.print(f"\n[bold cyan]Processing table:[/bold cyan] {table}")
-        df = fetch_unsynced_data(sqlite_db_path, table, exclude_columns=exclude)
-        if not df.empty:
-            synced = insert_postgresql_data(df, pg_db_params, table)
-            if synced:
-                update_sqlite_synced_flag(sqlite_db_path, table)
+    ingest_url = os.getenv("INGEST_URL")
+    all_synced = True
+    if ingest_url and dry_run:
+        console.print("[blue]💡 Dry run: nothing is sent to the ingest service[/blue]")
+    elif ingest_url:
+        console.print(f"[bold cyan]Sending batches to[/bold cyan] {ingest_url} as {terminal_id}")
+        try:
+            sent, rejected = sync_via_ingest(sqlite_db_path, ingest_url, terminal_id, tables_to_transfer,
+                                             token=os.getenv("INGEST_TOKEN"))
+            for table, rows in sent.items():
+                console.print(f"[green]✅ {rows} rows from {table} acknowledged[/green]")
+            if not sent and not rejected:
+                console.print("[yellow]⚠️ No unsynced data[/yellow]")
+            # Rejected rows stay unsynced on this terminal until the batch is requeued
+            for seq, table, rows, reason in rejected:
+                console.print(f"[red]❌ Batch {seq} ({rows} rows from {table}) rejected by the service: {reason}[/red]")
+            if rejected:
+                console.print("[yellow]💡 Fix the cause, then run: python ingest_client.py --requeue[/yellow]")
+                all_synced = False
+        except IngestError as e:
+            # Unsent batches stay in the outbox and go out first next time
+            console.print(f"[red]❌ Ingest service error, will retry next sync: {e}[/red]")
+            all_synced = False
+    else:
+        for table, exclude in tables_to_transfer.items():
+            console.print(f"\n[bold cyan]Processing table:[/bold cyan] {table}")
+            with timer(f"sync.{table}.fetch"):
+                df, high_rowid = fetch_unsynced_data(sqlite_db_path, table, exclude_columns=exclude)
+            if not df.empty:
+                with timer(f"sync.{table}.insert"):
+                    synced = insert_postgresql_data(df, pg_db_params, table)
+                if synced:
+                    count(f"sync.{table}.rows", len(df))
+                    with timer(f"sync.{table}.mark"):
+                        update_sqlite_synced_flag(sqlite_db_path, table, high_rowid)
+                else:
+                    all_synced = False
+
+        console.print("\n[bold cyan]Processing table:[/bold cyan] ErrorLogs (summary)")
+        with timer("sync.error_log_summary"):
+            sync_error_logs()
 
     console.print("\n[bold green]🎉 Sync complete![/bold green]")
 
+    if archive and all_synced and not dry_run:
+        try:
+            display_archive_summary(archive_synced_history(sqlite_db_path))
+        except Exception as e:
+            console.print(f"[yellow]⚠️ Sync succeeded but archiving was skipped: {e}[/yellow]")
+
 
 # Run the function
 if __name__ == "__main__":
-    sync_meals_orders(dry_run=False)
+    from metrics import profile
+    profile("sync_meals_orders", sync_meals_orders, dry_run=False)
@@ -1,13 +1,27 @@
 
-import sqlite3
+import os
+from datetime import date
+
 import psycopg2
 import pandas as pd
+from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
 from rich.console import Console
 
+from metrics import count, timer
+from order_forecast import HISTORY_DAYS, forecast_orders, write_order_suggestions
+from roster_snapshot import write_roster_snapshot
+from utils import connect_db
+
+load_dotenv()
 console = Console()
 
 sqlite_db_path = "mealtracker.db"
+# School this terminal serves; eligibility is only pulled for its students
+terminal_school = os.getenv("TERMINAL_SCHOOL") or None
+# Benefit periods are kept if they touch this window around today
+ELIGIBILITY_PAST_DAYS = 30
+ELIGIBILITY_FUTURE_DAYS = 60
 pg_db_params = {
     'dbname': 'your_database',
     'user': 'user_name',
@@ -21,10 +35,131 @@ def clear_screen():
     import os
     os.system("cls" if os.name == "nt" else "clear")
 
+def sync_eligibility_snapshot():
+    """
+    Pull a compact eligibility snapshot for this terminal's school into the
+    local `eligibility` table. Only periods around today are fetched, and only
+    students whose periods changed are rewritten locally.
+    """
+    try:
+        with timer("sync_students.eligibility.fetch"), psycopg2.connect(**pg_db_params) as pg_conn:
+            with pg_conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT e.perm_id, e.frm_code, e.start_date, e.end_date
+                    FROM eligibility e
+                    JOIN students s ON s.perm_id = e.perm_id
+                    WHERE (%(school)s IS NULL OR s.school = %(school)s)
+                      AND e.frm_code IN ('Free', 'Reduced')
+                      AND COALESCE(e.end_date, 'infinity') >= CURRENT_DATE - %(past)s
+                      AND COALESCE(e.start_date, '-infinity') <= CURRENT_DATE + %(future)s
+                """, {"school": terminal_school, "past": ELIGIBILITY_PAST_DAYS, "future": ELIGIBILITY_FUTURE_DAYS})
+                remote = {
+                    (perm_id, frm_code,
+                     start_date.isoformat() if start_date else None,
+                     end_date.isoformat() if end_date else None)
+                    for perm_id, frm_code, start_date, end_date in cursor.fetchall()
+                }
+    except Exception as e:
+        console.print(f"[red]❌ Error fetching eligibility from PostgreSQL: {e}[/red]")
+        return
+
+    try:
+        with timer("sync_students.eligibility.apply"), connect_db(sqlite_db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS eligibility (
+                    perm_id INTEGER,
+                    frm_code TEXT,
+                    start_date TEXT,
+                    end_date TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_eligibility_perm_id ON eligibility (perm_id)")
+            local = set(conn.execute("SELECT perm_id, frm_code, start_date, end_date FROM eligibility"))
+
+            changed_ids = {row[0] for row in local ^ remote}
+            conn.executemany("DELETE FROM eligibility WHERE perm_id = ?", [(pid,) for pid in changed_ids])
+            conn.executemany(
+                "INSERT INTO eligibility (perm_id, frm_code, start_date, end_date) VALUES (?, ?, ?, ?)",
+                [row for row in remote if row[0] in changed_ids],
+            )
+            conn.commit()
+    except Exception as e:
+        console.print(f"[red]❌ Failed to update local eligibility: {e}[/red]")
+        return
+
+    count("sync_students.eligibility.changed", len(changed_ids))
+    if changed_ids:
+        console.print(f"[green]✅ Eligibility updated for {len(changed_ids)} students "
+                      f"({len(remote)} benefit periods on this terminal)[/green]")
+    else:
+        console.print("[blue]ℹ️ Eligibility already up to date[/blue]")
+
+
 def sync_students_from_postgres():
     clear_screen()
+    with timer("sync_students.students"):
+        sync_new_students()
+    with timer("sync_students.eligibility"):
+        sync_eligibility_snapshot()
+    with timer("sync_students.roster_snapshot"):
+        sync_roster_snapshot()
+    with timer("sync_students.order_suggestions"):
+        sync_order_suggestions()
+
+
+def sync_roster_snapshot():
+    """Rewrite the memory-mapped roster the scan loop starts from (see roster_snapshot.py)."""
+    try:
+        with connect_db(sqlite_db_path) as conn:
+            written = write_roster_snapshot(conn, sqlite_db_path)
+    except Exception as e:
+        console.print(f"[yellow]⚠️ Roster snapshot not written, scans will read students from SQLite: {e}[/yellow]")
+        return
+    console.print(f"[green]✅ Roster snapshot written ({written} students)[/green]")
+
+
+def sync_order_suggestions():
+    """
+    Forecast the next weeks' orders from served-meal history (see
+    order_forecast.py) and cache them locally as enter_orders' defaults.
+    """
+    try:
+        with timer("sync_students.order_suggestions.fetch"), psycopg2.connect(**pg_db_params) as pg_conn:
+            with pg_conn.cursor() as cursor:
+                # Today is still being served, so history stops at yesterday
+                cursor.execute("""
+                    SELECT COALESCE(s.school, '') AS school, m.meals_date, m.meal_type,
+                           COUNT(DISTINCT m.perm_id) AS served
+                    FROM meals m
+                    LEFT JOIN students s ON s.perm_id = m.perm_id
+                    WHERE m.meals_date >= CURRENT_DATE - %(days)s AND m.meals_date < CURRENT_DATE
+                      AND (%(school)s IS NULL OR s.school = %(school)s)
+                    GROUP BY 1, 2, 3
+                """, {"school": terminal_school, "days": HISTORY_DAYS})
+                history = pd.DataFrame(cursor.fetchall(), columns=["school", "meals_date", "meal_type", "served"])
+    except Exception as e:
+        console.print(f"[red]❌ Error fetching meal history from PostgreSQL: {e}[/red]")
+        return
+
+    try:
+        with timer("sync_students.order_suggestions.forecast"):
+            suggestions = forecast_orders(history, date.today())
+        with connect_db(sqlite_db_path) as conn:
+            written = write_order_suggestions(conn, suggestions)
+    except Exception as e:
+        console.print(f"[red]❌ Failed to update order suggestions: {e}[/red]")
+        return
+
+    count("sync_students.order_suggestions.rows", written)
+    if written:
+        console.print(f"[green]✅ Order suggestions cached for {suggestions['order_date'].nunique()} days[/green]")
+    else:
+        console.print("[yellow]⚠️ Not enough meal history for order suggestions yet[/yellow]")
+
+
+def sync_new_students():
     try:
-        with psycopg2.connect(**pg_db_params) as pg_conn:
+        with timer("sync_students.students.fetch"), psycopg2.connect(**pg_db_params) as pg_conn:
             with pg_conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("SELECT perm_id, first_name, last_name, staff, school FROM students")
                 students_pg = pd.DataFrame(cursor.fetchall())
@@ -38,7 +173,7 @@ def sync_students_from_postgres():
         return
 
     try:
-        with sqlite3.connect(sqlite_db_path) as conn:
+        with connect_db(sqlite_db_path) as conn:
             # Ensure local table exists
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS students (
@@ -63,8 +198,9 @@ def sync_students_from_postgres():
         return
 
     try:
-        with sqlite3.connect(sqlite_db_path) as conn:
+        with timer("sync_students.students.insert"), connect_db(sqlite_db_path) as conn:
             new_students.to_sql('students', conn, if_exists='append', index=False)
+        count("sync_students.students.inserted", len(new_students))
         console.print(f"[green]✅ Inserted {len(new_students)} new students into SQLite[/green]")
     except Exception as e:
         console.print(f"[red]❌ Failed to insert into SQLite: {e}[/red]")
@@ -72,4 +208,5 @@ def sync_students_from_postgres():
 
 # Run the function
 if __name__ == "__main__":
-    sync_students_from_postgres()
\ No newline at end of file
+    from metrics import profile
+    profile("sync_students_from_postgres", sync_students_from_postgres)
\ No newline at end of file
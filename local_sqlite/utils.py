@@ -1,5 +1,28 @@
+import os
 import sqlite3
 
+DB_FILE = "mealtracker.db"
+# How long a writer waits for another connection's write to finish before "database is locked"
+BUSY_TIMEOUT_SECONDS = 10
+# WAL lets the scan loop keep reading and writing while sync or data entry runs;
+# set MEALTRACKER_JOURNAL_MODE=DELETE to go back to SQLite's default rollback journal
+JOURNAL_MODE = os.getenv("MEALTRACKER_JOURNAL_MODE", "WAL").upper()
+
+
+def connect_db(db_file=DB_FILE, timeout=BUSY_TIMEOUT_SECONDS, **kwargs):
+    """
+    Open the terminal database with the shared concurrency settings.
+
+    In WAL mode readers never block the writer and the writer never blocks
+    readers; writers still take turns, waiting up to `timeout` seconds.
+    Callers should commit before prompting so no lock is held while a
+    person is typing.
+    """
+    conn = sqlite3.connect(db_file, timeout=timeout, **kwargs)
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    return conn
+
+
 def upsert_salad_bar(conn, itemid, serve_date, field_values: dict):
     """
     Safely insert or update a row in the salad_bar table.
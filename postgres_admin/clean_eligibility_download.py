@@ -0,0 +1,230 @@
+"""
+Clean Synergy Free/Reduced eligibility exports and merge them into PostgreSQL.
+
+Benefit periods are normalized to 'Free' / 'Reduced', and overlapping or
+adjacent periods of the same student and code are coalesced, both within the
+file and against what is already in `eligibility`. The table ends up with one
+non-overlapping row per benefit period, which keeps the date-range join in
+fetch_meal_data small and fast.
+
+    python clean_eligibility_download.py eligibility_export.csv [more.csv ...]
+"""
+import argparse
+import io
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+from rich.table import Table
+
+from clean_student_download import DB_CONFIG, EXPORT_DIR, console
+
+EXPECTED_COLUMNS = {"Perm ID", "FRM Code", "Start Date", "End Date"}
+
+# Anything not Free/Reduced (Paid, Denied, blank) simply has no benefit period
+FRM_CODES = {"f": "Free", "free": "Free", "r": "Reduced", "reduced": "Reduced", "reduced price": "Reduced"}
+
+# Stands in for a blank end date while merging; must stay inside pandas' datetime range
+OPEN_END = pd.Timestamp.max.normalize()
+
+
+def read_eligibility(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path, usecols=list(EXPECTED_COLUMNS), dtype="string")
+    # Placeholder end dates like 12/31/2999 mean open-ended, and don't fit pandas' datetime range anyway
+    far_future = (df["End Date"].str.extract(r"(\d{4})", expand=False).astype("Int64") >= OPEN_END.year)
+    df["End Date"] = df["End Date"].mask(far_future.fillna(False).astype(bool))
+    return pd.DataFrame({
+        "perm_id": pd.to_numeric(df["Perm ID"].str.strip(), errors="coerce").astype("Int64"),
+        "frm_code": df["FRM Code"].str.strip().str.lower().map(FRM_CODES),
+        "raw_code": df["FRM Code"],
+        "start_date": pd.to_datetime(df["Start Date"], errors="coerce", format="mixed"),
+        "end_date": pd.to_datetime(df["End Date"], errors="coerce", format="mixed"),
+        "raw_end": df["End Date"],
+    })
+
+
+def split_rejects(df: pd.DataFrame) -> tuple:
+    """Drop non-benefit codes and separate rows that can't be imported."""
+    benefit = df[df["frm_code"].notna()]
+    bad = (
+        benefit["perm_id"].isna()
+        | benefit["start_date"].isna()
+        # A non-blank end date that didn't parse is an error, a blank one is open-ended
+        | (benefit["end_date"].isna() & benefit["raw_end"].fillna("").str.strip().ne(""))
+        | (benefit["end_date"] < benefit["start_date"])
+    )
+    good = benefit[~bad].drop(columns=["raw_code", "raw_end"])
+    return good, benefit[bad], len(df) - len(benefit)
+
+
+def coalesce_periods(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge overlapping or adjacent periods per (perm_id, frm_code) in one pass.
+
+    After sorting, a row starts a new period when it begins more than a day
+    after the latest end seen so far in its group; a cumulative sum of those
+    breaks numbers the periods, which are then collapsed with min/max.
+    """
+    df = df.sort_values(["perm_id", "frm_code", "start_date"], ignore_index=True)
+    end = df["end_date"].fillna(OPEN_END)
+    keys = [df["perm_id"], df["frm_code"]]
+
+    prev_end = end.groupby(keys).cummax().groupby(keys).shift()
+    # Shift the start rather than the end: OPEN_END + 1 day would overflow
+    new_period = prev_end.isna() | (df["start_date"] - pd.Timedelta(days=1) > prev_end)
+
+    merged = (
+        df.assign(end_date=end, period=new_period.cumsum())
+        .groupby(["perm_id", "frm_code", "period"], as_index=False)
+        .agg(start_date=("start_date", "min"), end_date=("end_date", "max"))
+        .drop(columns="period")
+    )
+    merged["end_date"] = merged["end_date"].mask(merged["end_date"] == OPEN_END)
+    return merged
+
+
+def merge_into_postgres(df: pd.DataFrame) -> dict:
+    """
+    COPY the periods into staging and merge them with the existing rows of the
+    same students using a gaps-and-islands pass, then replace only the
+    students whose periods actually changed. Re-importing a file is a no-op.
+    """
+    buffer = io.StringIO()
+    out = df.assign(
+        start_date=df["start_date"].dt.strftime("%Y-%m-%d"),
+        end_date=df["end_date"].dt.strftime("%Y-%m-%d"),
+    )
+    out[["perm_id", "frm_code", "start_date", "end_date"]].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    try:
+        with psycopg2.connect(**DB_CONFIG) as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE INDEX IF NOT EXISTS eligibility_perm_id_start_idx ON eligibility (perm_id, start_date)")
+                cur.execute("""
+                    CREATE TEMP TABLE eligibility_staging (
+                        perm_id INTEGER, frm_code TEXT, start_date DATE, end_date DATE
+                    ) ON COMMIT DROP
+                """)
+                cur.copy_expert("COPY eligibility_staging FROM STDIN WITH (FORMAT csv)", buffer)
+
+                cur.execute("""
+                    CREATE TEMP TABLE eligibility_current ON COMMIT DROP AS
+                    SELECT perm_id, frm_code, start_date, end_date FROM eligibility
+                    WHERE perm_id IN (SELECT DISTINCT perm_id FROM eligibility_staging)
+                """)
+                cur.execute("""
+                    CREATE TEMP TABLE eligibility_merged ON COMMIT DROP AS
+                    WITH combined AS (
+                        SELECT perm_id, frm_code,
+                               COALESCE(start_date, '-infinity') AS start_date,
+                               COALESCE(end_date, 'infinity') AS end_date
+                        FROM (SELECT * FROM eligibility_staging UNION ALL SELECT * FROM eligibility_current) u
+                    ),
+                    flagged AS (
+                        SELECT *,
+                               CASE WHEN start_date <= MAX(end_date) OVER (
+                                        PARTITION BY perm_id, frm_code ORDER BY start_date, end_date
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                                    ) + 1
+                                    THEN 0 ELSE 1 END AS new_period
+                        FROM combined
+                    ),
+                    islands AS (
+                        SELECT *, SUM(new_period) OVER (
+                                   PARTITION BY perm_id, frm_code ORDER BY start_date, end_date
+                               ) AS period
+                        FROM flagged
+                    )
+                    SELECT perm_id, frm_code,
+                           NULLIF(MIN(start_date), '-infinity'::date) AS start_date,
+                           NULLIF(MAX(end_date), 'infinity'::date) AS end_date
+                    FROM islands
+                    GROUP BY perm_id, frm_code, period
+                """)
+                # Students whose merged periods differ from what's stored (including duplicate rows)
+                cur.execute("""
+                    CREATE TEMP TABLE eligibility_changed ON COMMIT DROP AS
+                    SELECT perm_id FROM (
+                        (SELECT perm_id, frm_code, start_date, end_date FROM eligibility_merged
+                         EXCEPT ALL
+                         SELECT perm_id, frm_code, start_date, end_date FROM eligibility_current)
+                        UNION ALL
+                        (SELECT perm_id, frm_code, start_date, end_date FROM eligibility_current
+                         EXCEPT ALL
+                         SELECT perm_id, frm_code, start_date, end_date FROM eligibility_merged)
+                    ) d
+                    GROUP BY perm_id
+                """)
+                cur.execute("""
+                    DELETE FROM eligibility
+                    WHERE perm_id IN (SELECT perm_id FROM eligibility_changed)
+                """)
+                removed = cur.rowcount
+                cur.execute("""
+                    INSERT INTO eligibility (perm_id, frm_code, start_date, end_date)
+                    SELECT perm_id, frm_code, start_date, end_date FROM eligibility_merged
+                    WHERE perm_id IN (SELECT perm_id FROM eligibility_changed)
+                """)
+                inserted = cur.rowcount
+                cur.execute("SELECT COUNT(*) FROM eligibility_changed")
+                students = cur.fetchone()[0]
+                cur.execute("SELECT COUNT(*) FROM eligibility")
+                total = cur.fetchone()[0]
+            conn.commit()
+        return {"students_changed": students, "rows_removed": removed, "rows_inserted": inserted, "table_rows": total}
+    except Exception as e:
+        sys.exit(f"❌ Database error: {e}")
+
+
+def display_summary(stats: dict):
+    table = Table(title="🧾 Eligibility Import", header_style="bold magenta")
+    table.add_column("Step", style="cyan")
+    table.add_column("Count", justify="right")
+    for label, value in stats.items():
+        table.add_row(label, str(value))
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean Synergy eligibility exports and merge them into PostgreSQL.")
+    parser.add_argument("files", nargs="+", help="Eligibility CSV exports")
+    args = parser.parse_args()
+
+    frames = []
+    for path in map(Path, args.files):
+        if not path.exists():
+            sys.exit(f"❌ ERROR: {path} does not exist.")
+        header = set(pd.read_csv(path, nrows=0).columns)
+        missing = EXPECTED_COLUMNS - header
+        if missing:
+            sys.exit(f"❌ ERROR: Missing expected columns in {path.name}: {', '.join(sorted(missing))}")
+        frames.append(read_eligibility(path))
+
+    df = pd.concat(frames, ignore_index=True)
+    good, rejects, not_benefit = split_rejects(df)
+    periods = coalesce_periods(good)
+
+    if not rejects.empty:
+        rejects_path = EXPORT_DIR / f"eligibility_rejects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        rejects.to_csv(rejects_path, index=False)
+        console.print(f"[yellow]⚠️ {len(rejects)} rejected rows written to:[/yellow] {rejects_path}")
+
+    result = merge_into_postgres(periods)
+    display_summary({
+        "Rows read": len(df),
+        "Not Free/Reduced (skipped)": not_benefit,
+        "Rejected": len(rejects),
+        "Benefit periods in file": len(good),
+        "After coalescing": len(periods),
+        "Students changed": result["students_changed"],
+        "Rows removed": result["rows_removed"],
+        "Rows inserted": result["rows_inserted"],
+        "Eligibility table rows": result["table_rows"],
+    })
+
+
+if __name__ == "__main__":
+    main()
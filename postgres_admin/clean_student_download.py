@@ -1,12 +1,16 @@
+import io
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import importlib.util
 import psycopg2
 from rich.console import Console
 from rich.table import Table
 import sys
 import os
+import time
 
 # Database connection config
 DB_CONFIG = {
@@ -22,50 +26,222 @@ EXPORT_DIR.mkdir(exist_ok=True)
 
 console = Console()
 EXPECTED_COLUMNS = {"Perm ID", "Student Name", "Staff Name"}
+CSV_DTYPES = {col: "string" for col in EXPECTED_COLUMNS}
 
+# pyarrow parses multi-threaded but can't stream chunks; big files use the C engine in chunks
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+LARGE_FILE_BYTES = 64 * 1024 * 1024
+CHUNK_ROWS = 200_000
 
-def clean_and_reorder(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean and reorder the student DataFrame."""
-    df.rename(columns={"Perm ID": "perm_id", "Staff Name": "staff"}, inplace=True)
-    df["school"] = ""
+STUDENT_NAME_PATTERN = r"^\s*(?P<last_name>[^,]*?)\s*,\s*(?P<first_name>[^\s,]*)"
+STAFF_NAME_PATTERN = r"^\s*([^,]*?)\s*(?:,|$)"
 
-    df[["last_name_staff", "first_name_staff", *_]] = df["staff"].str.split(",", expand=True)
-    df["staff"] = df["last_name_staff"]
 
-    df[["last_name", "first_name", *_]] = df["Student Name"].str.split(",", expand=True)
-    df["first_name"] = df["first_name"].str.split(" ").str[0]
+def clean_and_reorder(df: pd.DataFrame, school: str = "") -> pd.DataFrame:
+    """
+    Clean and reorder the student DataFrame.
 
-    df.drop(columns=["Student Name", "Ed-Fi ID", "SSID", "Last Name", "last_name_staff", "first_name_staff"], inplace=True, errors="ignore")
-    df = df[["perm_id", "first_name", "last_name", "staff", "school"]]
-    return df
+    "Last, First Middle" and "Last, First" are split with one regex pass per
+    column; the student keeps their first given name and the staff their last name.
+    """
+    names = df["Student Name"].str.extract(STUDENT_NAME_PATTERN)
+    staff = df["Staff Name"].str.extract(STAFF_NAME_PATTERN, expand=False)
 
+    return pd.DataFrame({
+        "perm_id": pd.to_numeric(df["Perm ID"].str.strip(), errors="coerce").astype("Int64"),
+        "first_name": names["first_name"],
+        "last_name": names["last_name"],
+        "staff": staff,
+        "school": school,
+    })
+
+
+REJECT_COLUMNS = ["reason", "Perm ID", "Student Name", "Staff Name", "school"]
+
+
+def split_rejects(df: pd.DataFrame, raw: pd.DataFrame) -> tuple:
+    """
+    Separate rows that can't be imported (bad perm_id or unparseable name).
+    Rejects keep the export's own values (`raw`, same index as `df`) and the reason.
+    """
+    bad_id = df["perm_id"].isna()
+    bad_name = df["first_name"].fillna("").eq("") | df["last_name"].fillna("").eq("")
+    bad = bad_id | bad_name
+    reason = (bad_id.map({True: "bad Perm ID", False: ""})
+              .str.cat(bad_name.map({True: "Student Name not 'Last, First'", False: ""}), sep="; ")
+              .str.strip("; "))
+    rejects = raw.loc[bad, ["Perm ID", "Student Name", "Staff Name"]].assign(
+        reason=reason[bad], school=df.loc[bad, "school"])
+    return df[~bad], rejects[REJECT_COLUMNS]
 
-def validate_columns(df: pd.DataFrame, source_name: str):
-    missing = EXPECTED_COLUMNS - set(df.columns)
-    if missing:
-        sys.exit(f"❌ ERROR: Missing expected columns in {source_name}: {', '.join(missing)}")
 
+def _read_csv(path: Path, **kwargs):
+    return pd.read_csv(path, usecols=list(EXPECTED_COLUMNS), dtype=CSV_DTYPES, **kwargs)
+
+
+def ingest_file(path: str, school: str = "", chunksize: int = CHUNK_ROWS) -> dict:
+    """
+    Read and clean one Synergy export. Runs in a worker process.
+
+    Small files are parsed in one go with the fastest available engine;
+    files over LARGE_FILE_BYTES are streamed in `chunksize` rows so memory
+    stays flat regardless of file size.
+    """
+    path = Path(path)
+    started = time.perf_counter()
+    result = {"file": path.name, "school": school, "rows": 0, "error": None}
+
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+        missing = EXPECTED_COLUMNS - set(header)
+        if missing:
+            raise ValueError(f"missing expected columns: {', '.join(sorted(missing))}")
+
+        if path.stat().st_size > LARGE_FILE_BYTES:
+            chunks = _read_csv(path, chunksize=chunksize)
+        else:
+            chunks = [_read_csv(path, engine=CSV_ENGINE)]
+
+        cleaned, rejects = [], []
+        for chunk in chunks:
+            result["rows"] += len(chunk)
+            good, bad = split_rejects(clean_and_reorder(chunk, school), chunk)
+            cleaned.append(good)
+            if not bad.empty:
+                rejects.append(bad)
+
+        result["cleaned"] = pd.concat(cleaned, ignore_index=True)
+        result["rejects"] = pd.concat(rejects, ignore_index=True) if rejects else pd.DataFrame(columns=REJECT_COLUMNS)
+    except Exception as e:
+        result["error"] = str(e)
+        result["cleaned"] = result["rejects"] = None
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def ingest_files(files: list, workers: int = None, chunksize: int = CHUNK_ROWS) -> list:
+    """
+    Clean several exports in parallel worker processes.
+
+    `files` is a list of (path, school) pairs. Results come back in input order.
+    """
+    if len(files) == 1 or workers == 1:
+        return [ingest_file(path, school, chunksize) for path, school in files]
+
+    with ProcessPoolExecutor(max_workers=workers or min(len(files), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(ingest_file, path, school, chunksize) for path, school in files]
+        return [future.result() for future in futures]
+
+
+def display_ingest_report(results: list):
+    table = Table(title="📥 Synergy Files", header_style="bold magenta")
+    table.add_column("File", style="cyan")
+    table.add_column("School", style="blue")
+    table.add_column("Rows", justify="right")
+    table.add_column("Cleaned", justify="right", style="green")
+    table.add_column("Rejects", justify="right", style="red")
+    table.add_column("Seconds", justify="right")
+
+    for r in results:
+        if r["error"]:
+            table.add_row(r["file"], r["school"], "-", "-", "-", f"{r['seconds']:.2f}")
+            console.print(f"[red]❌ {r['file']}: {r['error']}[/red]")
+            continue
+        table.add_row(r["file"], r["school"], str(r["rows"]), str(len(r["cleaned"])),
+                      str(len(r["rejects"])), f"{r['seconds']:.2f}")
+
+    console.print(table)
+
+
+def import_roster_to_postgres(df: pd.DataFrame, withdraw_missing: bool = False) -> dict:
+    """
+    Bulk-load the cleaned roster into a staging table with COPY, diff it
+    against `students` and apply the result as one merge.
+
+    Returns the affected rows as {"new": [...], "changed": [...], "withdrawn": [...]}.
+    Importing the same file again is a no-op. Students missing from the file
+    are only marked withdrawn (never deleted, their meals still report) when
+    `withdraw_missing` is set, i.e. when the files cover the whole district.
+    """
+    buffer = io.StringIO()
+    df[["perm_id", "first_name", "last_name", "staff", "school"]].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
 
-def insert_into_postgres(df: pd.DataFrame) -> list:
-    """Insert cleaned DataFrame into PostgreSQL and return inserted rows."""
-    inserted_rows = []
     try:
         with psycopg2.connect(**DB_CONFIG) as conn:
             with conn.cursor() as cur:
-                for _, row in df.iterrows():
+                cur.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS withdrawn_on DATE")
+                cur.execute("""
+                    CREATE TEMP TABLE students_staging (
+                        perm_id INTEGER, first_name TEXT, last_name TEXT, staff TEXT, school TEXT
+                    ) ON COMMIT DROP
+                """)
+                cur.copy_expert("COPY students_staging FROM STDIN WITH (FORMAT csv)", buffer)
+                # A student listed in two files is imported once
+                cur.execute("""
+                    DELETE FROM students_staging a USING students_staging b
+                    WHERE a.perm_id = b.perm_id AND a.ctid > b.ctid
+                """)
+                cur.execute("CREATE INDEX ON students_staging (perm_id)")
+                cur.execute("ANALYZE students_staging")
+
+                cur.execute("""
+                    SELECT st.perm_id, st.first_name, st.last_name, st.staff, st.school
+                    FROM students_staging st
+                    LEFT JOIN students s ON s.perm_id = st.perm_id
+                    WHERE s.perm_id IS NULL
+                    ORDER BY st.perm_id
+                """)
+                new_rows = cur.fetchall()
+
+                # A blank school in the download keeps the school already on file
+                cur.execute("""
+                    SELECT st.perm_id,
+                           s.first_name, st.first_name, s.last_name, st.last_name,
+                           s.staff, st.staff, s.school, COALESCE(NULLIF(st.school, ''), s.school)
+                    FROM students_staging st
+                    JOIN students s ON s.perm_id = st.perm_id
+                    WHERE (s.first_name, s.last_name, s.staff, s.school, s.withdrawn_on)
+                          IS DISTINCT FROM
+                          (st.first_name, st.last_name, st.staff, COALESCE(NULLIF(st.school, ''), s.school), NULL::date)
+                    ORDER BY st.perm_id
+                """)
+                changed_rows = cur.fetchall()
+
+                withdrawn_rows = []
+                if withdraw_missing:
                     cur.execute("""
-                        INSERT INTO students (perm_id, first_name, last_name, staff, school)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING perm_id, first_name, last_name, staff, school
-                    """, tuple(row))
-                    inserted_rows.append(cur.fetchone())
-        return inserted_rows
+                        UPDATE students s SET withdrawn_on = CURRENT_DATE
+                        WHERE s.withdrawn_on IS NULL
+                          AND NOT EXISTS (SELECT 1 FROM students_staging st WHERE st.perm_id = s.perm_id)
+                        RETURNING s.perm_id, s.first_name, s.last_name, s.staff, s.school
+                    """)
+                    withdrawn_rows = sorted(cur.fetchall())
+
+                cur.execute("""
+                    INSERT INTO students (perm_id, first_name, last_name, staff, school)
+                    SELECT perm_id, first_name, last_name, staff, COALESCE(school, '')
+                    FROM students_staging
+                    ON CONFLICT (perm_id) DO UPDATE SET
+                        first_name = EXCLUDED.first_name,
+                        last_name = EXCLUDED.last_name,
+                        staff = EXCLUDED.staff,
+                        school = COALESCE(NULLIF(EXCLUDED.school, ''), students.school),
+                        withdrawn_on = NULL
+                    WHERE (students.first_name, students.last_name, students.staff, students.school, students.withdrawn_on)
+                          IS DISTINCT FROM
+                          (EXCLUDED.first_name, EXCLUDED.last_name, EXCLUDED.staff,
+                           COALESCE(NULLIF(EXCLUDED.school, ''), students.school), NULL::date)
+                """)
+            conn.commit()
+        return {"new": new_rows, "changed": changed_rows, "withdrawn": withdrawn_rows}
     except Exception as e:
         sys.exit(f"❌ Database error: {e}")
 
 
-def display_rich_table(data: list):
-    table = Table(title="📋 Newly Inserted Students", header_style="bold magenta")
+def display_rich_table(data: list, title: str = "📋 Newly Inserted Students"):
+    table = Table(title=title, header_style="bold magenta")
     table.add_column("perm_id", style="cyan", justify="right")
     table.add_column("First Name", style="green")
     table.add_column("Last Name", style="green")
@@ -78,72 +254,82 @@ def display_rich_table(data: list):
     console.print(table)
 
 
-def main(file1: str, file2: str):
-    file1 = Path(file1)
-    file2 = Path(file2)
+def display_changed_table(data: list):
+    table = Table(title="✏️ Changed Students", header_style="bold magenta")
+    table.add_column("perm_id", style="cyan", justify="right")
+    for col in ("First Name", "Last Name", "Staff", "School"):
+        table.add_column(col)
 
-    if not file1.exists() or not file2.exists():
-        sys.exit("❌ ERROR: One or both input files do not exist.")
+    for perm_id, *pairs in data:
+        cells = []
+        for old, new in zip(pairs[::2], pairs[1::2]):
+            cells.append(str(new) if old == new else f"[red]{old}[/red] → [green]{new}[/green]")
+        table.add_row(str(perm_id), *cells)
 
-    df1 = pd.read_csv(file1)
-    df2 = pd.read_csv(file2)
+    console.print(table)
 
-    validate_columns(df1, file1.name)
-    validate_columns(df2, file2.name)
 
-    df1 = clean_and_reorder(df1)
-    df2 = clean_and_reorder(df2)
+def display_roster_diff(diff: dict):
+    console.print(
+        f"[cyan]📊 {len(diff['new'])} new, {len(diff['changed'])} changed, "
+        f"{len(diff['withdrawn'])} withdrawn[/cyan]"
+    )
+    if diff["new"]:
+        display_rich_table(diff["new"])
+    if diff["changed"]:
+        display_changed_table(diff["changed"])
+    if diff["withdrawn"]:
+        display_rich_table(diff["withdrawn"], title="🚪 Withdrawn Students")
+    if not any(diff.values()):
+        console.print("[yellow]No changes: roster already up to date.[/yellow]")
 
-    combined_df = pd.concat([df1, df2], ignore_index=True)
-    console.print(f"[cyan]📥 {len(combined_df)} total student records prepared for insert.[/cyan]")
 
-    # Export to Excel
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    export_path = EXPORT_DIR / f"students_export_{timestamp}.xlsx"
-    combined_df.to_excel(export_path, index=False)
-    console.print(f"[green]📁 Exported cleaned data to:[/green] {export_path}")
-
-    # Insert and display
-    inserted = insert_into_postgres(combined_df)
-    if inserted:
-        display_rich_table(inserted)
-    else:
-        console.print("[yellow]No new data inserted.[/yellow]")
+def parse_file_arg(arg: str) -> tuple:
+    """'export.csv' or 'export.csv=SCHOOL' -> (path, school)."""
+    path, _, school = arg.partition("=")
+    return path, school
 
 
 def main():
-    file1 = Path(input("📄 Enter path to first CSV file: ").strip())
-    file2 = Path(input("📄 Enter path to second CSV file: ").strip())
-
-    if not file1.exists() or not file2.exists():
-        sys.exit("❌ ERROR: One or both input files do not exist.")
-
-    df1 = pd.read_csv(file1)
-    df2 = pd.read_csv(file2)
+    parser = argparse.ArgumentParser(description="Clean Synergy roster exports and merge them into PostgreSQL.")
+    parser.add_argument("files", nargs="+", help="Synergy CSV exports, optionally as FILE=SCHOOL")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel worker processes")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="Rows per chunk for large files")
+    parser.add_argument("--withdraw-missing", action="store_true",
+                        help="Mark students not in these files as withdrawn (files cover the whole district)")
+    parser.add_argument("--no-export", action="store_true", help="Skip the Excel copy of the cleaned roster")
+    args = parser.parse_args()
+
+    files = [parse_file_arg(arg) for arg in args.files]
+    missing = [path for path, _ in files if not Path(path).exists()]
+    if missing:
+        sys.exit(f"❌ ERROR: Input file(s) do not exist: {', '.join(missing)}")
 
-    validate_columns(df1, file1.name)
-    validate_columns(df2, file2.name)
+    results = ingest_files(files, workers=args.workers, chunksize=args.chunksize)
+    display_ingest_report(results)
+    if any(r["error"] for r in results):
+        sys.exit("❌ ERROR: Fix the files above and re-run; nothing was imported.")
 
-    df1 = clean_and_reorder(df1)
-    df2 = clean_and_reorder(df2)
+    rejects = pd.concat([r["rejects"].assign(file=r["file"]) for r in results], ignore_index=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if not rejects.empty:
+        rejects_path = EXPORT_DIR / f"students_rejects_{timestamp}.csv"
+        rejects.to_csv(rejects_path, index=False)
+        console.print(f"[yellow]⚠️ {len(rejects)} rejected rows written to:[/yellow] {rejects_path}")
 
-    combined_df = pd.concat([df1, df2], ignore_index=True)
-    console.print(f"[cyan]📥 {len(combined_df)} total student records prepared for insert.[/cyan]")
+    combined_df = pd.concat([r["cleaned"] for r in results], ignore_index=True)
+    console.print(f"[cyan]📥 {len(combined_df)} total student records prepared for import.[/cyan]")
 
     # Export to Excel
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    export_path = EXPORT_DIR / f"students_export_{timestamp}.xlsx"
-    combined_df.to_excel(export_path, index=False)
-    console.print(f"[green]📁 Exported cleaned data to:[/green] {export_path}")
+    if not args.no_export:
+        export_path = EXPORT_DIR / f"students_export_{timestamp}.xlsx"
+        combined_df.to_excel(export_path, index=False)
+        console.print(f"[green]📁 Exported cleaned data to:[/green] {export_path}")
 
-    # Insert and display
-    inserted = insert_into_postgres(combined_df)
-    if inserted:
-        display_rich_table(inserted)
-    else:
-        console.print("[yellow]No new data inserted.[/yellow]")
+    # Merge and display
+    diff = import_roster_to_postgres(combined_df, withdraw_missing=args.withdraw_missing)
+    display_roster_diff(diff)
 
 
 if __name__ == "__main__":
     main()
-
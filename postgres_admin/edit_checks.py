@@ -0,0 +1,159 @@
+"""
+Reimbursement edit checks for a claim month.
+
+Every rule is evaluated over the whole month at once, as column operations on
+the daily totals, orders and eligible enrollment, so a district's month is
+checked in one pass before the claim goes out:
+
+    category_over_enrollment  Free/Reduced/Paid count above the students eligible in that category that day
+    spike                     total served well above the trailing average for that meal
+    non_service_day           meals counted on a weekend or a date in NON_SERVICE_DATES
+    served_over_order         total served above the meals ordered for that day
+
+The flagged rows go to the "Edit Check Exceptions" sheet of the summary workbook.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+CODE_LABELS = {"1": "Free", "2": "Reduced", "3": "Paid"}
+MEAL_TYPES = ("lunch", "breakfast")
+
+# Spike rule: served > SPIKE_RATIO x the mean of the previous TRAILING_DAYS service days
+# (needs at least MIN_TRAILING_DAYS of history, and at least SPIKE_MIN_MEALS above the mean)
+TRAILING_DAYS = 10
+MIN_TRAILING_DAYS = 3
+SPIKE_RATIO = 1.5
+SPIKE_MIN_MEALS = 20
+
+# Holidays, breaks and other closures, as YYYY-MM-DD strings; weekends are always non-service
+NON_SERVICE_DATES = set()
+
+EXCEPTION_COLUMNS = ["date", "meal_type", "rule", "value", "limit", "detail"]
+
+
+def load_check_data(engine, start_date, end_date):
+    """
+    Daily totals (with TRAILING_DAYS of service days before start_date),
+    orders and eligibility periods for the month, plus the roster size.
+    """
+    lookback = (pd.Timestamp(start_date) - pd.Timedelta(days=3 * TRAILING_DAYS)).date()
+    params = {"lookback": lookback, "start": start_date, "end": end_date}
+    totals = pd.read_sql(text("""
+        SELECT 'lunch' AS meal_type, meals_date, total_1s, total_2s, total_3s, total_served
+        FROM lunch_totals WHERE meals_date BETWEEN :lookback AND :end
+        UNION ALL
+        SELECT 'breakfast', meals_date, total_1s, total_2s, total_3s, total_served
+        FROM breakfast_totals WHERE meals_date BETWEEN :lookback AND :end
+    """), engine, params=params)
+    orders = pd.read_sql(text("""
+        SELECT order_date, SUM(lunch_order) AS lunch_order, SUM(breakfast_order) AS breakfast_order
+        FROM orders WHERE order_date BETWEEN :start AND :end
+        GROUP BY order_date
+    """), engine, params=params)
+    eligibility = pd.read_sql(text("""
+        SELECT el.perm_id, el.frm_code, el.start_date, el.end_date
+        FROM eligibility el
+        JOIN students s ON s.perm_id = el.perm_id
+        WHERE el.frm_code IN ('Free', 'Reduced')
+          AND COALESCE(el.start_date, '-infinity') <= :end
+          AND COALESCE(el.end_date, 'infinity') >= :start
+    """), engine, params=params)
+    with engine.connect() as conn:
+        enrolled = conn.execute(text("SELECT COUNT(*) FROM students")).scalar()
+    return totals, orders, eligibility, enrolled
+
+
+def daily_enrollment(eligibility, enrolled, start_date, end_date) -> pd.DataFrame:
+    """
+    Students eligible in each category on each day. Free wins where a student's
+    Free and Reduced periods overlap (as in the meal reports); everyone else is Paid.
+    """
+    days = pd.date_range(start_date, end_date).values
+    starts = pd.to_datetime(eligibility["start_date"]).fillna(pd.Timestamp.min).values
+    ends = pd.to_datetime(eligibility["end_date"]).fillna(pd.Timestamp.max).values
+    # One row per period, one column per day: does the period cover the day?
+    covered = pd.DataFrame((starts[:, None] <= days) & (ends[:, None] >= days), index=eligibility["perm_id"].values)
+
+    is_free = (eligibility["frm_code"] == "Free").values
+    free = covered[is_free].groupby(level=0).any()
+    reduced = covered[~is_free].groupby(level=0).any()
+    reduced_only = reduced & ~free.reindex(reduced.index, fill_value=False)
+
+    df = pd.DataFrame({"meals_date": pd.DatetimeIndex(days)})
+    df["eligible_1"] = free.sum().reindex(range(len(days)), fill_value=0).values
+    df["eligible_2"] = reduced_only.sum().reindex(range(len(days)), fill_value=0).values
+    df["eligible_3"] = enrolled - df["eligible_1"] - df["eligible_2"]
+    return df
+
+
+def _flag(df, mask, rule, value, limit, detail) -> pd.DataFrame:
+    hits = df[mask]
+    return pd.DataFrame({
+        "date": hits["meals_date"].dt.date,
+        "meal_type": hits["meal_type"],
+        "rule": rule,
+        "value": hits[value],
+        "limit": hits[limit] if limit else np.nan,
+        "detail": detail(hits) if callable(detail) else detail,
+    })
+
+
+def evaluate_rules(totals, orders, enrollment, start_date, end_date) -> pd.DataFrame:
+    """Apply every rule to the month. Returns one row per exception (EXCEPTION_COLUMNS)."""
+    totals = totals.copy()
+    totals["meals_date"] = pd.to_datetime(totals["meals_date"])
+    totals = totals.sort_values(["meal_type", "meals_date"])
+
+    # Trailing mean over earlier service days, computed before trimming to the month
+    totals["trailing_mean"] = totals.groupby("meal_type")["total_served"].transform(
+        lambda s: s.shift(1).rolling(TRAILING_DAYS, min_periods=MIN_TRAILING_DAYS).mean()
+    )
+    month = totals[totals["meals_date"].between(pd.Timestamp(start_date), pd.Timestamp(end_date))]
+
+    orders = orders.copy()
+    orders["meals_date"] = pd.to_datetime(orders["order_date"])
+    orders = orders.melt(id_vars="meals_date", value_vars=[f"{m}_order" for m in MEAL_TYPES],
+                         var_name="meal_type", value_name="meal_order")
+    orders["meal_type"] = orders["meal_type"].str.removesuffix("_order")
+
+    df = month.merge(enrollment, on="meals_date", how="left").merge(orders, on=["meals_date", "meal_type"], how="left")
+    exceptions = []
+
+    for code, label in CODE_LABELS.items():
+        exceptions.append(_flag(
+            df, df[f"total_{code}s"] > df[f"eligible_{code}"], "category_over_enrollment",
+            f"total_{code}s", f"eligible_{code}", f"{label} count above students eligible {label}",
+        ))
+
+    spike = (df["total_served"] > SPIKE_RATIO * df["trailing_mean"]) & \
+            (df["total_served"] - df["trailing_mean"] >= SPIKE_MIN_MEALS)
+    df["trailing_mean"] = df["trailing_mean"].round(1)
+    exceptions.append(_flag(
+        df, spike, "spike", "total_served", "trailing_mean",
+        f"more than {SPIKE_RATIO}x the average of the previous {TRAILING_DAYS} service days",
+    ))
+
+    weekend = df["meals_date"].dt.dayofweek >= 5
+    closed = df["meals_date"].dt.strftime("%Y-%m-%d").isin(NON_SERVICE_DATES)
+    exceptions.append(_flag(
+        df, (weekend | closed) & (df["total_served"] > 0), "non_service_day", "total_served", None,
+        lambda hits: np.where(hits["meals_date"].dt.dayofweek >= 5, "meals counted on a weekend",
+                              "meals counted on a non-service date"),
+    ))
+
+    exceptions.append(_flag(
+        df, df["total_served"] > df["meal_order"], "served_over_order", "total_served", "meal_order",
+        "more meals served than ordered",
+    ))
+
+    exceptions = [e for e in exceptions if not e.empty]
+    if not exceptions:
+        return pd.DataFrame(columns=EXCEPTION_COLUMNS)
+    return pd.concat(exceptions, ignore_index=True).sort_values(["date", "meal_type", "rule"]).reset_index(drop=True)
+
+
+def run_edit_checks(engine, start_date, end_date) -> pd.DataFrame:
+    totals, orders, eligibility, enrolled = load_check_data(engine, start_date, end_date)
+    enrollment = daily_enrollment(eligibility, enrolled, start_date, end_date)
+    return evaluate_rules(totals, orders, enrollment, start_date, end_date)
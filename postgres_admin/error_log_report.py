@@ -0,0 +1,163 @@
+"""
+Repeatedly failing PINs, from the ErrorLogs summaries terminals sync.
+
+Terminals send one error_log_summary row per terminal, date, meal and error
+message, with the distinct PINs involved (local_sqlite/error_log_sync.py).
+A PIN that keeps coming back as "No Student Found" falls into one of three groups:
+
+    Stale terminal roster   the student is in the central roster but hasn't been served since;
+                            that terminal needs a student sync
+    Resolved                the student has been served since the last failure
+    Not in roster           not a known student centrally (not enrolled yet, or mistyped)
+
+The Terminals table lists, per terminal, how many PINs its roster is
+missing, so students can be synced on exactly those terminals.
+
+    python error_log_report.py                      # last 30 days, PINs failing on 2+ days
+    python error_log_report.py --start 2025-03-01 --end 2025-03-31 --min-days 3 --output errors.xlsx
+"""
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import text
+
+from error_log_sync import SUMMARY_DDL
+from generate_reports import get_engine
+from metrics import timer
+
+console = Console()
+
+NOT_FOUND = "No Student Found"
+DEFAULT_DAYS = 30
+MIN_DAYS = 2
+
+FAILING_PINS_QUERY = """
+WITH failures AS (
+    SELECT e.terminal, e.log_date, e.meal_type, unnest(e.pins) AS perm_id
+    FROM error_log_summary e
+    WHERE e.error_type = :error_type AND e.log_date BETWEEN :start AND :end
+),
+per_pin AS (
+    SELECT perm_id,
+           COUNT(DISTINCT log_date) AS days_failed,
+           COUNT(*) AS failed_services,
+           string_agg(DISTINCT terminal, ', ') AS terminals,
+           MIN(log_date) AS first_failed,
+           MAX(log_date) AS last_failed
+    FROM failures
+    GROUP BY perm_id
+    HAVING COUNT(DISTINCT log_date) >= :min_days
+)
+SELECT
+    p.perm_id,
+    CASE
+        WHEN s.perm_id IS NULL THEN 'Not in roster'
+        WHEN served.last_served > p.last_failed THEN 'Resolved'
+        ELSE 'Stale terminal roster'
+    END AS status,
+    p.days_failed, p.failed_services, p.terminals, p.first_failed, p.last_failed,
+    served.last_served, s.first_name, s.last_name, s.school
+FROM per_pin p
+LEFT JOIN students s ON s.perm_id = p.perm_id
+LEFT JOIN LATERAL (
+    SELECT MAX(m.meals_date) AS last_served
+    FROM meals m
+    WHERE m.perm_id = p.perm_id AND m.meals_date >= p.first_failed
+) served ON true
+ORDER BY (s.perm_id IS NULL), (served.last_served > p.last_failed) IS TRUE, p.days_failed DESC, p.perm_id
+"""
+
+TERMINALS_QUERY = """
+SELECT
+    e.terminal,
+    SUM(e.error_count) FILTER (WHERE e.error_type = :error_type) AS not_found_errors,
+    SUM(e.error_count) FILTER (WHERE e.error_type <> :error_type) AS other_errors,
+    COUNT(DISTINCT e.log_date) AS days_with_errors,
+    MAX(e.log_date) AS last_error_date,
+    MAX(e.synced_at) AS last_reported
+FROM error_log_summary e
+WHERE e.log_date BETWEEN :start AND :end
+GROUP BY e.terminal
+ORDER BY e.terminal
+"""
+
+
+def ensure_error_summary_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(SUMMARY_DDL))
+
+
+def fetch_error_report(engine, start_date, end_date, min_days=MIN_DAYS) -> dict:
+    """{"PINs": failing PINs with a status, "Terminals": errors and stale PINs per terminal}."""
+    params = {"start": start_date, "end": end_date, "min_days": min_days, "error_type": NOT_FOUND}
+    with engine.connect() as conn:
+        with timer("report.error_logs.pins"):
+            pins = pd.read_sql(text(FAILING_PINS_QUERY), conn, params=params)
+        with timer("report.error_logs.terminals"):
+            terminals = pd.read_sql(text(TERMINALS_QUERY), conn, params=params)
+
+    # Stale PINs per terminal: a PIN failing on several terminals counts against each of them
+    stale = pins[pins["status"] == "Stale terminal roster"]
+    per_terminal = (stale.assign(terminal=stale["terminals"].str.split(", ")).explode("terminal")
+                    .groupby("terminal").size().rename("stale_roster_pins"))
+    terminals = terminals.merge(per_terminal, left_on="terminal", right_index=True, how="left")
+    terminals["stale_roster_pins"] = terminals["stale_roster_pins"].fillna(0).astype(int)
+    terminals[["not_found_errors", "other_errors"]] = (
+        terminals[["not_found_errors", "other_errors"]].fillna(0).astype(int))
+    return {"PINs": pins, "Terminals": terminals}
+
+
+def display_error_report(report: dict, start_date, end_date, min_days=MIN_DAYS):
+    pins, terminals = report["PINs"], report["Terminals"]
+
+    table = Table(title=f"🖥️ Terminal errors {start_date} .. {end_date}", header_style="bold magenta")
+    for column in ("Terminal", "Not found", "Other errors", "Days", "Last error", "Stale roster PINs"):
+        table.add_column(column, justify="left" if column == "Terminal" else "right")
+    for row in terminals.itertuples(index=False):
+        stale = f"[bold red]{row.stale_roster_pins}[/bold red]" if row.stale_roster_pins else "0"
+        table.add_row(row.terminal, str(row.not_found_errors), str(row.other_errors),
+                      str(row.days_with_errors), str(row.last_error_date), stale)
+    console.print(table)
+
+    styles = {"Stale terminal roster": "bold red", "Not in roster": "yellow", "Resolved": "dim"}
+    table = Table(title=f"🔁 PINs not found on {min_days}+ days", header_style="bold magenta")
+    for column in ("PIN", "Status", "Days", "Services", "Terminals", "Last failed", "Student", "School"):
+        table.add_column(column, justify="right" if column in ("PIN", "Days", "Services") else "left")
+    for row in pins.itertuples(index=False):
+        name = f"{row.first_name} {row.last_name}" if isinstance(row.first_name, str) else "-"
+        table.add_row(str(row.perm_id), f"[{styles[row.status]}]{row.status}[/{styles[row.status]}]",
+                      str(row.days_failed), str(row.failed_services), row.terminals, str(row.last_failed),
+                      name, row.school if isinstance(row.school, str) else "-")
+    console.print(table)
+
+    needs_sync = terminals.loc[terminals["stale_roster_pins"] > 0, "terminal"].tolist()
+    if needs_sync:
+        console.print(f"[bold yellow]⚠️ Run a student sync on: {', '.join(needs_sync)}[/bold yellow]")
+    else:
+        console.print("[green]✅ No terminal is missing students from the central roster[/green]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repeatedly failing PINs and stale terminal rosters.")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=DEFAULT_DAYS))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--min-days", type=int, default=MIN_DAYS, help="Days a PIN must have failed on")
+    parser.add_argument("--output", help="Also save both tables to this .xlsx file")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    ensure_error_summary_table(engine)
+    report = fetch_error_report(engine, args.start, args.end, args.min_days)
+    display_error_report(report, args.start, args.end, args.min_days)
+    if args.output:
+        with pd.ExcelWriter(args.output, engine="openpyxl") as writer:
+            for title, df in report.items():
+                df.to_excel(writer, sheet_name=title, index=False)
+        console.print(f"[green]✅ Saved {args.output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+The ErrorLogs summary table and upsert are defined once, in the terminals'
+local_sqlite/error_log_sync.py; this loads it like metrics.py does.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    __name__, Path(__file__).resolve().parent.parent / "local_sqlite" / "error_log_sync.py"
+)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
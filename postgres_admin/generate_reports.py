@@ -5,6 +5,10 @@ from openpyxl.styles import Font
 from datetime import datetime
 from openpyxl.utils.dataframe import dataframe_to_rows
 
+from edit_checks import run_edit_checks
+from metrics import timer
+from report_cache import compute_data_fingerprint, extend_fingerprint, fetch_cached_report, store_report
+
 
 DB_CONFIG = {
     "dbname": "your_database",
@@ -29,16 +33,21 @@ def fetch_meal_data(engine, start_date, end_date):
         SELECT 
             m.meals_date, m.meal_type, m.perm_id,
             s.first_name, s.last_name, s.staff,
-            COALESCE(
-                CASE 
-                    WHEN e.frm_code = 'Free' THEN '1'
-                    WHEN e.frm_code = 'Reduced' THEN '2'
-                    ELSE '3'
-                END, '3'
-            ) AS meals_code
+            COALESCE(e.meals_code, '3') AS meals_code
         FROM meals m
         JOIN students s ON m.perm_id = s.perm_id
-        LEFT JOIN eligibility e ON m.perm_id = e.perm_id
+        -- Benefit period covering the meal date; Free wins if periods of both codes overlap
+        LEFT JOIN LATERAL (
+            SELECT MIN(
+                CASE
+                    WHEN el.frm_code = 'Free' THEN '1'
+                    WHEN el.frm_code = 'Reduced' THEN '2'
+                END
+            ) AS meals_code
+            FROM eligibility el
+            WHERE el.perm_id = m.perm_id
+              AND m.meals_date BETWEEN COALESCE(el.start_date, '-infinity') AND COALESCE(el.end_date, 'infinity')
+        ) e ON TRUE
         WHERE m.meals_date BETWEEN '{start_date}' AND '{end_date}'
     )
     SELECT * FROM meal_data ORDER BY meals_date, meal_type, perm_id;
@@ -70,11 +79,13 @@ def export_meal_sheets(df, engine, school_name, start_date):
         ws.append(["Meals Code 3", total_3s])
         ws.append(["Total Served", total_served])
 
-        insert_totals(engine, meal_type, meals_date, total_1s, total_2s, total_3s, total_served)
+        with timer("report.meal_sheets.insert_totals"):
+            insert_totals(engine, meal_type, meals_date, total_1s, total_2s, total_3s, total_served)
 
     filename = f"{school_name}_{start_date}_meal_report.xlsx"
     wb.save(filename)
     print(f"Report saved: {filename}")
+    return filename
 
 def insert_totals(engine, meal_type, date, t1, t2, t3, total):
     table_name = f"{meal_type}_totals"
@@ -129,7 +140,8 @@ def summarize_meals(df_orders, df_totals, meal_type):
     })[["order_date", "meal_order", "total_served", "leftover", "total_1s", "total_2s", "total_3s", "FRM_total"]]
 
 
-def write_summary_workbook(lunch_summary_df, breakfast_summary_df, filename=None, school=None, month_report=None):
+def write_summary_workbook(lunch_summary_df, breakfast_summary_df, filename=None, school=None, month_report=None,
+                           exceptions_df=None):
     if filename is None and school and month_report:
         filename = f"{school}_{month_report}_summary.xlsx"
     elif filename is None:
@@ -163,12 +175,24 @@ def write_summary_workbook(lunch_summary_df, breakfast_summary_df, filename=None
     ws_breakfast = wb.create_sheet()
     write_sheet(ws_breakfast, breakfast_summary_df, "Breakfast Summary")
 
+    # Edit check exceptions (no totals row)
+    if exceptions_df is not None:
+        ws_exceptions = wb.create_sheet("Edit Check Exceptions")
+        ws_exceptions.append(list(exceptions_df.columns))
+        for cell in ws_exceptions[1]:
+            cell.font = Font(bold=True)
+        for row in dataframe_to_rows(exceptions_df, index=False, header=False):
+            ws_exceptions.append(row)
+        if exceptions_df.empty:
+            ws_exceptions.append(["No exceptions"])
+
     wb.save(filename)
     print(f"Summary workbook saved as {filename}")
+    return filename
 
 
 # Optional CLI or menu integration
-def main():
+def main(use_cache=True):
     clear_screen()
     engine = get_engine()
     school = input("Enter school name: ")
@@ -176,17 +200,51 @@ def main():
     start_date = input("Enter start date (YYYY-MM-DD): ")
     end_date = input("Enter end date (YYYY-MM-DD): ")
 
-    df = fetch_meal_data(engine, start_date, end_date)
-    export_meal_sheets(df, engine, school, start_date)
-
-    df_orders, df_totals = generate_summary_tables(engine, start_date, end_date)
-    lunch_df = summarize_meals(df_orders, df_totals, "lunch")
-    breakfast_df = summarize_meals(df_orders, df_totals, "breakfast")
+    # Unchanged ranges are served from the report cache
+    with timer("report.fingerprint"):
+        fingerprint = compute_data_fingerprint(engine, start_date, end_date) if use_cache else None
+
+    meal_report = f"{school}_{start_date}_meal_report.xlsx"
+    if fingerprint and fetch_cached_report(school, start_date, end_date, "meal_sheets", fingerprint, meal_report):
+        print(f"Report unchanged, restored from cache: {meal_report}")
+    else:
+        with timer("report.meal_sheets.query"):
+            df = fetch_meal_data(engine, start_date, end_date)
+        with timer("report.meal_sheets.write"):
+            meal_report = export_meal_sheets(df, engine, school, start_date)
+        if fingerprint:
+            store_report(school, start_date, end_date, "meal_sheets", fingerprint, meal_report)
+
+    # Checked on every run, cached or not; the exceptions sheet is part of the summary's fingerprint
+    with timer("report.edit_checks"):
+        exceptions_df = run_edit_checks(engine, start_date, end_date)
+    if exceptions_df.empty:
+        print("\n✅ Edit checks passed: no exceptions")
+    else:
+        print(f"\n⚠️ Edit checks flagged {len(exceptions_df)} exception(s):\n", exceptions_df)
+
+    summary_fingerprint = extend_fingerprint(fingerprint, exceptions_df) if fingerprint else None
+    summary_report = f"{school}_{month_report}_summary.xlsx"
+    if summary_fingerprint and fetch_cached_report(school, start_date, end_date, "summary", summary_fingerprint,
+                                                   summary_report):
+        print(f"Summary unchanged, restored from cache: {summary_report}")
+        return
+
+    with timer("report.summary.query"):
+        df_orders, df_totals = generate_summary_tables(engine, start_date, end_date)
+    with timer("report.summary.aggregate"):
+        lunch_df = summarize_meals(df_orders, df_totals, "lunch")
+        breakfast_df = summarize_meals(df_orders, df_totals, "breakfast")
 
     print("\nLunch Summary:\n", lunch_df)
     print("\nBreakfast Summary:\n", breakfast_df)
-    write_summary_workbook(lunch_df, breakfast_df, school=school, month_report=month_report)
+    with timer("report.summary.write"):
+        summary_report = write_summary_workbook(lunch_df, breakfast_df, school=school, month_report=month_report,
+                                                exceptions_df=exceptions_df)
+    if summary_fingerprint:
+        store_report(school, start_date, end_date, "summary", summary_fingerprint, summary_report)
 
 
 if __name__ == "__main__":
-    main()
+    from metrics import profile
+    profile("generate_reports", main)
@@ -0,0 +1,258 @@
+"""
+Central ingest service: terminals POST their unsynced rows here instead of
+connecting to PostgreSQL themselves.
+
+A batch is gzip-compressed JSON:
+
+    {"terminal": "wrs-1", "database": "3f2a...", "seq": 17, "table": "meals",
+     "columns": ["perm_id", "meals_date", "meal_type", "synced"],
+     "rows": [[1234567, "2025-03-14", "Lunch", 0], ...]}
+
+`database` is a random id the terminal's mealtracker.db picks once, so a
+rebuilt or re-imaged terminal whose seq starts over at 1 isn't mistaken for
+one resending old batches. Each (terminal, database, seq) is applied exactly
+once: the batch is recorded in
+`ingest_batches` and its rows are COPYed into the target table in the same
+transaction, and the terminal only gets its 200 after that commit. A resent
+batch (lost ack, retry) is answered as a duplicate without writing anything.
+Tables in UPSERT_KEYS (the ErrorLogs summaries) are COPYed into a temporary
+table and upserted on their key instead of appended.
+
+    python ingest_service.py --port 8765
+    INGEST_TOKEN=... python ingest_service.py --dsn "dbname=wrs_meals user=..."
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+from rich.console import Console
+
+from clean_student_download import DB_CONFIG
+from error_log_sync import SUMMARY_DDL
+from metrics import count, timer
+
+console = Console()
+
+# Tables terminals may send, and nothing else
+INGEST_TABLES = ("meals", "orders", "salad_bar", "error_log_summary")
+# Tables whose rows replace earlier ones with the same key: (key columns, timestamp column to touch)
+UPSERT_KEYS = {"error_log_summary": (("terminal", "log_date", "meal_type", "error_type"), "synced_at")}
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+POOL_SIZE = 8
+
+INGEST_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_batches (
+    terminal TEXT NOT NULL,
+    database_id TEXT NOT NULL DEFAULT '',
+    seq BIGINT NOT NULL,
+    table_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    received_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (terminal, database_id, seq)
+);
+-- Tables created before database_id was part of the key
+ALTER TABLE ingest_batches ADD COLUMN IF NOT EXISTS database_id TEXT NOT NULL DEFAULT '';
+"""
+
+PRIMARY_KEY_QUERY = """
+SELECT a.attname
+FROM pg_index i
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+WHERE i.indrelid = 'ingest_batches'::regclass AND i.indisprimary
+"""
+
+
+class BatchError(ValueError):
+    """The batch is malformed; the terminal should not retry it as-is."""
+
+
+class Ingestor:
+    def __init__(self, conn_params, pool_size=POOL_SIZE):
+        self.pool = ThreadedConnectionPool(1, pool_size, **conn_params)
+        self.columns = {}
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(INGEST_DDL)
+                cur.execute(PRIMARY_KEY_QUERY)
+                if "database_id" not in {row[0] for row in cur.fetchall()}:
+                    # Batches recorded under the old key keep database_id = '', which pre-upgrade terminals still send
+                    cur.execute("""
+                        ALTER TABLE ingest_batches DROP CONSTRAINT ingest_batches_pkey,
+                            ADD PRIMARY KEY (terminal, database_id, seq)
+                    """)
+                cur.execute(SUMMARY_DDL)
+                cur.execute("""
+                    SELECT table_name, column_name FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = ANY(%s)
+                """, (list(INGEST_TABLES),))
+                for table, column in cur.fetchall():
+                    self.columns.setdefault(table, set()).add(column)
+            conn.commit()
+        finally:
+            self.pool.putconn(conn)
+
+    def validate(self, batch):
+        if not isinstance(batch, dict):
+            raise BatchError("batch must be a JSON object")
+        terminal, seq, table = batch.get("terminal"), batch.get("seq"), batch.get("table")
+        columns, rows = batch.get("columns"), batch.get("rows")
+        if not isinstance(terminal, str) or not terminal.strip():
+            raise BatchError("terminal is required")
+        if not isinstance(batch.get("database", ""), str):
+            raise BatchError("database must be a string")
+        if not isinstance(seq, int) or seq < 0:
+            raise BatchError("seq must be a non-negative integer")
+        if table not in self.columns:
+            raise BatchError(f"table {table!r} is not accepted")
+        if not isinstance(columns, list) or not columns or not set(columns) <= self.columns[table]:
+            raise BatchError(f"unknown columns for {table}: {sorted(set(columns or []) - self.columns[table])}")
+        if not isinstance(rows, list) or any(not isinstance(r, list) or len(r) != len(columns) for r in rows):
+            raise BatchError("every row must be a list with one value per column")
+
+    def apply(self, batch) -> dict:
+        """Write one validated batch. Returns {"status": "ok" | "duplicate", ...}."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch["rows"]:
+            writer.writerow(["" if value is None else value for value in row])
+        buffer.seek(0)
+
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                # Claims (terminal, database, seq); a concurrent resend waits here until we commit, then sees the conflict
+                cur.execute("""
+                    INSERT INTO ingest_batches (terminal, database_id, seq, table_name, row_count)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (terminal, database_id, seq) DO NOTHING
+                """, (batch["terminal"], batch.get("database", ""), batch["seq"], batch["table"], len(batch["rows"])))
+                if cur.rowcount == 0:
+                    conn.rollback()
+                    count("ingest.duplicate_batches")
+                    return {"status": "duplicate", "seq": batch["seq"]}
+
+                target = sql.Identifier(batch["table"])
+                columns = sql.SQL(", ").join(map(sql.Identifier, batch["columns"]))
+                key, touched = UPSERT_KEYS.get(batch["table"], (None, None))
+                if key:
+                    cur.execute(sql.SQL(
+                        "CREATE TEMP TABLE ingest_upsert (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    ).format(target))
+                copy = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                    sql.Identifier("ingest_upsert") if key else target, columns)
+                with timer("ingest.copy"):
+                    cur.copy_expert(copy.as_string(conn), buffer)
+                if key:
+                    updates = sql.SQL(", ").join(
+                        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c))
+                        for c in batch["columns"] if c not in key
+                    ) + sql.SQL(", {} = now()").format(sql.Identifier(touched))
+                    cur.execute(sql.SQL(
+                        "INSERT INTO {} ({}) SELECT {} FROM ingest_upsert ON CONFLICT ({}) DO UPDATE SET {}"
+                    ).format(target, columns, columns, sql.SQL(", ").join(map(sql.Identifier, key)), updates))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+        count("ingest.batches")
+        count(f"ingest.{batch['table']}.rows", len(batch["rows"]))
+        return {"status": "ok", "seq": batch["seq"], "rows": len(batch["rows"])}
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    ingestor = None
+    token = None
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.reply(200, {"status": "ok"})
+        else:
+            self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/batches":
+            return self.reply(404, {"error": "not found"})
+        if self.token and self.headers.get("X-Ingest-Token") != self.token:
+            return self.reply(401, {"error": "bad token"})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BATCH_BYTES:
+            return self.reply(413 if length else 400, {"error": "bad Content-Length"})
+        try:
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            batch = json.loads(body)
+            self.ingestor.validate(batch)
+        except (OSError, ValueError) as e:
+            count("ingest.rejected_batches")
+            return self.reply(400, {"error": str(e)})
+
+        try:
+            with timer("ingest.batch"):
+                result = self.ingestor.apply(batch)
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            # Values PostgreSQL won't take; retrying the same batch can't succeed
+            count("ingest.rejected_batches")
+            console.print(f"[red]❌ {batch['terminal']} #{batch['seq']} rejected: {e}[/red]")
+            return self.reply(422, {"error": str(e).strip()})
+        except psycopg2.Error as e:
+            # Nothing was committed; the terminal keeps the batch and retries later
+            console.print(f"[red]❌ {batch['terminal']} #{batch['seq']}: {e}[/red]")
+            return self.reply(503, {"error": "database error, retry"})
+        self.reply(200, result)
+
+    def log_message(self, format, *args):
+        # One line per batch would flood the console during a busy sync
+        pass
+
+
+def serve(host, port, conn_params, token=None):
+    IngestHandler.ingestor = Ingestor(conn_params)
+    IngestHandler.token = token
+    server = ThreadingHTTPServer((host, port), IngestHandler)
+    console.print(f"[green]✅ Ingest service listening on {host}:{port}[/green]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n[bold red]🚪 Ingest service stopped[/bold red]")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accept batched terminal syncs over HTTP and COPY them into PostgreSQL.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dsn", help="PostgreSQL connection string (defaults to DB_CONFIG)")
+    args = parser.parse_args()
+
+    if args.dsn:
+        from psycopg2.extensions import parse_dsn
+        conn_params = parse_dsn(args.dsn)
+    else:
+        conn_params = DB_CONFIG
+    serve(args.host, args.port, conn_params, token=os.getenv("INGEST_TOKEN"))
+
+
+if __name__ == "__main__":
+    main()
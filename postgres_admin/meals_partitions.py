@@ -0,0 +1,249 @@
+"""
+Range partitioning for the central meals table.
+
+`meals` grows by every scan from every terminal, while reports only ever read
+a date range. Partitioned by meals_date (one partition per month, or per
+school year with PARTITION_INTERVAL = "school_year"), a monthly report only
+touches the partitions it needs. Inside them a BRIN index on meals_date
+(rows arrive roughly in date order) and a btree on (perm_id, meals_date)
+cover the report and per-student lookups.
+
+A DEFAULT partition catches rows outside every range, so a late sync never
+fails. `maintain` should run regularly (e.g. nightly from cron). It creates
+partitions MONTHS_AHEAD into the future, at the interval the existing
+partitions were created with (a different --interval is refused), moving any
+matching rows out of the default partition. With --archive-before it also
+detaches partitions that end before the given date into the meals_archive
+schema, or drops them with --drop.
+
+    python meals_partitions.py status
+    python meals_partitions.py migrate                # one-time conversion of an existing meals table
+    python meals_partitions.py --interval school_year migrate
+    python meals_partitions.py maintain
+    python meals_partitions.py maintain --archive-before 2022-07-01 [--drop]
+
+The partitioned table keeps meals.id and its sequence, but id is no longer a
+primary key on its own: PostgreSQL requires unique keys on a partitioned
+table to include the partition key. It is indexed for the id watermark used
+by participation_cube.
+"""
+import argparse
+import re
+import sys
+from datetime import date
+
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import text
+
+from generate_reports import get_engine
+
+console = Console()
+
+PARTITION_INTERVAL = "month"   # or "school_year"
+SCHOOL_YEAR_START_MONTH = 7
+MONTHS_AHEAD = 3
+ARCHIVE_SCHEMA = "meals_archive"
+DEFAULT_PARTITION = "meals_default"
+
+INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS meals_date_brin ON meals USING brin (meals_date) WITH (pages_per_range = 32)",
+    "CREATE INDEX IF NOT EXISTS meals_perm_date_idx ON meals (perm_id, meals_date)",
+    "CREATE INDEX IF NOT EXISTS meals_id_idx ON meals (id)",
+]
+
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_for(day: date, interval=PARTITION_INTERVAL) -> tuple:
+    """(name, start, end) of the partition that holds `day`; end is exclusive."""
+    if interval == "month":
+        start = date(day.year, day.month, 1)
+        return f"meals_{start:%Y_%m}", start, _add_months(start, 1)
+    if interval == "school_year":
+        year = day.year if day.month >= SCHOOL_YEAR_START_MONTH else day.year - 1
+        start = date(year, SCHOOL_YEAR_START_MONTH, 1)
+        return f"meals_sy{year}_{(year + 1) % 100:02d}", start, _add_months(start, 12)
+    raise ValueError(f"unknown partition interval {interval!r}")
+
+
+def detect_interval(partitions) -> str:
+    """The interval the existing partitions were created with, or None if there are none with bounds."""
+    for _, start, end, _, _ in partitions:
+        if start is not None:
+            return "school_year" if end == _add_months(start, 12) else "month"
+    return None
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('meals')")).scalar() == "p"
+
+
+def list_partitions(conn) -> list:
+    """[(name, start, end, rows estimate, bytes)] ordered by start; the default partition has no bounds."""
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint, pg_total_relation_size(c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('meals')
+    """)).fetchall()
+    partitions = []
+    for name, bound, tuples, size in rows:
+        match = BOUND_PATTERN.search(bound)
+        start, end = (date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))) if match else (None, None)
+        partitions.append((name, start, end, max(tuples, 0), size))
+    return sorted(partitions, key=lambda p: (p[1] is None, p[1] or date.min))
+
+
+def create_partition(conn, day: date, interval=PARTITION_INTERVAL) -> bool:
+    """
+    Create the partition holding `day` if it doesn't exist. Rows for its range
+    already sitting in the default partition are moved into it first, since
+    PostgreSQL refuses to attach over them. Returns True if one was created.
+    """
+    name, start, end = partition_for(day, interval)
+    if any(p[0] == name for p in list_partitions(conn)):
+        return False
+
+    conn.execute(text(f"CREATE TABLE {name} (LIKE meals INCLUDING DEFAULTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE meals_date >= :start AND meals_date < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end})
+    conn.execute(text(f"ALTER TABLE meals ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return True
+
+
+def migrate(engine, interval=None, months_ahead=MONTHS_AHEAD) -> dict:
+    """
+    Convert a plain meals table into a partitioned one, in one transaction.
+    Terminals syncing meanwhile wait on the table lock and then carry on.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            return {"migrated": False}
+        interval = interval or PARTITION_INTERVAL
+        conn.execute(text("LOCK TABLE meals IN ACCESS EXCLUSIVE MODE"))
+        first, last, rows = conn.execute(text("SELECT MIN(meals_date), MAX(meals_date), COUNT(*) FROM meals")).one()
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence('meals', 'id')")).scalar()
+
+        conn.execute(text("ALTER TABLE meals RENAME TO meals_unpartitioned"))
+        conn.execute(text("CREATE TABLE meals (LIKE meals_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (meals_date)"))
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF meals DEFAULT"))
+
+        day = first or date.today()
+        last_day = _add_months(max(last or day, date.today()), months_ahead)
+        created = 0
+        while day <= last_day:
+            created += create_partition(conn, day, interval)
+            day = partition_for(day, interval)[2]
+
+        conn.execute(text("INSERT INTO meals SELECT * FROM meals_unpartitioned"))
+        if sequence:
+            # Keep ids climbing from where they were; the sequence would otherwise go with the old table
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY meals.id"))
+        conn.execute(text("DROP TABLE meals_unpartitioned"))
+        for ddl in INDEX_DDL:
+            conn.execute(text(ddl))
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE meals"))
+        conn.commit()
+    return {"migrated": True, "rows": rows, "partitions": created}
+
+
+def maintain(engine, interval=None, months_ahead=MONTHS_AHEAD, archive_before=None, drop=False) -> dict:
+    """
+    Create upcoming partitions and detach (archive or drop) those ending on or
+    before `archive_before`. New partitions follow the interval of the existing
+    ones; passing a different `interval` is an error.
+    """
+    created, archived = [], []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise RuntimeError("meals is not partitioned yet; run `meals_partitions.py migrate` first")
+        existing = detect_interval(list_partitions(conn))
+        if interval and existing and interval != existing:
+            raise RuntimeError(f"meals is partitioned by {existing}; can't add {interval} partitions")
+        interval = existing or interval or PARTITION_INTERVAL
+        day, last_day = date.today(), _add_months(date.today(), months_ahead)
+        while day <= last_day:
+            if create_partition(conn, day, interval):
+                created.append(partition_for(day, interval)[0])
+            day = partition_for(day, interval)[2]
+        for ddl in INDEX_DDL:
+            conn.execute(text(ddl))
+
+        if archive_before:
+            if not drop:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            for name, start, end, _, _ in list_partitions(conn):
+                if end is None or end > archive_before:
+                    continue
+                conn.execute(text(f"ALTER TABLE meals DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}" if drop else f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                archived.append(name)
+    return {"created": created, "archived": archived, "dropped": drop}
+
+
+def display_status(engine):
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            console.print("[yellow]⚠️ meals is a plain table; run `meals_partitions.py migrate` to partition it[/yellow]")
+            return
+        partitions = list_partitions(conn)
+
+    table = Table(title="🗂️ meals partitions", header_style="bold magenta")
+    table.add_column("Partition", style="cyan")
+    table.add_column("From")
+    table.add_column("To (excl.)")
+    table.add_column("Rows (est.)", justify="right")
+    table.add_column("Size", justify="right")
+    for name, start, end, tuples, size in partitions:
+        table.add_row(name, str(start or "-"), str(end or "-"), f"{tuples:,}", f"{size / 1024 / 1024:.1f} MB")
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the partitioned central meals table.")
+    parser.add_argument("--interval", choices=("month", "school_year"), default=None,
+                        help=f"Partition size for migrate (default {PARTITION_INTERVAL}); maintain follows the existing partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    sub.add_parser("migrate")
+    maintain_parser = sub.add_parser("maintain")
+    maintain_parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    maintain_parser.add_argument("--archive-before", type=date.fromisoformat, default=None,
+                                 help="Detach partitions ending on or before this date (YYYY-MM-DD)")
+    maintain_parser.add_argument("--drop", action="store_true", help="Drop detached partitions instead of archiving")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "migrate":
+        result = migrate(engine, interval=args.interval)
+        if result["migrated"]:
+            console.print(f"[green]✅ meals partitioned: {result['rows']:,} rows in {result['partitions']} partitions[/green]")
+        else:
+            console.print("[yellow]⚠️ meals is already partitioned[/yellow]")
+    elif args.command == "maintain":
+        try:
+            result = maintain(engine, interval=args.interval, months_ahead=args.months_ahead,
+                              archive_before=args.archive_before, drop=args.drop)
+        except RuntimeError as e:
+            # Non-zero exit so a nightly cron run shows up as failed
+            sys.exit(f"❌ ERROR: {e}")
+        console.print(f"[green]✅ Created {len(result['created'])} partition(s)[/green]")
+        if result["archived"]:
+            where = "dropped" if result["dropped"] else f"moved to {ARCHIVE_SCHEMA}"
+            console.print(f"[cyan]📦 {len(result['archived'])} partition(s) {where}: {', '.join(result['archived'])}[/cyan]")
+    display_status(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+Admin scripts share the terminals' metrics module (local_sqlite/metrics.py);
+this loads it so `from metrics import timer` works from either directory.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    __name__, Path(__file__).resolve().parent.parent / "local_sqlite" / "metrics.py"
+)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
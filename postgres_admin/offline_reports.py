@@ -0,0 +1,262 @@
+"""
+Offline district reporting straight from terminal mealtracker.db files.
+
+For when PostgreSQL is down or a terminal hasn't synced: every terminal file is
+ATTACHed read-only, meals scanned on more than one terminal are counted once,
+orders are kept per school (a terminal's school is the one most of the
+students it has served belong to), and the daily Free/Reduced/Paid totals go
+through the same summarize_meals / write_summary_workbook code as
+generate_reports.
+
+    python offline_reports.py /mnt/terminals --start 2025-09-01 --end 2025-09-30 \\
+        --eligibility eligibility.csv --school WRS --month September
+"""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from clean_eligibility_download import EXPECTED_COLUMNS, read_eligibility, split_rejects
+from generate_reports import summarize_meals, write_summary_workbook
+
+MEAL_TYPES = ("lunch", "breakfast")
+ELIGIBILITY_COLUMNS = ["perm_id", "frm_code", "start_date", "end_date"]
+
+
+def find_terminal_dbs(paths) -> list:
+    """Expand folders into the mealtracker.db files below them."""
+    found = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found += sorted(path.rglob("mealtracker.db"))
+        elif path.exists():
+            found.append(path)
+        else:
+            sys.exit(f"❌ ERROR: {path} does not exist.")
+    return found
+
+
+def _table_exists(conn, schema, table) -> bool:
+    row = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type IN ('table', 'view') AND lower(name) = lower(?)",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def read_eligibility_csv(path) -> pd.DataFrame:
+    """
+    Eligibility rows from either a copy of the eligibility table (perm_id,
+    frm_code and optionally start_date, end_date) or a raw Synergy export,
+    which is cleaned the same way clean_eligibility_download.py does.
+    """
+    path = Path(path)
+    header = set(pd.read_csv(path, nrows=0).columns)
+    if EXPECTED_COLUMNS <= header:
+        good, rejects, _ = split_rejects(read_eligibility(path))
+        if not rejects.empty:
+            print(f"⚠️ {len(rejects)} rows in {path.name} can't be used (see clean_eligibility_download.py)")
+        df = good.assign(
+            perm_id=good["perm_id"].astype(object),
+            start_date=good["start_date"].dt.strftime("%Y-%m-%d"),
+            end_date=good["end_date"].dt.strftime("%Y-%m-%d"),
+        )
+    else:
+        missing = {"perm_id", "frm_code"} - header
+        if missing:
+            sys.exit(f"❌ ERROR: Missing expected columns in {path.name}: {', '.join(sorted(missing))} "
+                     f"(or a Synergy export with {', '.join(sorted(EXPECTED_COLUMNS))})")
+        if not {"start_date", "end_date"} <= header:
+            print(f"⚠️ {path.name} has no start_date/end_date; missing dates are treated as open-ended")
+        df = pd.read_csv(path, dtype=str, usecols=[c for c in ELIGIBILITY_COLUMNS if c in header])
+    df = df.reindex(columns=ELIGIBILITY_COLUMNS)
+    return df.astype(object).where(df.notna(), None)
+
+
+def terminal_school(conn, schema="terminal"):
+    """The school most of the students served on the attached terminal belong to, or None."""
+    row = conn.execute(f"""
+        SELECT s.school FROM {schema}.meals m JOIN {schema}.students s ON s.perm_id = m.perm_id
+        WHERE s.school IS NOT NULL AND s.school <> ''
+        GROUP BY s.school ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    return row[0] if row else None
+
+
+def load_terminals(db_paths, start_date, end_date, eligibility_csv=None) -> sqlite3.Connection:
+    """
+    Merge the terminals into one in-memory database.
+
+    Each file is attached read-only in turn and its rows are folded into temp
+    tables keyed so that a (perm_id, date, meal) scanned on two terminals is
+    stored once.
+    """
+    conn = sqlite3.connect("file::memory:", uri=True)
+    conn.executescript("""
+        CREATE TEMP TABLE all_meals (
+            perm_id INTEGER, meals_date TEXT, meal_type TEXT,
+            PRIMARY KEY (perm_id, meals_date, meal_type)
+        ) WITHOUT ROWID;
+        CREATE TEMP TABLE all_students (
+            perm_id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, staff TEXT, school TEXT
+        );
+        CREATE TEMP TABLE all_orders (
+            order_date TEXT, school TEXT, school_id INTEGER, lunch_order INTEGER, breakfast_order INTEGER,
+            PRIMARY KEY (order_date, school, school_id)
+        ) WITHOUT ROWID;
+        CREATE TEMP TABLE all_eligibility (
+            perm_id INTEGER, frm_code TEXT, start_date TEXT, end_date TEXT
+        );
+    """)
+
+    for db_path in db_paths:
+        conn.execute("ATTACH DATABASE ? AS terminal", (f"file:{Path(db_path).resolve()}?mode=ro",))
+        conn.execute("""
+            INSERT OR IGNORE INTO all_meals (perm_id, meals_date, meal_type)
+            SELECT perm_id, meals_date, meal_type FROM terminal.meals
+            WHERE meals_date BETWEEN ? AND ?
+        """, (start_date, end_date))
+        conn.execute("""
+            INSERT OR IGNORE INTO all_students (perm_id, first_name, last_name, staff, school)
+            SELECT perm_id, first_name, last_name, staff, school FROM terminal.students
+        """)
+        if _table_exists(conn, "terminal", "orders"):
+            school = terminal_school(conn)
+            if school is None:
+                print(f"⚠️ {db_path}: no served students to tell its school from; "
+                      f"its orders only count in district-wide reports")
+            # Both terminals at a school may hold an order row; keep the larger one
+            conn.execute("""
+                INSERT INTO all_orders (order_date, school, school_id, lunch_order, breakfast_order)
+                SELECT order_date, ?, COALESCE(school_id, 1), MAX(lunch_order), MAX(breakfast_order)
+                FROM terminal.orders
+                WHERE order_date BETWEEN ? AND ?
+                GROUP BY order_date, COALESCE(school_id, 1)
+                ON CONFLICT (order_date, school, school_id) DO UPDATE SET
+                    lunch_order = MAX(COALESCE(lunch_order, 0), COALESCE(excluded.lunch_order, 0)),
+                    breakfast_order = MAX(COALESCE(breakfast_order, 0), COALESCE(excluded.breakfast_order, 0))
+            """, (school or "", start_date, end_date))
+        if _table_exists(conn, "terminal", "eligibility"):
+            conn.execute("""
+                INSERT INTO all_eligibility (perm_id, frm_code, start_date, end_date)
+                SELECT perm_id, frm_code, start_date, end_date FROM terminal.eligibility
+            """)
+        conn.commit()
+        conn.execute("DETACH DATABASE terminal")
+
+    if eligibility_csv:
+        conn.executemany(
+            "INSERT INTO all_eligibility (perm_id, frm_code, start_date, end_date) VALUES (?, ?, ?, ?)",
+            read_eligibility_csv(eligibility_csv).itertuples(index=False, name=None),
+        )
+        conn.commit()
+
+    conn.execute("CREATE INDEX temp.idx_all_eligibility ON all_eligibility (perm_id)")
+    return conn
+
+
+def fetch_offline_totals(conn, school=None) -> pd.DataFrame:
+    """
+    Daily totals in the layout generate_summary_tables returns.
+
+    A meal is Free/Reduced when the student's benefit period covers the meal
+    date; a student with both codes on a day gets the better one.
+    """
+    query = """
+        WITH coded AS (
+            SELECT
+                m.meals_date, lower(m.meal_type) AS meal_type, m.perm_id,
+                COALESCE(MIN(CASE e.frm_code WHEN 'Free' THEN 1 WHEN 'Reduced' THEN 2 END), 3) AS meals_code
+            FROM all_meals m
+            JOIN all_students s ON m.perm_id = s.perm_id
+            LEFT JOIN all_eligibility e ON e.perm_id = m.perm_id
+                AND (e.start_date IS NULL OR e.start_date <= m.meals_date)
+                AND (e.end_date IS NULL OR e.end_date >= m.meals_date)
+            WHERE (? IS NULL OR s.school = ?)
+            GROUP BY m.meals_date, lower(m.meal_type), m.perm_id
+        )
+        SELECT
+            meals_date AS order_date, meal_type,
+            SUM(meals_code = 1) AS total_1s,
+            SUM(meals_code = 2) AS total_2s,
+            SUM(meals_code = 3) AS total_3s,
+            COUNT(*) AS total
+        FROM coded
+        GROUP BY meals_date, meal_type
+    """
+    df_long = pd.read_sql_query(query, conn, params=(school, school))
+
+    df_totals = pd.DataFrame({"order_date": sorted(df_long["order_date"].unique())})
+    for meal_type in MEAL_TYPES:
+        part = df_long[df_long["meal_type"] == meal_type].drop(columns="meal_type")
+        part = part.rename(columns={
+            "total_1s": f"{meal_type}_1s",
+            "total_2s": f"{meal_type}_2s",
+            "total_3s": f"{meal_type}_3s",
+            "total": f"{meal_type}_total",
+        })
+        df_totals = df_totals.merge(part, on="order_date", how="left")
+    return df_totals
+
+
+def fetch_offline_orders(conn, school=None) -> pd.DataFrame:
+    return pd.read_sql_query("""
+        SELECT order_date, SUM(lunch_order) AS lunch_order, SUM(breakfast_order) AS breakfast_order
+        FROM all_orders
+        WHERE (? IS NULL OR school = ?)
+        GROUP BY order_date
+        ORDER BY order_date
+    """, conn, params=(school, school))
+
+
+def offline_report(db_paths, start_date, end_date, eligibility_csv=None, school=None,
+                   month_report=None, filename=None):
+    """Build and save the summary workbook from terminal files. Returns the filename."""
+    conn = load_terminals(db_paths, start_date, end_date, eligibility_csv)
+    try:
+        df_totals = fetch_offline_totals(conn, school)
+        df_orders = fetch_offline_orders(conn, school)
+        n_eligibility = conn.execute("SELECT COUNT(*) FROM all_eligibility").fetchone()[0]
+    finally:
+        conn.close()
+
+    if n_eligibility == 0:
+        print("⚠️ No eligibility data found; every meal is counted as Paid (code 3).")
+
+    lunch_df = summarize_meals(df_orders, df_totals, "lunch")
+    breakfast_df = summarize_meals(df_orders, df_totals, "breakfast")
+
+    print("\nLunch Summary:\n", lunch_df)
+    print("\nBreakfast Summary:\n", breakfast_df)
+    return write_summary_workbook(
+        lunch_df, breakfast_df, filename=filename,
+        school=school or "district", month_report=month_report or f"{start_date}_{end_date}",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary report straight from terminal SQLite files.")
+    parser.add_argument("paths", nargs="+", help="mealtracker.db files or folders containing them")
+    parser.add_argument("--start", required=True, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="End date (YYYY-MM-DD)")
+    parser.add_argument("--eligibility", default=None,
+                        help="CSV with perm_id, frm_code[, start_date, end_date] (e.g. a \\copy of eligibility) "
+                             "or a Synergy eligibility export")
+    parser.add_argument("--school", default=None, help="Only students and orders of this school")
+    parser.add_argument("--month", default=None, help="Report month used in the file name")
+    parser.add_argument("--out", default=None, help="Output workbook path")
+    args = parser.parse_args()
+
+    db_paths = find_terminal_dbs(args.paths)
+    if not db_paths:
+        sys.exit("❌ ERROR: No mealtracker.db files found.")
+    print(f"📥 Reading {len(db_paths)} terminal database(s)")
+
+    offline_report(db_paths, args.start, args.end, eligibility_csv=args.eligibility,
+                   school=args.school, month_report=args.month, filename=args.out)
+
+
+if __name__ == "__main__":
+    main()
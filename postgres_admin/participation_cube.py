@@ -0,0 +1,259 @@
+"""
+Participation analytics cube.
+
+`participation_cube` holds one row per school x date x meal_type x staff x
+meals_code with the number of distinct students served. It is refreshed
+incrementally from `meals` (only dates touched by newly synced rows are
+recomputed), so trend questions slice a few thousand pre-aggregated rows with
+pandas instead of rescanning the detail tables.
+
+    python participation_cube.py refresh
+    python participation_cube.py refresh --rebuild --start 2025-08-01 --end 2026-06-30
+    python participation_cube.py report homerooms --start 2025-08-01 --end 2026-06-30
+    python participation_cube.py report categories|weekdays|trend --start ... --end ...
+"""
+import argparse
+from datetime import datetime
+
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import text
+
+from generate_reports import get_engine
+
+console = Console()
+
+CODE_LABELS = {"1": "Free", "2": "Reduced", "3": "Paid"}
+
+# Meal ids come from a sequence at insert time, so a sync that commits after a
+# refresh can land ids below the stored watermark; every refresh rescans this
+# many ids under it (a few terminal batches' worth) to pick those up
+WATERMARK_OVERLAP = 100_000
+
+CUBE_DDL = """
+CREATE TABLE IF NOT EXISTS participation_cube (
+    school TEXT NOT NULL,
+    meals_date DATE NOT NULL,
+    meal_type TEXT NOT NULL,
+    staff TEXT NOT NULL,
+    meals_code CHAR(1) NOT NULL,
+    served INTEGER NOT NULL,
+    PRIMARY KEY (meals_date, school, meal_type, staff, meals_code)
+);
+CREATE TABLE IF NOT EXISTS participation_cube_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    last_meal_id BIGINT NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL
+);
+"""
+
+# Distinct students per cell, coded with the eligibility period covering the meal date
+CUBE_INSERT = """
+INSERT INTO participation_cube (school, meals_date, meal_type, staff, meals_code, served)
+SELECT
+    COALESCE(s.school, ''), m.meals_date, lower(m.meal_type), COALESCE(s.staff, ''),
+    COALESCE(e.meals_code, '3'), COUNT(DISTINCT m.perm_id)
+FROM meals m
+JOIN students s ON s.perm_id = m.perm_id
+LEFT JOIN LATERAL (
+    SELECT MIN(CASE el.frm_code WHEN 'Free' THEN '1' WHEN 'Reduced' THEN '2' END) AS meals_code
+    FROM eligibility el
+    WHERE el.perm_id = m.perm_id
+      AND m.meals_date BETWEEN COALESCE(el.start_date, '-infinity') AND COALESCE(el.end_date, 'infinity')
+) e ON TRUE
+WHERE {date_filter}
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def ensure_cube(conn):
+    conn.execute(text(CUBE_DDL))
+
+
+def refresh_cube(engine, rebuild=False, start_date=None, end_date=None) -> int:
+    """
+    Bring the cube up to date and return the number of dates recomputed.
+
+    Normally only dates that have meals with an id above the stored watermark,
+    less WATERMARK_OVERLAP, are recomputed. `rebuild` recomputes every date in [start_date, end_date]
+    instead, for corrections to existing meals or eligibility.
+    """
+    with engine.begin() as conn:
+        ensure_cube(conn)
+        high_water = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM meals")).scalar()
+
+        if rebuild:
+            conn.execute(text("DELETE FROM participation_cube WHERE meals_date BETWEEN :start AND :end"),
+                         {"start": start_date, "end": end_date})
+            conn.execute(
+                text(CUBE_INSERT.format(date_filter="m.meals_date BETWEEN :start AND :end")),
+                {"start": start_date, "end": end_date},
+            )
+            n_dates = conn.execute(text(
+                "SELECT COUNT(DISTINCT meals_date) FROM participation_cube WHERE meals_date BETWEEN :start AND :end"
+            ), {"start": start_date, "end": end_date}).scalar()
+        else:
+            last_id = conn.execute(text("SELECT last_meal_id FROM participation_cube_state")).scalar() or 0
+            dates = [row[0] for row in conn.execute(
+                text("SELECT DISTINCT meals_date FROM meals WHERE id > :last_id AND id <= :high"),
+                {"last_id": max(last_id - WATERMARK_OVERLAP, 0), "high": high_water},
+            )]
+            n_dates = len(dates)
+            if dates:
+                conn.execute(text("DELETE FROM participation_cube WHERE meals_date = ANY(:dates)"), {"dates": dates})
+                conn.execute(text(CUBE_INSERT.format(date_filter="m.meals_date = ANY(:dates)")), {"dates": dates})
+
+        conn.execute(text("""
+            INSERT INTO participation_cube_state (id, last_meal_id, refreshed_at)
+            VALUES (TRUE, :high, now())
+            ON CONFLICT (id) DO UPDATE SET
+                last_meal_id = GREATEST(participation_cube_state.last_meal_id, EXCLUDED.last_meal_id),
+                refreshed_at = EXCLUDED.refreshed_at
+        """), {"high": high_water})
+    return n_dates
+
+
+def load_cube(engine, start_date, end_date, school=None) -> pd.DataFrame:
+    """Read a slice of the cube."""
+    query = text("""
+        SELECT school, meals_date, meal_type, staff, meals_code, served
+        FROM participation_cube
+        WHERE meals_date BETWEEN :start AND :end
+          AND (CAST(:school AS TEXT) IS NULL OR school = :school)
+    """)
+    df = pd.read_sql(query, engine, params={"start": start_date, "end": end_date, "school": school})
+    df["meals_date"] = pd.to_datetime(df["meals_date"])
+    return df
+
+
+def load_enrollment(engine, school=None) -> pd.DataFrame:
+    """Current roster size per school and homeroom."""
+    query = text("""
+        SELECT COALESCE(school, '') AS school, COALESCE(staff, '') AS staff, COUNT(*) AS enrolled
+        FROM students
+        WHERE CAST(:school AS TEXT) IS NULL OR school = :school
+        GROUP BY 1, 2
+    """)
+    return pd.read_sql(query, engine, params={"school": school})
+
+
+def daily_totals(cube: pd.DataFrame, by=()) -> pd.DataFrame:
+    """Served per service day (optionally per extra dimensions)."""
+    return cube.groupby(["meals_date", "meal_type", *by], as_index=False)["served"].sum()
+
+
+def homeroom_changes(cube: pd.DataFrame, enrollment: pd.DataFrame, window_days=20) -> pd.DataFrame:
+    """
+    Average daily participation per homeroom over the last `window_days`
+    service days against the `window_days` before that, sorted biggest drop first.
+    """
+    days = cube["meals_date"].drop_duplicates().sort_values()
+    recent_days = days.iloc[-window_days:]
+    prior_days = days.iloc[-2 * window_days:-window_days]
+
+    per_day = daily_totals(cube, by=("school", "staff"))
+    per_day["window"] = pd.NA
+    per_day.loc[per_day["meals_date"].isin(recent_days), "window"] = "recent"
+    per_day.loc[per_day["meals_date"].isin(prior_days), "window"] = "prior"
+    per_day = per_day.dropna(subset=["window"])
+
+    n_days = {"recent": len(recent_days), "prior": max(len(prior_days), 1)}
+    avg = per_day.pivot_table(index=["school", "staff", "meal_type"], columns="window",
+                              values="served", aggfunc="sum", fill_value=0)
+    avg = avg.reindex(columns=["prior", "recent"], fill_value=0)
+    avg["prior"] = avg["prior"] / n_days["prior"]
+    avg["recent"] = avg["recent"] / n_days["recent"]
+    avg = avg.reset_index().merge(enrollment, on=["school", "staff"], how="left")
+
+    avg["change"] = avg["recent"] - avg["prior"]
+    avg["prior_rate"] = avg["prior"] / avg["enrolled"]
+    avg["recent_rate"] = avg["recent"] / avg["enrolled"]
+    columns = ["school", "staff", "meal_type", "enrolled", "prior", "recent", "change", "prior_rate", "recent_rate"]
+    return avg[columns].sort_values("change").reset_index(drop=True)
+
+
+def category_uptake(cube: pd.DataFrame) -> pd.DataFrame:
+    """Average daily served per meals_code (Free/Reduced/Paid) for breakfast vs lunch."""
+    n_days = cube.groupby("meal_type")["meals_date"].nunique()
+    table = cube.pivot_table(index="meals_code", columns="meal_type", values="served", aggfunc="sum", fill_value=0)
+    table = table / n_days.reindex(table.columns).values
+    table.index = table.index.map(lambda code: CODE_LABELS.get(code, code))
+    table["breakfast_share_of_lunch"] = table.get("breakfast", 0) / table.get("lunch", float("nan"))
+    return table.reset_index().rename(columns={"meals_code": "category"})
+
+
+def weekday_pattern(cube: pd.DataFrame) -> pd.DataFrame:
+    """Average served per weekday and meal."""
+    per_day = daily_totals(cube)
+    per_day["weekday"] = per_day["meals_date"].dt.dayofweek
+    table = per_day.pivot_table(index="weekday", columns="meal_type", values="served", aggfunc="mean")
+    table.index = table.index.map(lambda d: ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][d])
+    return table.reset_index()
+
+
+def trend(cube: pd.DataFrame, freq="W") -> pd.DataFrame:
+    """Average daily served per period (W = weekly, M = monthly) and meal."""
+    per_day = daily_totals(cube)
+    per_day["period"] = per_day["meals_date"].dt.to_period(freq).dt.start_time.dt.date
+    table = per_day.pivot_table(index="period", columns="meal_type", values="served", aggfunc="mean")
+    return table.reset_index()
+
+
+def print_frame(df: pd.DataFrame, title: str):
+    table = Table(title=title, header_style="bold magenta")
+    for col in df.columns:
+        numeric = pd.api.types.is_numeric_dtype(df[col])
+        table.add_column(str(col), justify="right" if numeric else "left")
+    for row in df.itertuples(index=False):
+        table.add_row(*[f"{v:,.2f}" if isinstance(v, float) else str(v) for v in row])
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Participation cube refresh and reports.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_refresh = sub.add_parser("refresh", help="Incrementally refresh the cube")
+    p_refresh.add_argument("--rebuild", action="store_true", help="Recompute every date in --start/--end")
+    p_refresh.add_argument("--start")
+    p_refresh.add_argument("--end")
+
+    p_report = sub.add_parser("report", help="Slice the cube")
+    p_report.add_argument("view", choices=["homerooms", "categories", "weekdays", "trend"])
+    p_report.add_argument("--start", required=True)
+    p_report.add_argument("--end", required=True)
+    p_report.add_argument("--school")
+    p_report.add_argument("--window", type=int, default=20, help="Service days per window for homerooms")
+    p_report.add_argument("--freq", default="W", choices=["W", "M"], help="Trend period")
+    args = parser.parse_args()
+
+    engine = get_engine()
+
+    if args.command == "refresh":
+        if args.rebuild and not (args.start and args.end):
+            parser.error("--rebuild needs --start and --end")
+        started = datetime.now()
+        n_dates = refresh_cube(engine, rebuild=args.rebuild, start_date=args.start, end_date=args.end)
+        console.print(f"[green]✅ Cube refreshed: {n_dates} date(s) recomputed in "
+                      f"{(datetime.now() - started).total_seconds():.2f}s[/green]")
+        return
+
+    cube = load_cube(engine, args.start, args.end, args.school)
+    if cube.empty:
+        console.print("[yellow]⚠️ No cube rows in that range. Run 'refresh' first?[/yellow]")
+        return
+
+    if args.view == "homerooms":
+        df = homeroom_changes(cube, load_enrollment(engine, args.school), window_days=args.window)
+        print_frame(df, f"Homeroom participation: last {args.window} service days vs the {args.window} before")
+    elif args.view == "categories":
+        print_frame(category_uptake(cube), "Average daily served by category")
+    elif args.view == "weekdays":
+        print_frame(weekday_pattern(cube), "Average served by weekday")
+    else:
+        print_frame(trend(cube, args.freq), f"Average daily served per {'week' if args.freq == 'W' else 'month'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Produce yield, waste and temperature report from the synced salad_bar rows.
+
+All aggregation happens in PostgreSQL: one GROUP BY + window query per sheet,
+so only the summarised rows come back to Python. The workbook has
+
+    Items           received / culled / used / leftovers / wasted units, yield and
+                    waste rate per school and item, ranked by waste within the school
+    Schools         the same per school, plus a district row
+    Daily           per school and serve date, with running waste and a 5-day waste rate
+    Temperatures    every receive or serve reading outside TEMP_RANGE_F
+
+Terminals record units received, culled and leftovers but not units used,
+so used is received - culled - leftovers (a recorded non-zero units_used
+wins). A served temperature of 0 or NULL means none was taken.
+
+`salad_bar` is grouped by school, and --school can filter on it, only if the
+central table has a `school` column; otherwise the district is reported as
+one group. Item names come from a central `sorted_items` table when there is
+one.
+
+    python produce_report.py --start 2025-03-01 --end 2025-03-31
+    python produce_report.py --start 2025-03-01 --end 2025-03-31 --school Lincoln --month March
+"""
+import argparse
+import sys
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from openpyxl.utils.dataframe import dataframe_to_rows
+from sqlalchemy import text
+
+from generate_reports import get_engine
+from metrics import timer
+
+# Cold-holding range for cut produce (°F); anything outside is flagged
+TEMP_RANGE_F = (32, 41)
+ROLLING_DAYS = 5
+
+USED = ("COALESCE(NULLIF(sb.units_used, 0), GREATEST(COALESCE(sb.units_received, 0) - COALESCE(sb.culled, 0)"
+        " - COALESCE(sb.leftovers, 0), 0))")
+# Entry screens store 0 until a served temperature is taken
+TEMP_SERVED = "NULLIF(sb.temp_served, 0)"
+
+ITEMS_QUERY = """
+WITH per_item AS (
+    SELECT
+        {school} AS school, sb.itemid,
+        COUNT(DISTINCT sb.serve_date) AS days,
+        SUM(COALESCE(sb.units_received, 0)) AS received,
+        SUM(COALESCE(sb.culled, 0)) AS culled,
+        SUM({used}) AS used,
+        SUM(COALESCE(sb.leftovers, 0)) AS leftovers,
+        SUM(COALESCE(sb.portions_prepared, 0)) AS portions_prepared,
+        SUM(COALESCE(sb.total_served, 0)) AS portions_served,
+        COUNT(*) FILTER (WHERE sb.temp_rcvd NOT BETWEEN :low AND :high) AS rcvd_temp_flags,
+        COUNT(*) FILTER (WHERE {temp_served} NOT BETWEEN :low AND :high) AS served_temp_flags
+    FROM salad_bar sb
+    WHERE sb.serve_date BETWEEN :start AND :end{school_filter}
+    GROUP BY 1, 2
+)
+SELECT
+    p.school, p.itemid, {itemname} AS itemname, p.days, p.received, p.culled, p.used, p.leftovers,
+    p.culled + p.leftovers AS wasted,
+    ROUND((p.used / NULLIF(p.received, 0))::numeric, 3) AS yield,
+    ROUND(((p.culled + p.leftovers) / NULLIF(p.received, 0))::numeric, 3) AS waste_rate,
+    ROUND((p.portions_served / NULLIF(p.portions_prepared, 0))::numeric, 3) AS served_rate,
+    ROUND(((p.culled + p.leftovers) / NULLIF(SUM(p.culled + p.leftovers) OVER w, 0))::numeric, 3)
+        AS share_of_school_waste,
+    RANK() OVER (w ORDER BY p.culled + p.leftovers DESC) AS waste_rank,
+    p.rcvd_temp_flags, p.served_temp_flags
+FROM per_item p
+{items_join}
+WINDOW w AS (PARTITION BY p.school)
+ORDER BY p.school, waste_rank, p.itemid
+"""
+
+SCHOOLS_QUERY = """
+SELECT
+    CASE WHEN GROUPING({school}) = 1 THEN 'District' ELSE {school} END AS school,
+    COUNT(DISTINCT sb.serve_date) AS days,
+    COUNT(DISTINCT sb.itemid) AS items,
+    SUM(COALESCE(sb.units_received, 0)) AS received,
+    SUM({used}) AS used,
+    SUM(COALESCE(sb.culled, 0) + COALESCE(sb.leftovers, 0)) AS wasted,
+    ROUND((SUM({used}) / NULLIF(SUM(sb.units_received), 0))::numeric, 3) AS yield,
+    ROUND((SUM(COALESCE(sb.culled, 0) + COALESCE(sb.leftovers, 0))
+           / NULLIF(SUM(sb.units_received), 0))::numeric, 3) AS waste_rate,
+    COUNT(*) FILTER (WHERE sb.temp_rcvd NOT BETWEEN :low AND :high
+                        OR {temp_served} NOT BETWEEN :low AND :high) AS temp_flags
+FROM salad_bar sb
+WHERE sb.serve_date BETWEEN :start AND :end{school_filter}
+GROUP BY GROUPING SETS (({school}), ())
+ORDER BY GROUPING({school}), 1
+"""
+
+DAILY_QUERY = """
+WITH daily AS (
+    SELECT
+        {school} AS school, sb.serve_date,
+        SUM(COALESCE(sb.units_received, 0)) AS received,
+        SUM({used}) AS used,
+        SUM(COALESCE(sb.culled, 0) + COALESCE(sb.leftovers, 0)) AS wasted
+    FROM salad_bar sb
+    WHERE sb.serve_date BETWEEN :start AND :end{school_filter}
+    GROUP BY 1, 2
+)
+SELECT
+    d.school, d.serve_date, d.received, d.used, d.wasted,
+    ROUND((d.wasted / NULLIF(d.received, 0))::numeric, 3) AS waste_rate,
+    SUM(d.wasted) OVER w AS cumulative_wasted,
+    ROUND((SUM(d.wasted) OVER rolling / NULLIF(SUM(d.received) OVER rolling, 0))::numeric, 3)
+        AS rolling_waste_rate
+FROM daily d
+WINDOW w AS (PARTITION BY d.school ORDER BY d.serve_date),
+       rolling AS (w ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW)
+ORDER BY d.school, d.serve_date
+"""
+
+TEMPS_QUERY = """
+WITH readings AS (
+    SELECT {school} AS school, sb.serve_date, sb.itemid, 'received' AS reading,
+           sb.temp_rcvd AS temp_f, sb.time_rcvd::text AS reading_time
+    FROM salad_bar sb
+    WHERE sb.serve_date BETWEEN :start AND :end{school_filter} AND sb.temp_rcvd NOT BETWEEN :low AND :high
+    UNION ALL
+    SELECT {school}, sb.serve_date, sb.itemid, 'served', {temp_served}, sb.time_served::text
+    FROM salad_bar sb
+    WHERE sb.serve_date BETWEEN :start AND :end{school_filter} AND {temp_served} NOT BETWEEN :low AND :high
+)
+SELECT
+    p.school, p.serve_date, p.itemid, {itemname} AS itemname, p.reading, p.temp_f, p.reading_time,
+    COUNT(*) OVER (PARTITION BY p.school, p.itemid, p.reading) AS item_flags_in_range,
+    LAG(p.serve_date) OVER (PARTITION BY p.school, p.itemid, p.reading ORDER BY p.serve_date)
+        AS previous_flag_date
+FROM readings p
+{items_join}
+ORDER BY p.school, p.serve_date, p.itemid, p.reading
+"""
+
+
+def _columns(conn, table) -> set:
+    rows = conn.execute(text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = :table
+    """), {"table": table})
+    return {row[0] for row in rows}
+
+
+def fetch_produce_report(engine, start_date, end_date, school=None) -> dict:
+    """Run the four report queries, for one school if given. Returns {sheet title: DataFrame}."""
+    with engine.connect() as conn:
+        has_school = "school" in _columns(conn, "salad_bar")
+        has_items = {"itemid", "itemname"} <= _columns(conn, "sorted_items")
+        if school and not has_school:
+            raise ValueError("salad_bar has no school column, so the report can only cover the whole district")
+
+        parts = {
+            "school": "COALESCE(sb.school, '')" if has_school else "'All schools'::text",
+            "itemname": "si.itemname" if has_items else "NULL",
+            "items_join": "LEFT JOIN sorted_items si ON si.itemid = p.itemid" if has_items else "",
+            "preceding": ROLLING_DAYS - 1,
+            "used": USED,
+            "temp_served": TEMP_SERVED,
+            "school_filter": " AND COALESCE(sb.school, '') = :school" if school else "",
+        }
+        params = {"start": start_date, "end": end_date, "low": TEMP_RANGE_F[0], "high": TEMP_RANGE_F[1],
+                  "school": school}
+        sheets = {}
+        for title, query in (("Items", ITEMS_QUERY), ("Schools", SCHOOLS_QUERY),
+                             ("Daily", DAILY_QUERY), ("Temperatures", TEMPS_QUERY)):
+            with timer(f"report.produce.{title.lower()}"):
+                sheets[title] = pd.read_sql(text(query.format(**parts)), conn, params=params)
+    return sheets
+
+
+def write_produce_workbook(sheets: dict, filename):
+    wb = Workbook()
+    wb.remove(wb.active)
+
+    for title, df in sheets.items():
+        ws = wb.create_sheet(title)
+        ws.append(list(df.columns))
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+        for row in dataframe_to_rows(df, index=False, header=False):
+            ws.append(row)
+
+        # Unit totals on the item sheet, like the summary workbook's totals row
+        if title == "Items" and not df.empty:
+            totals = ["Totals"] + [
+                df[col].sum() if col in ("received", "culled", "used", "leftovers", "wasted") else ""
+                for col in df.columns[1:]
+            ]
+            ws.append(totals)
+            ws.cell(row=ws.max_row, column=1).font = Font(bold=True)
+
+    wb.save(filename)
+    print(f"Produce report saved as {filename}")
+    return filename
+
+
+def produce_report(start_date, end_date, school=None, month_report=None, engine=None):
+    engine = engine or get_engine()
+    sheets = fetch_produce_report(engine, start_date, end_date, school)
+    if sheets["Items"].empty:
+        print(f"⚠️ No salad bar rows between {start_date} and {end_date}.")
+        return None
+
+    print("\nProduce by school:\n", sheets["Schools"])
+    flags = len(sheets["Temperatures"])
+    if flags:
+        print(f"\n⚠️ {flags} temperature reading(s) outside {TEMP_RANGE_F[0]}-{TEMP_RANGE_F[1]}°F")
+    filename = f"{school or 'district'}_{month_report or f'{start_date}_{end_date}'}_produce_report.xlsx"
+    with timer("report.produce.write"):
+        return write_produce_workbook(sheets, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Produce yield, waste and temperature report.")
+    parser.add_argument("--start", required=True, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="End date (YYYY-MM-DD)")
+    parser.add_argument("--school", default=None, help="Only this school (needs a school column on salad_bar)")
+    parser.add_argument("--month", default=None, help="Report month used in the file name")
+    args = parser.parse_args()
+    try:
+        produce_report(args.start, args.end, school=args.school, month_report=args.month)
+    except ValueError as e:
+        sys.exit(f"❌ ERROR: {e}")
+
+
+if __name__ == "__main__":
+    from metrics import profile
+    profile("produce_report", main)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+# Cached workbooks live next to the other admin exports
+CACHE_DIR = Path("admin_exports") / "report_cache"
+INDEX_FILE = "index.json"
+
+# Eviction limits: whichever is hit first
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+MAX_AGE_DAYS = 400
+
+
+def compute_data_fingerprint(engine, start_date, end_date) -> str:
+    """
+    Fingerprint the rows a report for [start_date, end_date] is built from.
+
+    Hashes the meals and orders in the range plus the students/eligibility rows
+    of every student who ate in it. A late sync or a correction anywhere in the
+    range changes the fingerprint; rows outside the range never do.
+    """
+    query = text("""
+        WITH range_meals AS (
+            SELECT m.* FROM meals m
+            WHERE m.meals_date BETWEEN :start_date AND :end_date
+        ),
+        range_ids AS (
+            SELECT DISTINCT perm_id FROM range_meals
+        )
+        SELECT
+            (SELECT count(*) || ':' || COALESCE(md5(string_agg(r::text, ',' ORDER BY r::text)), '')
+               FROM range_meals r) AS meals_fp,
+            (SELECT count(*) || ':' || COALESCE(md5(string_agg(o::text, ',' ORDER BY o::text)), '')
+               FROM orders o WHERE o.order_date BETWEEN :start_date AND :end_date) AS orders_fp,
+            (SELECT count(*) || ':' || COALESCE(md5(string_agg(s::text, ',' ORDER BY s::text)), '')
+               FROM students s WHERE s.perm_id IN (SELECT perm_id FROM range_ids)) AS students_fp,
+            (SELECT count(*) || ':' || COALESCE(md5(string_agg(e::text, ',' ORDER BY e::text)), '')
+               FROM eligibility e WHERE e.perm_id IN (SELECT perm_id FROM range_ids)) AS eligibility_fp;
+    """)
+    with engine.connect() as conn:
+        row = conn.execute(query, {"start_date": start_date, "end_date": end_date}).one()
+    return hashlib.sha256("|".join(str(part) for part in row).encode()).hexdigest()
+
+
+def extend_fingerprint(fingerprint, df) -> str:
+    """
+    Fold a computed frame into a fingerprint, for reports that also depend on
+    data outside the fingerprinted range (the edit checks read all eligibility,
+    the roster size and totals from before the range).
+    """
+    return hashlib.sha256(f"{fingerprint}|{df.to_csv(index=False)}".encode()).hexdigest()
+
+
+def _range_key(school, start_date, end_date, report_type) -> str:
+    return f"{school}|{start_date}|{end_date}|{report_type}"
+
+
+def _load_index(cache_dir: Path) -> dict:
+    index_path = cache_dir / INDEX_FILE
+    if not index_path.exists():
+        return {}
+    try:
+        return json.loads(index_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        # A damaged index only costs us a regeneration
+        return {}
+
+
+def _save_index(cache_dir: Path, index: dict):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f"{INDEX_FILE}.tmp"
+    tmp_path.write_text(json.dumps(index, indent=2))
+    tmp_path.replace(cache_dir / INDEX_FILE)
+
+
+def fetch_cached_report(school, start_date, end_date, report_type, fingerprint, destination, cache_dir=CACHE_DIR):
+    """
+    Copy a cached workbook to `destination` if one exists for this exact
+    school/range/report type and data fingerprint. Returns the destination
+    path on a hit, or None on a miss.
+    """
+    cache_dir = Path(cache_dir)
+    index = _load_index(cache_dir)
+    entry = index.get(_range_key(school, start_date, end_date, report_type))
+    if not entry or entry["fingerprint"] != fingerprint:
+        return None
+
+    cached_path = cache_dir / entry["file"]
+    if not cached_path.exists():
+        return None
+
+    shutil.copyfile(cached_path, destination)
+    entry["last_used"] = time.time()
+    _save_index(cache_dir, index)
+    return Path(destination)
+
+
+def store_report(school, start_date, end_date, report_type, fingerprint, source, cache_dir=CACHE_DIR):
+    """
+    Store a freshly generated workbook. Any older entry for the same range is
+    replaced, so stale data for that range is invalidated and nothing else is.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index = _load_index(cache_dir)
+    key = _range_key(school, start_date, end_date, report_type)
+
+    old_entry = index.get(key)
+    if old_entry:
+        (cache_dir / old_entry["file"]).unlink(missing_ok=True)
+
+    file_name = f"{hashlib.sha256(f'{key}|{fingerprint}'.encode()).hexdigest()[:32]}{Path(source).suffix}"
+    shutil.copyfile(source, cache_dir / file_name)
+
+    now = time.time()
+    index[key] = {
+        "file": file_name,
+        "fingerprint": fingerprint,
+        "created": now,
+        "last_used": now,
+        "size": (cache_dir / file_name).stat().st_size,
+    }
+    _save_index(cache_dir, index)
+    evict_reports(cache_dir=cache_dir)
+
+
+def evict_reports(max_bytes=MAX_CACHE_BYTES, max_age_days=MAX_AGE_DAYS, cache_dir=CACHE_DIR) -> int:
+    """Drop entries older than max_age_days, then least recently used ones until under max_bytes."""
+    cache_dir = Path(cache_dir)
+    index = _load_index(cache_dir)
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+
+    def drop(key):
+        nonlocal removed
+        (cache_dir / index.pop(key)["file"]).unlink(missing_ok=True)
+        removed += 1
+
+    for key in [k for k, entry in index.items() if entry["created"] < cutoff]:
+        drop(key)
+
+    total = sum(entry["size"] for entry in index.values())
+    for key in sorted(index, key=lambda k: index[k]["last_used"]):
+        if total <= max_bytes:
+            break
+        total -= index[key]["size"]
+        drop(key)
+
+    if removed:
+        _save_index(cache_dir, index)
+    return removed